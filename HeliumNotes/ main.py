@@ -1,19 +1,37 @@
 import sys
 from PyQt6.QtWidgets import QApplication
-from ui.main_window import MainWindow
+
 
 def main():
     """
     Entry point for HeliumNotes app.
     Initializes the Qt application and launches the main window.
+    Heavy modules load after the window is on screen.
     """
     app = QApplication(sys.argv)
     app.setApplicationName("HeliumNotes")
 
+    window = open_main_window()
+
+    sys.exit(app.exec())
+
+
+def open_main_window():
+    """Show the main window; background services start once it has painted."""
+    from ui.first_paint import FirstPaint
+    from ui.main_window import MainWindow
     window = MainWindow()
+    FirstPaint(window, _after_first_paint)
     window.show()
+    return window
+
+
+def _after_first_paint():
+    from core.ai_engines import AIEngines
+    from core.pattern_miner import PatternMiner
+    AIEngines.warm_up_async()
+    PatternMiner.start_schedule()
 
-    sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,73 @@
+"""
+ann_recall.py
+Recall-vs-latency report for IVFIndex against exact brute-force search.
+
+Run from the HeliumNotes directory:
+    python -m benchmarks.ann_recall [--size 100000] [--dim 384] [--queries 200]
+
+Uses synthetic clustered vectors (a stand-in for passage embeddings) so it
+runs without the embedding model or a populated database.
+"""
+
+import argparse
+import time
+import numpy as np
+from core.ann_index import IVFIndex
+
+
+def clustered_vectors(n, dim, clusters, rng):
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    noise = rng.normal(scale=1.5, size=(n, dim)).astype(np.float32)
+    vectors = centers[labels] + noise
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(matrix, query, k):
+    scores = matrix @ query
+    return set(np.argpartition(-scores, k - 1)[:k].tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, nargs="*", default=None)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = clustered_vectors(args.size, args.dim, max(16, args.size // 200), rng)
+    queries = vectors[rng.choice(args.size, args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    ids = np.arange(args.size, dtype=np.int64)
+
+    started = time.perf_counter()
+    truth = [exact_top_k(vectors, q, args.k) for q in queries]
+    exact_ms = (time.perf_counter() - started) * 1000 / args.queries
+    print(f"{args.size} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k}")
+    print(f"exact brute force: {exact_ms:.2f} ms/query\n")
+
+    default_nlist = int(4 * np.sqrt(args.size))
+    for nlist in args.nlist or [default_nlist // 2, default_nlist, default_nlist * 2]:
+        index = IVFIndex(nlist=nlist)
+        started = time.perf_counter()
+        index.train(ids, vectors)
+        print(f"nlist={nlist}  (train {time.perf_counter() - started:.1f}s)")
+        print(f"  {'nprobe':>6}  {'recall':>7}  {'ms/query':>9}  {'speedup':>8}")
+        index.search(queries[0], args.k)  # build bucket lists outside the timing
+        for nprobe in args.nprobe:
+            if nprobe > nlist:
+                continue
+            started = time.perf_counter()
+            results = [index.search(q, args.k, nprobe=nprobe) for q in queries]
+            ms = (time.perf_counter() - started) * 1000 / args.queries
+            recall = np.mean([len(t & {i for i, _ in r}) / args.k for t, r in zip(truth, results)])
+            print(f"  {nprobe:>6}  {recall:>7.3f}  {ms:>9.2f}  {exact_ms / ms:>7.1f}x")
+        print()
+
+
+if __name__ == "__main__":
+    main()
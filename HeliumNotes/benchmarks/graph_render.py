@@ -0,0 +1,113 @@
+"""
+graph_render.py
+Refresh-time benchmark for KnowledgeGraphWidget rendering.
+
+Run from the HeliumNotes directory:
+    python -m benchmarks.graph_render [--sizes 1000 10000 50000 100000] [--legacy]
+
+Renders synthetic laid-out graphs (about two edges per node, in clustered
+communities) offscreen and times render() plus the paint that follows, then
+the average pan/zoom redraw over random viewports zoomed out, mid and close.
+--legacy also times the old one-item-per-edge/label approach for sizes up
+to 10k, for comparison.
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+from ui.knowledge_graph_view import KnowledgeGraphWidget  # noqa: E402
+
+TYPES = ["note", "task", "plan", "pattern"]
+
+
+def synthetic_graph(n, rng):
+    nodes = [(TYPES[i % len(TYPES)], i) for i in range(n)]
+    labels = [f"{t} {i}" for t, i in nodes]
+    communities = rng.integers(0, max(1, n // 200), n)
+    centers = rng.normal(scale=10, size=(communities.max() + 1, 2))
+    positions = centers[communities] + rng.normal(size=(n, 2))
+    # Nine in ten edges stay inside a community.
+    order = np.argsort(communities)
+    bounds = np.searchsorted(communities[order], np.arange(communities.max() + 2))
+    a = rng.integers(0, n, 2 * n)
+    c = communities[a]
+    inside = order[bounds[c] + (rng.random(2 * n) * (bounds[c + 1] - bounds[c])).astype(np.int64)]
+    b = np.where(rng.random(2 * n) < 0.9, inside, rng.integers(0, n, 2 * n))
+    edges = np.stack([a, b], axis=1)
+    degrees = np.bincount(edges.reshape(-1), minlength=n)
+    return nodes, labels, positions, edges, degrees, communities
+
+
+def pan_zoom_ms(app, widget, positions, rng, fraction, moves=10):
+    """Average redraw after moving a viewport of the given width fraction."""
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    size = (high - low) * fraction
+    total = 0.0
+    for _ in range(moves):
+        corner = low + rng.random(2) * (high - low - size)
+        widget.plot.getViewBox().setRange(xRange=(corner[0], corner[0] + size[0]),
+                                          yRange=(corner[1], corner[1] + size[1]), padding=0)
+        total += timed(app, widget, widget._update_lod)
+    return total / moves
+
+
+def legacy_render(plot, nodes, labels, positions, edges):
+    import pyqtgraph as pg
+
+    plot.clear()
+    for a, b in edges:
+        plot.addItem(pg.PlotDataItem(positions[[a, b], 0], positions[[a, b], 1], pen=pg.mkPen((180, 180, 180), width=1)))
+    brushes = [pg.mkBrush(*KnowledgeGraphWidget.COLORS.get(t, (180, 180, 180)), 200) for t, _ in nodes]
+    plot.addItem(pg.ScatterPlotItem(pos=positions, size=12, brush=brushes, pen=pg.mkPen("w")))
+    for (x, y), label in zip(positions, labels):
+        item = pg.TextItem(label, anchor=(0.5, -1.0))
+        item.setPos(x, y)
+        plot.addItem(item)
+
+
+def timed(app, widget, fn):
+    started = time.perf_counter()
+    fn()
+    widget.view.grab()  # force a paint of the scene
+    app.processEvents()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10_000, 50_000, 100_000])
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    widget = KnowledgeGraphWidget()
+    widget.resize(1200, 800)
+    widget.show()
+    app.processEvents()
+    rng = np.random.default_rng(0)
+
+    print(f"  {'nodes':>7}  {'first ms':>9}  {'again ms':>9}  {'out ms':>7}  {'mid ms':>7}  "
+          f"{'close ms':>8}  {'legacy ms':>10}")
+    for n in args.sizes:
+        graph = synthetic_graph(n, rng)
+        widget._graph = None
+        first = timed(app, widget, lambda: widget.render(*graph))
+        again = timed(app, widget, lambda: widget.render(*graph))
+        zoom = [pan_zoom_ms(app, widget, graph[2], rng, f) for f in (1.0, 0.2, 0.02)]
+        legacy = "-"
+        if args.legacy and n <= 10_000:
+            legacy_widget = KnowledgeGraphWidget()
+            legacy_widget._ensure_view()
+            legacy = f"{timed(app, legacy_widget, lambda: legacy_render(legacy_widget.plot, *graph[:4])):.0f}"
+            legacy_widget.deleteLater()
+        print(f"  {n:>7}  {first:>9.0f}  {again:>9.0f}  {zoom[0]:>7.0f}  {zoom[1]:>7.0f}  "
+              f"{zoom[2]:>8.0f}  {legacy:>10}")
+
+
+if __name__ == "__main__":
+    main()
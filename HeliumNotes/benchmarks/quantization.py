@@ -0,0 +1,68 @@
+"""
+quantization.py
+Memory, query latency and recall@k of f16/i8 vector storage against float32.
+
+Run from the HeliumNotes directory:
+    python -m benchmarks.quantization [--size 100000] [--dim 384] [--queries 200] [--k 10]
+
+Uses synthetic clustered vectors so it runs without the embedding model;
+the same VectorCodec/VectorIndex code paths serve the real embeddings table.
+"index MB" includes the float32 copy of part of an f16 index
+(VectorIndex.FLOAT_CACHE_FRACTION); "vs f32" is query latency relative to
+the float32 index.
+"""
+
+import argparse
+import time
+import numpy as np
+from benchmarks.ann_recall import clustered_vectors
+from core.vector_codec import VectorCodec
+from core.vector_index import VectorIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = clustered_vectors(args.size, args.dim, max(16, args.size // 200), rng)
+    queries = vectors[rng.choice(args.size, args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    ids = np.arange(args.size, dtype=np.int64)
+
+    print(f"{args.size} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k} vs f32\n")
+    print(f"  {'dtype':>5}  {'B/vector':>8}  {'index MB':>9}  {'saved MB':>9}  "
+          f"{'decode ms':>9}  {'ms/query':>9}  {'vs f32':>6}  {'recall':>7}")
+
+    truth, baseline_mb, baseline_ms = None, None, None
+    for dtype in ("f32", "f16", "i8"):
+        # Round-trip through the stored form, as a load from the database would.
+        encoded = VectorCodec.encode(vectors, dtype)
+        started = time.perf_counter()
+        decoded = VectorCodec.decode([b for b, _ in encoded], [dtype] * len(encoded), [s for _, s in encoded])
+        decode_ms = (time.perf_counter() - started) * 1000
+        del encoded
+
+        index = VectorIndex.build(ids, decoded, dtype)
+        del decoded
+        index.search_passages(queries[0], args.k)
+        started = time.perf_counter()
+        results = [[hit["note_id"] for hit in index.search_passages(q, args.k)] for q in queries]
+        ms = (time.perf_counter() - started) * 1000 / args.queries
+
+        if truth is None:
+            truth = [set(r) for r in results]
+        recall = np.mean([len(t & set(r)) / args.k for t, r in zip(truth, results)])
+        mb = index.nbytes() / (1024 * 1024)
+        baseline_mb = baseline_mb or mb
+        baseline_ms = baseline_ms or ms
+        print(f"  {dtype:>5}  {VectorCodec.bytes_per_vector(args.dim, dtype):>8}  {mb:>9.1f}  "
+              f"{baseline_mb - mb:>9.1f}  {decode_ms:>9.1f}  {ms:>9.2f}  {ms / baseline_ms:>5.2f}x  {recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+startup.py
+Start-up time benchmark: per-module import cost and time to first paint.
+
+Run from the HeliumNotes directory:
+    python -m benchmarks.startup [--budget-ms 1500] [--runs 3]
+
+Import costs come from `python -X importtime`, one fresh interpreter per
+module. Time to first paint runs the app's own main() under
+QT_QPA_PLATFORM=offscreen in a child process that watches the main window
+with a ui.first_paint.FirstPaint filter; the time runs from process spawn
+until the window's first paint event has been handled. With --budget-ms
+the exit status is 1 when the median exceeds the budget, so CI can catch
+regressions.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(APP_DIR, " main.py")
+
+# Child process: run main.py's main() unchanged, except that the window it
+# opens is watched for its first paint, which is reported before quitting.
+PAINT_HARNESS = """
+import runpy
+from PyQt6.QtWidgets import QApplication
+from ui.first_paint import FirstPaint
+
+app_main = runpy.run_path({main!r})["main"]
+open_main_window = app_main.__globals__["open_main_window"]
+
+def painted():
+    print("HELIUMNOTES_FIRST_PAINT", flush=True)
+    QApplication.instance().quit()
+
+def open_watched_window():
+    window = open_main_window()
+    FirstPaint(window, painted)
+    return window
+
+app_main.__globals__["open_main_window"] = open_watched_window
+app_main()
+"""
+
+# Modules on the path from main.py to a usable window, cheapest first.
+MODULES = [
+    "data.database",
+    "models.note_model",
+    "core.ai_engines",
+    "core.semantic_search",
+    "PyQt6.QtWidgets",
+    "ui.vision_board",
+    "ui.knowledge_graph_view",
+    "ui.main_window",
+]
+
+
+def import_profile(module):
+    """Return (cumulative_us, [(self_us, name), ...]) for importing module."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1:]
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    top = next((r[1] for r in rows if r[2] == module), sum(r[0] for r in rows))
+    return top, sorted(((r[0], r[2]) for r in rows), reverse=True)
+
+
+def first_paint_ms():
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", PAINT_HARNESS.format(main=MAIN)], cwd=APP_DIR, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        if line.startswith("HELIUMNOTES_FIRST_PAINT"):
+            elapsed = (time.perf_counter() - started) * 1000
+            proc.wait(timeout=30)
+            return elapsed
+    proc.wait()
+    raise RuntimeError(proc.stderr.read().strip().splitlines()[-1] if proc.stderr else "app exited early")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="heaviest individual imports to list")
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    print("Import time (cumulative, fresh interpreter):")
+    heaviest = {}
+    for module in MODULES:
+        total, rows = import_profile(module)
+        if total is None:
+            print(f"  {module:<28} failed: {' '.join(rows)}")
+            continue
+        print(f"  {module:<28} {total / 1000:8.1f} ms")
+        for self_us, name in rows:
+            heaviest[name] = max(heaviest.get(name, 0), self_us)
+
+    print("\nHeaviest single imports (self time):")
+    for name, self_us in sorted(heaviest.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {name:<40} {self_us / 1000:8.1f} ms")
+
+    print("\nTime to first paint:")
+    try:
+        runs = [first_paint_ms() for _ in range(args.runs)]
+    except Exception as exc:
+        print(f"  failed: {exc}")
+        return 1
+    median = statistics.median(runs)
+    print(f"  median {median:.0f} ms over {len(runs)} runs (min {min(runs):.0f}, max {max(runs):.0f})")
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"  REGRESSION: over budget of {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
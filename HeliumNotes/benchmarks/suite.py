@@ -0,0 +1,362 @@
+"""
+suite.py
+End-to-end benchmark suite on synthetic data seeded from the bundled books.
+
+Run from the HeliumNotes directory:
+    python -m benchmarks.suite [--scales 1000 10000] [--repeat 5] [--out results.json]
+    python -m benchmarks.suite --compare baseline.json [--threshold 0.2]
+
+For each scale (number of notes) a fresh database is filled with notes cut
+from "The Count of Monte Cristo.TXT" and "كنز الملك سليمان.TXT", about two
+tasks per note (a third of them done), a plan per five notes and a relation
+per two notes, all drawn from a seeded RNG so every run sees the same data.
+It then times NoteModel CRUD, SemanticSearch.index_notes/search,
+GraphStore loading and VisionKnowledge.build_graph, VisionBoardWidget
+.load_from_db, a full PatternMiner.update and the ReflectionAssistant
+reports.
+
+Embeddings come from HashEmbedder, a deterministic bag-of-words hashing
+model, so the suite runs offline; --real-model uses sentence-transformers.
+Benchmarks whose dependencies are missing (PyQt6, networkx) are recorded
+as skipped. Results are written as JSON; with --compare, medians are
+checked against a baseline file and the exit status is 1 when any is
+slower by more than --threshold (and by more than --min-ms).
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(APP_DIR)
+BOOKS = ("The Count of Monte Cristo.TXT", "كنز الملك سليمان.TXT")
+TAGS = ("goal", "project", "book", "idea", "work", "personal", "reading", "travel")
+STATUSES = ("pending", "in_progress", "done")
+
+
+class HashEmbedder:
+    """
+    Stand-in for SentenceTransformer: each word adds a signed unit to a
+    crc32-chosen dimension, and the sum is normalized. Deterministic across
+    runs and processes, and texts sharing words get similar vectors.
+    """
+
+    TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in self.TOKEN_RE.findall(text.lower())),
+                                 dtype=np.uint32)
+            if len(hashes):
+                signs = np.where(hashes & 1, 1.0, -1.0).astype(np.float32)
+                np.add.at(out[row], (hashes >> 1) % self.dim, signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+def load_paragraphs():
+    """Paragraphs of at least 40 characters from each bundled book."""
+    paragraphs = []
+    for book in BOOKS:
+        with open(os.path.join(REPO_DIR, book), "r", encoding="utf-8-sig", errors="replace") as f:
+            text = f.read()
+        paragraphs.append([p.strip() for p in re.split(r"\n\s*\n", text) if len(p.strip()) >= 40])
+    return paragraphs
+
+
+def generate_dataset(scale: int, paragraphs, seed: int = 0) -> dict:
+    """Notes, tasks, plans and relations for `scale` notes, as model tuples."""
+    rng = np.random.default_rng(seed)
+    notes = []
+    for _ in range(scale):
+        book = paragraphs[0] if rng.random() < 0.7 else paragraphs[1]
+        start = int(rng.integers(0, len(book) - 4))
+        content = "\n\n".join(book[start:start + int(rng.integers(1, 5))])
+        title = " ".join(content.split()[:6])
+        tags = ", ".join(rng.choice(TAGS, size=int(rng.integers(0, 4)), replace=False))
+        notes.append((title, content, tags))
+
+    def sentence():
+        book = paragraphs[int(rng.random() < 0.3)]
+        return re.split(r"(?<=[.!?؟])\s", book[int(rng.integers(0, len(book)))])[0][:80]
+
+    tasks = [(int(rng.integers(0, scale)), sentence()) for _ in range(2 * scale)]
+    statuses = rng.choice(STATUSES, size=len(tasks), p=(0.5, 0.17, 0.33))
+    plans = [(int(rng.integers(0, scale)), sentence(), sentence()) for _ in range(max(1, scale // 5))]
+    relations = [(int(rng.integers(0, scale)), int(rng.integers(0, len(plans)))) for _ in range(scale // 2)]
+    queries = [" ".join(sentence().split()[:8]) for _ in range(20)]
+    return {"notes": notes, "tasks": tasks, "statuses": [str(s) for s in statuses],
+            "plans": plans, "relations": relations, "queries": queries}
+
+
+def reset_state(db_path: str, real_model: bool = False):
+    """Point every module-level cache at a fresh database."""
+    from data import database
+    from core.ai_engines import AIEngines
+    from core.embedding_worker import EmbeddingWorker
+    from core.graph_store import GraphStore
+    from core.semantic_search import SemanticSearch
+    from core.vector_index import VectorIndex
+
+    database.close_connection()
+    database.DB_PATH = db_path
+    VectorIndex._shared = None
+    SemanticSearch._ann, SemanticSearch._ann_checked, SemanticSearch._table_ready = None, False, False
+    GraphStore._shared = None
+    AIEngines._embedding_cache = None
+    if not real_model:
+        AIEngines.EMBEDDING_MODEL = "benchmark-hash-embedder"
+        AIEngines._embedding_model = HashEmbedder()
+    # Embed on demand in the timed calls, not on a background thread.
+    EmbeddingWorker.enabled = False
+    database.init_db()
+
+
+def load_dataset(data) -> dict:
+    """Write the dataset through the bulk model API; returns load timings."""
+    from data.database import transaction
+    from models.note_model import NoteModel
+    from models.plan_model import PlanModel
+    from models.task_model import TaskModel
+
+    timings = {}
+    started = time.perf_counter()
+    note_ids = []
+    for start in range(0, len(data["notes"]), 1000):
+        note_ids += NoteModel.create_many(data["notes"][start:start + 1000])
+    timings["load_notes"] = single((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with transaction() as conn:
+        task_ids = TaskModel.create_many([(note_ids[i], text) for i, text in data["tasks"]])
+        TaskModel.update_many([(t, s) for t, s in zip(task_ids, data["statuses"]) if s != "pending"])
+        plan_ids = PlanModel.create_many([(note_ids[i], o, t) for i, o, t in data["plans"]])
+        conn.executemany(
+            "INSERT INTO relations (from_id, to_id, relation_type, from_type, to_type) VALUES (?, ?, ?, 'note', 'plan')",
+            [(note_ids[a], plan_ids[b], "supports") for a, b in data["relations"]],
+        )
+    timings["load_tasks_plans_relations"] = single((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def single(ms: float) -> dict:
+    return {"median_ms": ms, "min_ms": ms, "runs": 1}
+
+
+def measure(fn, repeat: int, per: int = 1, setup=None) -> dict:
+    """Run fn `repeat` times; report median/min milliseconds per `per` operations."""
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) * 1000 / per)
+    return {"median_ms": statistics.median(runs), "min_ms": min(runs), "runs": repeat}
+
+
+def guarded(fn):
+    """Call fn(); missing optional dependencies and failures become markers."""
+    try:
+        return fn()
+    except ModuleNotFoundError as exc:
+        return {"skipped": str(exc)}
+    except Exception as exc:
+        return {"error": f"{type(exc).__name__}: {exc}"}
+
+
+def bench_crud(repeat: int, ops: int = 50) -> dict:
+    from models.note_model import NoteModel
+
+    rng = np.random.default_rng(1)
+    total = NoteModel.list_page(limit=1)[0][0]["id"]
+    created = []
+
+    def create():
+        created[:] = [NoteModel.create(f"bench {i}", "benchmark note body " * 20, "bench, idea") for i in range(ops)]
+
+    def delete():
+        for note_id in created:
+            NoteModel.delete(note_id)
+
+    results = {
+        "note_create": measure(create, repeat, ops, setup=lambda: created and delete()),
+        "note_get": measure(lambda: [NoteModel.get(int(i)) for i in rng.integers(1, total, ops)], repeat, ops),
+        "note_update": measure(lambda: [NoteModel.update(i, "edited", "edited body", "bench") for i in created],
+                               repeat, ops),
+        "note_list_page": measure(lambda: NoteModel.list_page(limit=50), repeat),
+        "note_find_by_tags": measure(lambda: NoteModel.find_by_tags(any_of=["goal"], all_of=["project"]), repeat),
+        "note_delete": measure(delete, repeat, ops, setup=create),
+        "note_create_many_1000": measure(
+            lambda: created.__setitem__(slice(None), NoteModel.create_many(
+                [(f"bulk {i}", "bulk body " * 20, "bench") for i in range(1000)])),
+            repeat, setup=lambda: created and delete()),
+    }
+    delete()
+    return results
+
+
+def bench_search(queries, repeat: int) -> dict:
+    from core.semantic_search import SemanticSearch
+    from core.vector_index import VectorIndex
+
+    started = time.perf_counter()
+    stats = SemanticSearch.index_notes()
+    results = {"semantic_index": dict(single((time.perf_counter() - started) * 1000), **stats)}
+    results["semantic_index_noop"] = measure(SemanticSearch.index_notes, repeat)
+    VectorIndex._shared = None
+    results["vector_index_load"] = measure(lambda: VectorIndex.shared().search(np.ones(384, np.float32), 1),
+                                           1, setup=lambda: setattr(VectorIndex, "_shared", None))
+    results["semantic_search"] = measure(lambda: [SemanticSearch.search(q, top_k=10, exact=True) for q in queries],
+                                         repeat, len(queries))
+    results["semantic_search_passages"] = measure(
+        lambda: [SemanticSearch.search_passages(q, top_k=10, exact=True) for q in queries], repeat, len(queries))
+    return results
+
+
+def bench_graph(repeat: int) -> dict:
+    from core.graph_store import GraphStore
+    from core.vision_knowledge import VisionKnowledge
+
+    def cold():
+        GraphStore._shared = None
+        GraphStore.shared().sync()
+
+    return {
+        "graph_load": measure(cold, repeat),
+        "graph_sync_noop": measure(lambda: GraphStore.shared().sync(), repeat),
+        "build_graph": guarded(lambda: measure(VisionKnowledge.build_graph, repeat)),
+    }
+
+
+def bench_vision_board(repeat: int) -> dict:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from ui.vision_board import VisionBoardWidget
+
+    app = QApplication.instance() or QApplication([])
+    widget = VisionBoardWidget()
+    result = measure(widget.load_from_db, repeat)
+    widget.deleteLater()
+    app.processEvents()
+    return result
+
+
+def bench_pattern_mining() -> dict:
+    """One background update() over the whole dataset (later ones only see new rows)."""
+    from core.pattern_miner import PatternMiner
+
+    return measure(PatternMiner.update, 1)
+
+
+def bench_reflection(report: str, repeat: int) -> dict:
+    from core.reflection_assistant import ReflectionAssistant
+
+    return measure(getattr(ReflectionAssistant, report), repeat)
+
+
+def run_scale(scale: int, paragraphs, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="heliumnotes-bench-")
+    try:
+        reset_state(os.path.join(workdir, "bench.db"), args.real_model)
+        data = generate_dataset(scale, paragraphs, args.seed)
+        results = load_dataset(data)
+        results.update(bench_crud(args.repeat))
+        search = guarded(lambda: bench_search(data["queries"], args.repeat))
+        results.update({"semantic_index": search} if "skipped" in search or "error" in search else search)
+        results.update(bench_graph(args.repeat))
+        results["vision_board_load"] = guarded(lambda: bench_vision_board(args.repeat))
+        results["pattern_mining"] = guarded(bench_pattern_mining)
+        results["reflection_weekly"] = guarded(lambda: bench_reflection("generate_weekly_reflection", args.repeat))
+        results["reflection_daily_focus"] = guarded(lambda: bench_reflection("generate_daily_focus", args.repeat))
+        return results
+    finally:
+        from data import database
+        database.close_connection()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_ms: float) -> list:
+    """Print a comparison table and return the regressed (scale, benchmark) pairs."""
+    regressions = []
+    print(f"\n  {'scale':>7}  {'benchmark':<28} {'baseline ms':>12} {'current ms':>11} {'ratio':>7}")
+    for scale, results in current["results"].items():
+        base = baseline.get("results", {}).get(scale, {})
+        for name, result in results.items():
+            old = base.get(name, {})
+            if "median_ms" not in result or "median_ms" not in old:
+                continue
+            ratio = result["median_ms"] / max(old["median_ms"], 1e-9)
+            slower = ratio > 1 + threshold and result["median_ms"] - old["median_ms"] > min_ms
+            if slower:
+                regressions.append((scale, name))
+            print(f"  {scale:>7}  {name:<28} {old['median_ms']:>12.2f} {result['median_ms']:>11.2f} "
+                  f"{ratio:>6.2f}x{'  REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="*", default=[1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown ratio (0.2 = 20%%)")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    parser.add_argument("--real-model", action="store_true", help="embed with sentence-transformers")
+    args = parser.parse_args()
+
+    paragraphs = load_paragraphs()
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "embedder": "sentence-transformers" if args.real_model else "hash",
+        },
+        "results": {},
+    }
+    for scale in args.scales:
+        started = time.perf_counter()
+        results = run_scale(scale, paragraphs, args)
+        report["results"][str(scale)] = results
+        print(f"\n{scale} notes ({time.perf_counter() - started:.1f} s)")
+        for name, result in results.items():
+            if "median_ms" in result:
+                print(f"  {name:<28} {result['median_ms']:>10.2f} ms")
+            else:
+                print(f"  {name:<28} {result.get('skipped') and 'skipped: ' + result['skipped'] or result['error']}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nWrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_ms)
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
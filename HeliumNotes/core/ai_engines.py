@@ -3,29 +3,81 @@ ai_engines.py
 Provides access to small local or API-based AI models like Phi-3-mini.
 """
 
+import logging
 import os
+import threading
 from typing import List
-from sentence_transformers import SentenceTransformer
 import numpy as np
+from core.embedding_cache import EmbeddingCache
+from core.summarizer import Summarizer
+from core.telemetry import Telemetry
 
 
 class AIEngines:
     """Central class for embedding and reasoning models."""
 
+    EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
     _embedding_model = None
+    _embedding_cache = None
+    _model_lock = threading.Lock()
 
     @staticmethod
     def get_embedding_model():
         """Load and cache the small embedding model."""
         if AIEngines._embedding_model is None:
-            AIEngines._embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+            with AIEngines._model_lock:
+                if AIEngines._embedding_model is None:
+                    # Deferred: importing sentence_transformers pulls in torch.
+                    from sentence_transformers import SentenceTransformer
+                    AIEngines._embedding_model = SentenceTransformer(AIEngines.EMBEDDING_MODEL)
         return AIEngines._embedding_model
 
+    @staticmethod
+    def warm_up_async() -> threading.Thread:
+        """Load the embedding model and run one encode on a background thread."""
+        def warm_up():
+            try:
+                AIEngines.get_embedding_model().encode(["warm-up"])
+            except Exception:
+                logging.getLogger(__name__).exception("Embedding model warm-up failed")
+
+        thread = threading.Thread(target=warm_up, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def get_embedding_cache():
+        """Open the persistent embedding cache on first use."""
+        if AIEngines._embedding_cache is None:
+            AIEngines._embedding_cache = EmbeddingCache(AIEngines.EMBEDDING_MODEL)
+        return AIEngines._embedding_cache
+
     @staticmethod
     def embed_text(text: str) -> np.ndarray:
         """Compute embedding vector for given text."""
-        model = AIEngines.get_embedding_model()
-        return np.array(model.encode([text])[0])
+        return AIEngines.embed_texts([text])[0]
+
+    @staticmethod
+    def embed_texts(texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embed a batch of texts, running the model only for cache misses."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        cache = AIEngines.get_embedding_cache()
+        vectors = cache.get_many(texts)
+        misses = [i for i, v in enumerate(vectors) if v is None]
+        Telemetry.count("embedding_texts_total", len(texts))
+        if misses:
+            model = AIEngines.get_embedding_model()
+            Telemetry.count("embedding_batches_total")
+            Telemetry.count("embedding_cache_misses_total", len(misses))
+            with Telemetry.timer("embedding_batch_ms"):
+                fresh = np.asarray(model.encode([texts[i] for i in misses], batch_size=batch_size),
+                                   dtype=np.float32)
+            cache.put_many([texts[i] for i in misses], fresh)
+            for i, vec in zip(misses, fresh):
+                vectors[i] = vec
+        return np.vstack(vectors).astype(np.float32, copy=False)
 
     @staticmethod
     def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
@@ -33,11 +85,9 @@ class AIEngines:
         return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
 
     @staticmethod
-    def summarize_text(text: str) -> str:
-        """Mock summarizer using simple heuristics (replaceable by Phi-3-mini)."""
-        sentences = text.split(".")
-        summary = ". ".join(sentences[:3])
-        return summary.strip() + "..."
+    def summarize_text(text: str, sentences: int = 3) -> str:
+        """Extractive summary (TextRank over TF-IDF, see core.summarizer)."""
+        return Summarizer.summarize(text, sentences)
 
     @staticmethod
     def generate_reflection_report(entries: List[str]) -> str:
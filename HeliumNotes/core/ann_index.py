@@ -0,0 +1,275 @@
+"""
+ann_index.py
+Inverted-file (IVF) approximate nearest-neighbour index written in NumPy.
+"""
+
+import os
+import threading
+import numpy as np
+from core.vector_codec import VectorCodec
+from data import database
+
+
+class IVFIndex:
+    """
+    Vectors are bucketed by their nearest k-means centroid. A query scans
+    only the `nprobe` closest buckets, trading recall for latency:
+
+    - nlist:  number of buckets (more = smaller buckets, faster, lower recall)
+    - nprobe: buckets scanned per query (more = higher recall, slower)
+
+    Vectors are stored L2-normalized, so scores are cosine similarities.
+    New vectors are assigned to their nearest bucket without retraining;
+    removed ids are tombstoned until the next train() or compact().
+
+    save() compacts and writes the whole index. Between saves,
+    flush_journal() appends the adds and removes made since to a journal
+    next to it, which load() replays. checkpoint() picks between the two.
+    """
+
+    FILE_SUFFIX = ".ivf.npz"
+    JOURNAL_SUFFIX = ".ivf.journal"
+    # checkpoint() does a full save past either limit.
+    COMPACT_RATIO = 0.25
+    JOURNAL_LIMIT_MB = 32
+    _ADD, _REMOVE = 1, 2
+
+    def __init__(self, nlist: int = 256, nprobe: int = 8):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self.centroids = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._lists = np.empty(0, dtype=np.int32)
+        self._dead = set()
+        self._buckets = None
+        # Appended since the last bucket rebuild; merged lazily at query time.
+        self._pending = []
+        # (op, ids, vectors) not yet written to the sidecar or its journal.
+        self._journal = []
+
+    @staticmethod
+    def default_path():
+        """Sidecar file next to the SQLite database."""
+        return os.path.splitext(database.DB_PATH)[0] + IVFIndex.FILE_SUFFIX
+
+    @staticmethod
+    def journal_path(path: str = None):
+        return (path or IVFIndex.default_path())[:-len(IVFIndex.FILE_SUFFIX)] + IVFIndex.JOURNAL_SUFFIX
+
+    def __len__(self):
+        return len(self._ids) + sum(len(p[0]) for p in self._pending) - len(self._dead)
+
+    def max_id(self) -> int:
+        """Largest id ever added, or -1 when empty."""
+        with self._lock:
+            parts = [self._ids] + [p[0] for p in self._pending]
+            return max((int(p.max()) for p in parts if len(p)), default=-1)
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def train(self, ids, vectors, iterations: int = 10, sample: int = None, seed: int = 0):
+        """
+        Run spherical k-means on a sample of vectors (64 per bucket by
+        default) and index them all. Replaces any existing contents.
+        """
+        vectors = VectorCodec.normalize(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(self.nlist, len(vectors)))
+
+        sample = sample or max(64 * nlist, 10_000)
+        train_set = vectors if len(vectors) <= sample else vectors[rng.choice(len(vectors), sample, replace=False)]
+        centroids = train_set[rng.choice(len(train_set), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._assign(train_set, centroids)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            empty = counts == 0
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(train_set[order], starts[~empty], axis=0)
+            # Re-seed empty buckets from random points so nlist stays useful.
+            sums[empty] = train_set[rng.choice(len(train_set), int(empty.sum()))]
+            centroids = VectorCodec.normalize(sums)
+
+        with self._lock:
+            self.centroids = centroids
+            self._ids = ids
+            self._vectors = vectors
+            self._lists = self._assign(vectors, centroids)
+            self._dead = set()
+            self._pending = []
+            self._journal = []
+            self._buckets = None
+
+    @staticmethod
+    def _assign(vectors, centroids, block: int = 65536):
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block):
+            out[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+        return out
+
+    def add(self, ids, vectors):
+        """Insert vectors into their nearest existing buckets."""
+        if not self.trained:
+            raise RuntimeError("IVFIndex.add() called before train()")
+        vectors = VectorCodec.normalize(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            self._dead.difference_update(ids.tolist())
+            self._pending.append((ids, vectors, self._assign(vectors, self.centroids)))
+            self._journal.append((self._ADD, ids, vectors))
+
+    def remove(self, ids):
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        with self._lock:
+            self._dead.update(ids.tolist())
+            self._journal.append((self._REMOVE, ids, None))
+
+    def _consolidate(self):
+        """Fold pending inserts in and rebuild the per-bucket row lists."""
+        if self._pending:
+            self._ids = np.concatenate([self._ids] + [p[0] for p in self._pending])
+            self._vectors = np.vstack([self._vectors.reshape(-1, self.centroids.shape[1])] + [p[1] for p in self._pending])
+            self._lists = np.concatenate([self._lists] + [p[2] for p in self._pending])
+            self._pending = []
+            self._buckets = None
+        if self._buckets is None:
+            order = np.argsort(self._lists, kind="stable")
+            bounds = np.searchsorted(self._lists[order], np.arange(len(self.centroids) + 1))
+            self._buckets = (order, bounds)
+
+    def compact(self):
+        """Physically drop tombstoned vectors."""
+        with self._lock:
+            self._consolidate()
+            if not self._dead:
+                return
+            keep = ~np.isin(self._ids, np.fromiter(self._dead, dtype=np.int64))
+            self._ids, self._vectors, self._lists = self._ids[keep], self._vectors[keep], self._lists[keep]
+            self._dead = set()
+            self._buckets = None
+
+    def search(self, query_vec, top_k: int = 10, nprobe: int = None):
+        """Return [(id, score), ...] from the nprobe buckets closest to the query."""
+        if not self.trained:
+            return []
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        q = VectorCodec.normalize(query_vec)[0]
+        with self._lock:
+            self._consolidate()
+            order, bounds = self._buckets
+            ids, vectors, dead = self._ids, self._vectors, self._dead
+
+        probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        rows = np.concatenate([order[bounds[b]:bounds[b + 1]] for b in probe])
+        if len(rows) == 0:
+            return []
+        scores = vectors[rows] @ q
+        k = min(top_k + len(dead), len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for i in top:
+            row_id = int(ids[rows[i]])
+            if row_id not in dead:
+                hits.append((row_id, float(scores[i])))
+                if len(hits) == top_k:
+                    break
+        return hits
+
+    def save(self, path: str = None):
+        """Compact, then persist to an .npz sidecar (written to a temp file, then renamed)."""
+        path = path or self.default_path()
+        with self._lock:
+            self.compact()
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    ids=self._ids,
+                    vectors=self._vectors,
+                    lists=self._lists,
+                    dead=np.fromiter(self._dead, dtype=np.int64),
+                    params=np.array([self.nlist, self.nprobe], dtype=np.int64),
+                )
+            os.replace(tmp, path)
+            self._journal = []
+            if os.path.exists(self.journal_path(path)):
+                os.remove(self.journal_path(path))
+
+    def flush_journal(self, path: str = None):
+        """Append the adds and removes made since the last save or flush to the journal."""
+        with self._lock:
+            if not self._journal:
+                return
+            with open(self.journal_path(path), "ab") as f:
+                for op, ids, vectors in self._journal:
+                    dim = 0 if vectors is None else vectors.shape[1]
+                    np.save(f, np.array([op, len(ids), dim], dtype=np.int64))
+                    np.save(f, ids)
+                    if vectors is not None:
+                        np.save(f, vectors)
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal = []
+
+    def checkpoint(self, path: str = None) -> bool:
+        """
+        Persist changes made since the last save: append them to the journal,
+        or save in full once tombstones pass COMPACT_RATIO of the rows or the
+        journal would pass JOURNAL_LIMIT_MB. Returns True for a full save.
+        """
+        with self._lock:
+            if not self._journal:
+                return False
+            rows = len(self._ids) + sum(len(p[0]) for p in self._pending)
+            journal = self.journal_path(path)
+            size = os.path.getsize(journal) if os.path.exists(journal) else 0
+            size += sum(ids.nbytes + (0 if vectors is None else vectors.nbytes) for _, ids, vectors in self._journal)
+            full = len(self._dead) > self.COMPACT_RATIO * rows or size > self.JOURNAL_LIMIT_MB * 1024 * 1024
+            if full:
+                self.save(path)
+            else:
+                self.flush_journal(path)
+            return full
+
+    def _replay(self, path: str):
+        """Apply a journal; a record cut short by a crash ends the replay."""
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    op, count, dim = (int(v) for v in np.load(f))
+                    ids = np.load(f)
+                    vectors = np.load(f) if op == self._ADD else None
+                except (EOFError, ValueError, OSError):
+                    break
+                if op == self._ADD:
+                    self.add(ids, vectors)
+                else:
+                    self.remove(ids)
+        # Replayed operations are already on disk.
+        self._journal = []
+
+    @staticmethod
+    def load(path: str = None):
+        """Load a saved index, or return None when no sidecar exists."""
+        path = path or IVFIndex.default_path()
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            nlist, nprobe = (int(v) for v in data["params"])
+            index = IVFIndex(nlist=nlist, nprobe=nprobe)
+            index.centroids = data["centroids"]
+            index._ids = data["ids"]
+            index._vectors = data["vectors"]
+            index._lists = data["lists"]
+            index._dead = set(data["dead"].tolist())
+        if os.path.exists(IVFIndex.journal_path(path)):
+            index._replay(IVFIndex.journal_path(path))
+        return index
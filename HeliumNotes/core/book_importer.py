@@ -0,0 +1,122 @@
+"""
+book_importer.py
+Streams large plain-text books into notes, one note per chapter/section.
+"""
+
+import os
+import re
+import sys
+import time
+from data.database import transaction
+from models.note_model import NoteModel
+
+
+class BookImporter:
+    """Imports .TXT files incrementally with batched inserts in one transaction."""
+
+    # A short line such as "Chapter 1. Marseilles", "CHAPTER IV." or "الفصل الأول".
+    # The numeral must end the line or be followed by heading punctuation or a
+    # capitalised title, so prose like "part I did with great vigour." is not one.
+    HEADING_RE = re.compile(
+        r"^\s*(?:(?:chapter|section|part)\s+(?:\d+|[ivxlcdm]+)(?=\s*$|\s*[.:\-\u2014]|\s+(?-i:[A-Z\"'\u201c]))"
+        r"|(?:الفصل|الباب|القسم|الجزء)\s+\S+)",
+        re.IGNORECASE,
+    )
+    HEADING_MAX_CHARS = 120
+    # Limits that keep memory bounded whatever the file size.
+    BATCH_NOTES = 50
+    BATCH_CHARS = 4 * 1024 * 1024
+    MAX_NOTE_CHARS = 1024 * 1024
+
+    @staticmethod
+    def is_heading(line: str) -> bool:
+        return len(line) <= BookImporter.HEADING_MAX_CHARS and bool(BookImporter.HEADING_RE.match(line))
+
+    @staticmethod
+    def iter_sections(lines):
+        """
+        Yield (heading, text) pairs from an iterable of lines.
+        Text before the first heading is yielded with heading None. A bare
+        heading ("CHAPTER I.") takes a following upper-case line as its
+        subtitle. Sections longer than MAX_NOTE_CHARS are split into parts.
+        """
+        heading, parts, size, part_no = None, [], 0, 1
+        awaiting_subtitle = False
+
+        def section_title():
+            return heading if part_no == 1 else f"{heading or ''} (part {part_no})".strip()
+
+        for raw in lines:
+            line = raw.rstrip("\r\n")
+            stripped = line.strip()
+
+            if awaiting_subtitle and stripped:
+                awaiting_subtitle = False
+                if stripped.isupper() and len(stripped) <= BookImporter.HEADING_MAX_CHARS:
+                    heading = f"{heading} {stripped}"
+                    continue
+
+            if stripped and BookImporter.is_heading(stripped):
+                text = "\n".join(parts).strip()
+                if text:
+                    yield section_title(), text
+                heading, parts, size, part_no = stripped, [], 0, 1
+                # "CHAPTER I." with nothing after the number.
+                awaiting_subtitle = not re.search(r"[^\W\d_]{2,}", BookImporter.HEADING_RE.sub("", stripped, count=1))
+                continue
+
+            parts.append(line)
+            size += len(line) + 1
+            if size >= BookImporter.MAX_NOTE_CHARS:
+                yield section_title(), "\n".join(parts).strip()
+                parts, size, part_no = [], 0, part_no + 1
+
+        text = "\n".join(parts).strip()
+        if text:
+            yield section_title(), text
+
+    @staticmethod
+    def import_file(path: str, title: str = None, tags: str = "book"):
+        """
+        Import a UTF-8 text file as notes and return throughput statistics.
+        The file is read line by line; notes are written with
+        NoteModel.create_many in batches inside a single transaction.
+        """
+        title = title or os.path.splitext(os.path.basename(path))[0]
+        started = time.perf_counter()
+        notes = 0
+
+        with transaction():
+            batch, batch_chars = [], 0
+            with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+                for heading, text in BookImporter.iter_sections(f):
+                    note_title = f"{title} — {heading}" if heading else title
+                    batch.append((note_title, text, tags))
+                    batch_chars += len(text)
+                    if len(batch) >= BookImporter.BATCH_NOTES or batch_chars >= BookImporter.BATCH_CHARS:
+                        NoteModel.create_many(batch)
+                        notes += len(batch)
+                        batch, batch_chars = [], 0
+            if batch:
+                NoteModel.create_many(batch)
+                notes += len(batch)
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        size = os.path.getsize(path)
+        return {
+            "notes": notes,
+            "bytes": size,
+            "seconds": elapsed,
+            "mb_per_s": size / (1024 * 1024) / elapsed,
+            "notes_per_s": notes / elapsed,
+        }
+
+
+if __name__ == "__main__":
+    for book in sys.argv[1:]:
+        stats = BookImporter.import_file(book)
+        print(
+            f"{os.path.basename(book)}: {stats['notes']} notes, "
+            f"{stats['bytes'] / (1024 * 1024):.2f} MB in {stats['seconds']:.2f}s "
+            f"({stats['mb_per_s']:.1f} MB/s, {stats['notes_per_s']:.0f} notes/s)"
+        )
@@ -0,0 +1,145 @@
+"""
+embedding_cache.py
+Content-addressed cache of embedding vectors: an in-process LRU in front of
+a size-bounded SQLite file next to the main database.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from data import database
+
+
+class EmbeddingCache:
+    """Maps hash(model name, normalized text) -> float32 vector."""
+
+    MEMORY_ENTRIES = 4096
+    DISK_ENTRIES = 500_000
+    FILE_SUFFIX = ".embcache.db"
+
+    def __init__(self, model_name: str, path: str = None,
+                 memory_entries: int = None, disk_entries: int = None):
+        self.model_name = model_name
+        self.path = path or os.path.splitext(database.DB_PATH)[0] + self.FILE_SUFFIX
+        self.memory_entries = memory_entries or self.MEMORY_ENTRIES
+        self.disk_entries = disk_entries or self.DISK_ENTRIES
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key BLOB PRIMARY KEY,
+                vector BLOB,
+                last_used REAL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache(last_used)")
+        self._conn.commit()
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Unicode NFC with whitespace runs collapsed, so trivial edits still hit."""
+        return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")).digest()
+
+    def get_many(self, texts):
+        """Return a list aligned with texts holding cached vectors or None."""
+        keys = [self.key(t) for t in texts]
+        found = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._memory.get(k)
+                if vec is not None:
+                    self._memory.move_to_end(k)
+                    found[i] = vec
+                    self.hits_memory += 1
+                else:
+                    missing.setdefault(k, []).append(i)
+
+            if missing:
+                disk_hits = []
+                batch = list(missing)
+                for start in range(0, len(batch), 500):
+                    part = batch[start:start + 500]
+                    marks = ",".join("?" * len(part))
+                    disk_hits += self._conn.execute(
+                        f"SELECT key, vector FROM cache WHERE key IN ({marks})", part
+                    ).fetchall()
+                now = time.time()
+                for k, blob in disk_hits:
+                    vec = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(k, vec)
+                    for i in missing.pop(k):
+                        found[i] = vec
+                        self.hits_disk += 1
+                if disk_hits:
+                    self._conn.executemany("UPDATE cache SET last_used=? WHERE key=?", [(now, k) for k, _ in disk_hits])
+                    self._conn.commit()
+                self.misses += sum(len(v) for v in missing.values())
+        return found
+
+    def put_many(self, texts, vectors):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vec in zip(texts, vectors):
+                vec = np.asarray(vec, dtype=np.float32)
+                k = self.key(text)
+                self._remember(k, vec)
+                rows.append((k, vec.tobytes(), now))
+            self._conn.executemany("INSERT OR REPLACE INTO cache (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            self._disk_count += len(rows)
+            if self._disk_count > self.disk_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _remember(self, k, vec):
+        self._memory[k] = vec
+        self._memory.move_to_end(k)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Drop least recently used disk entries down to 90% of the bound."""
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess = self._disk_count - int(self.disk_entries * 0.9)
+        if excess > 0 and self._disk_count > self.disk_entries:
+            self._conn.execute("""
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY last_used LIMIT ?
+                )
+            """, (excess,))
+            self._disk_count -= excess
+
+    def stats(self) -> dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk_count,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self._disk_count = 0
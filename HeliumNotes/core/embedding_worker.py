@@ -0,0 +1,142 @@
+"""
+embedding_worker.py
+Background thread that keeps embeddings current as notes are written.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingWorker:
+    """
+    Note writes call notify(); the worker coalesces bursts of events per
+    note, waits for a short quiet period, then re-indexes the affected notes
+    in micro-batches. notify() only takes a lock and never touches SQLite or
+    the model, so it is safe to call from the Qt UI thread.
+
+    Notes in a batch that fails are queued again and retried one at a time
+    with exponential backoff, up to MAX_RETRIES times.
+    """
+
+    DEBOUNCE_SECONDS = 0.25
+    MAX_BATCH = 64
+    RETRY_SECONDS = 1.0
+    MAX_RETRY_SECONDS = 60.0
+    MAX_RETRIES = 5
+    # Set to False to skip background embedding (e.g. during bulk imports).
+    enabled = True
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # note_id -> monotonic time it may be processed from.
+        self._pending = {}
+        # note_id -> failed attempts so far.
+        self._attempts = {}
+        self._last_event = 0.0
+        self._in_progress = 0
+        self._thread = None
+        self.processed = 0
+        self.failures = 0
+
+    @staticmethod
+    def shared():
+        with EmbeddingWorker._shared_lock:
+            if EmbeddingWorker._shared is None:
+                EmbeddingWorker._shared = EmbeddingWorker()
+            return EmbeddingWorker._shared
+
+    @staticmethod
+    def note_changed(note_id: int):
+        """Entry point for the model layer."""
+        if EmbeddingWorker.enabled:
+            EmbeddingWorker.shared().notify(note_id)
+
+    def notify(self, note_id: int):
+        with self._cond:
+            self._pending[note_id] = time.monotonic()
+            self._last_event = time.monotonic()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-worker", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def queue_depth(self) -> int:
+        """Notes waiting to be (re-)embedded, including those in the batch in progress."""
+        with self._cond:
+            return len(self._pending) + self._in_progress
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until every queued note is processed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._last_event = 0.0  # skip the debounce wait
+            self._cond.notify_all()
+            while self._pending or self._in_progress:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _take_batch(self):
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                ready = [note_id for note_id, due in self._pending.items() if due <= now]
+                if not ready:
+                    self._cond.wait(min(self._pending.values()) - now)
+                    continue
+                quiet = now - self._last_event
+                if quiet < self.DEBOUNCE_SECONDS and len(ready) < self.MAX_BATCH:
+                    self._cond.wait(self.DEBOUNCE_SECONDS - quiet)
+                    continue
+                # Retries go alone so one bad note cannot keep failing the rest.
+                retries = [note_id for note_id in ready if note_id in self._attempts]
+                batch = retries[:1] or ready[:self.MAX_BATCH]
+                for note_id in batch:
+                    del self._pending[note_id]
+                self._in_progress = len(batch)
+                return batch
+
+    def _retry_later(self, batch):
+        """Queue a failed batch again with backoff, dropping notes out of retries."""
+        with self._cond:
+            for note_id in batch:
+                attempts = self._attempts.get(note_id, 0) + 1
+                if attempts > self.MAX_RETRIES:
+                    self._attempts.pop(note_id, None)
+                    logger.error("Giving up embedding note %s after %d attempts", note_id, attempts)
+                    continue
+                self._attempts[note_id] = attempts
+                delay = min(self.RETRY_SECONDS * 2 ** (attempts - 1), self.MAX_RETRY_SECONDS)
+                self._pending.setdefault(note_id, time.monotonic() + delay)
+
+    def _run(self):
+        # Imported here so note writes never pay for loading the search stack.
+        from core.semantic_search import SemanticSearch
+
+        while True:
+            batch = self._take_batch()
+            try:
+                SemanticSearch.index_notes(note_ids=batch)
+                self.processed += len(batch)
+                with self._cond:
+                    for note_id in batch:
+                        self._attempts.pop(note_id, None)
+            except Exception:
+                self.failures += 1
+                logger.exception("Background embedding failed for notes %s", batch)
+                self._retry_later(batch)
+            finally:
+                with self._cond:
+                    self._in_progress = 0
+                    self._cond.notify_all()
@@ -0,0 +1,168 @@
+"""
+graph_layout.py
+Vectorized force-directed graph layout with cached, warm-startable positions.
+"""
+
+from datetime import datetime
+import numpy as np
+from data.database import get_connection
+
+
+class ForceLayout:
+    """
+    Fruchterman-Reingold layout in NumPy.
+
+    Repulsion is exact up to EXACT_NODES nodes. Above that, every node is
+    repelled by the centroids of a GRID x GRID cell grid weighted by cell
+    population (a one-level Barnes-Hut), so an iteration costs O(n * GRID²)
+    rather than O(n²). Positions are persisted in the graph_layout table so
+    a later layout starts from them and only new nodes move freely.
+    """
+
+    EXACT_NODES = 3000
+    GRID = 16
+    ITERATIONS = 100
+    WARM_ITERATIONS = 30
+    # Largest first step as a fraction of the layout's extent.
+    TEMPERATURE = 0.1
+    WARM_TEMPERATURE = 0.02
+    # Step multiplier for nodes that already had a cached position.
+    WARM_MOBILITY = 0.05
+    PROGRESS_EVERY = 5
+    BLOCK_PAIRS = 2_000_000
+
+    @staticmethod
+    def load_positions() -> dict:
+        """Return {node_key: (x, y)} for every cached node."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT node_key, x, y FROM graph_layout")
+        positions = {r["node_key"]: (r["x"], r["y"]) for r in cursor.fetchall()}
+        conn.close()
+        return positions
+
+    @staticmethod
+    def save_positions(keys, positions, removed=()):
+        """Upsert the positions of keys and drop the cached ones of removed nodes."""
+        conn = get_connection()
+        now = datetime.now().isoformat()
+        conn.executemany("""
+            INSERT INTO graph_layout (node_key, x, y, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(node_key) DO UPDATE SET x=excluded.x, y=excluded.y, updated_at=excluded.updated_at
+        """, [(key, float(x), float(y), now) for key, (x, y) in zip(keys, positions)])
+        conn.executemany("DELETE FROM graph_layout WHERE node_key = ?", [(key,) for key in removed])
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def initial_positions(keys, edges, cached: dict, seed: int = 0):
+        """
+        Return (positions, mobility, warm) to pass to run().
+        Cached nodes keep their place with low mobility; a new node starts
+        at the mean of its cached neighbours, or at random inside the
+        cached layout's bounds when it has none.
+        """
+        n = len(keys)
+        rng = np.random.default_rng(seed)
+        known = np.array([key in cached for key in keys], dtype=bool)
+        positions = np.zeros((n, 2))
+        if known.any():
+            positions[known] = [cached[key] for key, k in zip(keys, known) if k]
+            low, high = positions[known].min(axis=0), positions[known].max(axis=0)
+        else:
+            low, high = np.full(2, -1.0), np.full(2, 1.0)
+        spread = np.maximum(high - low, 1e-3)
+        new = ~known
+        positions[new] = low + rng.random((int(new.sum()), 2)) * spread
+
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        if len(edges) and known.any() and new.any():
+            # Pull each new node next to the cached nodes it is linked to.
+            a, b = np.concatenate([edges[:, 0], edges[:, 1]]), np.concatenate([edges[:, 1], edges[:, 0]])
+            use = new[a] & known[b]
+            count = np.bincount(a[use], minlength=n)
+            linked = count > 0
+            for axis in (0, 1):
+                total = np.bincount(a[use], weights=positions[b[use], axis], minlength=n)
+                positions[linked, axis] = total[linked] / count[linked]
+            positions[linked] += rng.normal(scale=0.02, size=(int(linked.sum()), 2)) * spread
+
+        mobility = np.where(known, ForceLayout.WARM_MOBILITY, 1.0)
+        warm = bool(n) and known.mean() > 0.5
+        return positions, mobility, warm
+
+    @staticmethod
+    def _repulsion(pos, k2):
+        n = len(pos)
+        out = np.zeros_like(pos)
+        if n <= ForceLayout.EXACT_NODES:
+            sources, weights = pos, np.ones(n)
+        else:
+            grid = ForceLayout.GRID
+            low = pos.min(axis=0)
+            cell = np.maximum((pos.max(axis=0) - low) / grid, 1e-9)
+            ij = np.minimum(((pos - low) / cell).astype(np.int64), grid - 1)
+            flat = ij[:, 0] * grid + ij[:, 1]
+            weights = np.bincount(flat, minlength=grid * grid).astype(float)
+            filled = weights > 0
+            sources = np.stack([np.bincount(flat, weights=pos[:, axis], minlength=grid * grid)[filled]
+                                for axis in (0, 1)], axis=1) / weights[filled][:, None]
+            weights = weights[filled]
+        # sum_j w_j k² (p_i - s_j) / |p_i - s_j|², evaluated in float32 blocks.
+        sx, sy = sources[:, 0].astype(np.float32), sources[:, 1].astype(np.float32)
+        weights = (weights * k2).astype(np.float32)
+        eps = np.float32(1e-4 * k2)
+        block = max(1, ForceLayout.BLOCK_PAIRS // len(sources))
+        for start in range(0, n, block):
+            px = pos[start:start + block, 0:1].astype(np.float32)
+            py = pos[start:start + block, 1:2].astype(np.float32)
+            dx, dy = px - sx, py - sy
+            d2 = dx * dx
+            d2 += dy * dy
+            d2 += eps
+            strength = np.divide(weights, d2, out=d2)
+            total = strength.sum(axis=1)
+            out[start:start + block, 0] = px[:, 0] * total - strength @ sx
+            out[start:start + block, 1] = py[:, 0] * total - strength @ sy
+        return out
+
+    @staticmethod
+    def _attraction(pos, edges, k):
+        if not len(edges):
+            return np.zeros_like(pos)
+        a, b = edges[:, 0], edges[:, 1]
+        delta = pos[a] - pos[b]
+        force = delta * (np.linalg.norm(delta, axis=1, keepdims=True) / k)
+        n = len(pos)
+        return np.stack([np.bincount(b, weights=force[:, axis], minlength=n)
+                         - np.bincount(a, weights=force[:, axis], minlength=n) for axis in (0, 1)], axis=1)
+
+    @staticmethod
+    def run(positions, edges, mobility=None, warm: bool = False, progress=None, cancel=None):
+        """
+        Refine positions and return them, or None if cancel (a
+        threading.Event) was set. progress(iteration, positions) is called
+        every PROGRESS_EVERY iterations with a copy of the current layout.
+        A warm run is shorter and cooler so cached nodes stay put.
+        """
+        pos = np.array(positions, dtype=float)
+        n = len(pos)
+        if n < 2:
+            return pos
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        mobility = np.ones(n) if mobility is None else np.asarray(mobility, dtype=float)
+        iterations = ForceLayout.WARM_ITERATIONS if warm else ForceLayout.ITERATIONS
+
+        extent = max(float(np.ptp(pos, axis=0).max()), 1e-3)
+        k = extent / np.sqrt(n)
+        temperature = extent * (ForceLayout.WARM_TEMPERATURE if warm else ForceLayout.TEMPERATURE)
+        for i in range(iterations):
+            if cancel is not None and cancel.is_set():
+                return None
+            disp = ForceLayout._repulsion(pos, k * k) + ForceLayout._attraction(pos, edges, k)
+            length = np.maximum(np.linalg.norm(disp, axis=1, keepdims=True), 1e-12)
+            step = temperature * (1 - i / iterations)
+            pos += disp / length * np.minimum(length, step) * mobility[:, None]
+            if progress is not None and (i + 1) % ForceLayout.PROGRESS_EVERY == 0:
+                progress(i + 1, pos.copy())
+        return pos
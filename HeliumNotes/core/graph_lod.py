@@ -0,0 +1,150 @@
+"""
+graph_lod.py
+Level-of-detail helpers for large graphs: cached communities and a spatial grid.
+"""
+
+import numpy as np
+from data.database import get_connection
+
+
+class GraphClusters:
+    """
+    Community detection by label propagation, vectorized with NumPy, with
+    results cached in the graph_communities table. New nodes are assigned
+    from their neighbours' cached communities; the whole graph is only
+    re-clustered once more than RECLUSTER_RATIO of it is new.
+    """
+
+    ITERATIONS = 30
+    RECLUSTER_RATIO = 0.1
+
+    @staticmethod
+    def label_propagation(n: int, edges, iterations: int = None, seed: int = 0) -> np.ndarray:
+        """Return a community id per node (0..C-1); isolated nodes are their own community."""
+        labels = np.arange(n, dtype=np.int64)
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        if not len(edges):
+            return labels
+        src = np.concatenate([edges[:, 0], edges[:, 1]])
+        dst = np.concatenate([edges[:, 1], edges[:, 0]])
+        rng = np.random.default_rng(seed)
+        for _ in range(iterations or GraphClusters.ITERATIONS):
+            # Most common neighbour label per node (the smallest one on ties).
+            pairs, counts = np.unique(src * n + labels[dst], return_counts=True)
+            nodes = pairs // n
+            new_node = np.r_[True, nodes[1:] != nodes[:-1]]
+            segment_max = np.maximum.reduceat(counts, np.flatnonzero(new_node))
+            best_rows = np.flatnonzero(counts == segment_max[np.cumsum(new_node) - 1])
+            first = np.r_[True, nodes[best_rows][1:] != nodes[best_rows][:-1]]
+            best = np.full(n, -1)
+            best[nodes[best_rows][first]] = pairs[best_rows][first] % n
+            # Update a random subset per round so two-colourable graphs do not oscillate.
+            update = (best >= 0) & (rng.random(n) < 0.8)
+            changed = int((labels[update] != best[update]).sum())
+            labels[update] = best[update]
+            if changed <= n // 1000:
+                break
+        return np.unique(labels, return_inverse=True)[1]
+
+    @staticmethod
+    def communities(keys, edges) -> np.ndarray:
+        """Community id per key, from the cache where possible. Cached keys not in keys are dropped."""
+        n = len(keys)
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT node_key, community FROM graph_communities")
+        cached = {r["node_key"]: r["community"] for r in cursor.fetchall()}
+        labels = np.array([cached.get(key, -1) for key in keys], dtype=np.int64)
+        missing = labels < 0
+
+        if cached and missing.sum() <= GraphClusters.RECLUSTER_RATIO * n:
+            if len(cached) > n - int(missing.sum()):
+                # Nodes deleted since they were clustered.
+                present = set(keys)
+                cursor.executemany("DELETE FROM graph_communities WHERE node_key = ?",
+                                   [(key,) for key in cached if key not in present])
+                conn.commit()
+            edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+            if missing.any():
+                # One propagation step restricted to new nodes.
+                src = np.concatenate([edges[:, 0], edges[:, 1]])
+                dst = np.concatenate([edges[:, 1], edges[:, 0]])
+                use = missing[src] & ~missing[dst]
+                for node, label in zip(src[use], labels[dst[use]]):
+                    if labels[node] < 0:
+                        labels[node] = label
+                still = labels < 0
+                labels[still] = labels.max(initial=-1) + 1 + np.arange(int(still.sum()))
+                rows = [(keys[i], int(labels[i])) for i in np.flatnonzero(missing)]
+                cursor.executemany("INSERT OR REPLACE INTO graph_communities (node_key, community) VALUES (?, ?)", rows)
+                conn.commit()
+            conn.close()
+            return labels
+
+        labels = GraphClusters.label_propagation(n, edges)
+        cursor.execute("DELETE FROM graph_communities")
+        cursor.executemany("INSERT INTO graph_communities (node_key, community) VALUES (?, ?)",
+                           [(key, int(label)) for key, label in zip(keys, labels)])
+        conn.commit()
+        conn.close()
+        return labels
+
+
+class SpatialGrid:
+    """Uniform grid over 2-D points answering rectangle queries by cell ranges."""
+
+    def __init__(self, positions, per_cell: int = 16):
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        n = len(self.positions)
+        self.size = int(np.clip(np.sqrt(n / per_cell), 1, 1024))
+        if n:
+            self.low = self.positions.min(axis=0)
+            self.cell = np.maximum((self.positions.max(axis=0) - self.low) / self.size, 1e-9)
+        else:
+            self.low, self.cell = np.zeros(2), np.ones(2)
+        flat = self.cell_of(self.positions)
+        self.order = np.argsort(flat, kind="stable")
+        self.starts = np.searchsorted(flat[self.order], np.arange(self.size * self.size + 1))
+
+    def cell_of(self, points):
+        ij = np.clip(((np.asarray(points) - self.low) / self.cell).astype(np.int64), 0, self.size - 1)
+        return ij[..., 0] * self.size + ij[..., 1]
+
+    def _ranges(self, x0, x1, y0, y1):
+        (i0, j0), (i1, j1) = [np.clip(((np.array(p) - self.low) / self.cell).astype(np.int64), 0, self.size - 1)
+                              for p in ((x0, y0), (x1, y1))]
+        for i in range(i0, i1 + 1):
+            yield self.starts[i * self.size + j0], self.starts[i * self.size + j1 + 1]
+
+    def count(self, x0, x1, y0, y1) -> int:
+        """Points in the cells overlapping the rectangle (an upper bound)."""
+        return int(sum(end - start for start, end in self._ranges(x0, x1, y0, y1)))
+
+    def query(self, x0, x1, y0, y1) -> np.ndarray:
+        """Indices of the points inside the rectangle."""
+        parts = [self.order[start:end] for start, end in self._ranges(x0, x1, y0, y1) if end > start]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(parts)
+        p = self.positions[rows]
+        inside = (p[:, 0] >= x0) & (p[:, 0] <= x1) & (p[:, 1] >= y0) & (p[:, 1] <= y1)
+        return rows[inside]
+
+
+def cluster_summary(positions, clusters, edges):
+    """
+    Collapse nodes into one super-node per cluster.
+    Returns (centroids, counts, cluster_edges) where cluster_edges are
+    the distinct pairs of clusters joined by at least one edge.
+    """
+    positions = np.asarray(positions, dtype=float)
+    k = int(clusters.max()) + 1 if len(clusters) else 0
+    counts = np.bincount(clusters, minlength=k)
+    safe = np.maximum(counts, 1)
+    centroids = np.stack([np.bincount(clusters, weights=positions[:, axis], minlength=k) / safe
+                          for axis in (0, 1)], axis=1)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    pairs = np.sort(clusters[edges], axis=1) if len(edges) else np.empty((0, 2), dtype=np.int64)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    cluster_edges = np.unique(pairs, axis=0) if len(pairs) else pairs
+    return centroids, counts, cluster_edges
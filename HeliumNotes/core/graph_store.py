@@ -0,0 +1,270 @@
+"""
+graph_store.py
+Shared in-memory knowledge graph, kept current from the graph_changes feed.
+"""
+
+import threading
+from collections import deque
+from data.database import get_connection
+
+
+class GraphStore:
+    """
+    Nodes are keyed "note:1", "task:7", "plan:3", "pattern:2". Edges come
+    from tasks.note_id, plans.note_id and the relations table.
+
+    The graph is loaded once; sync() then replays graph_changes rows (written
+    by SQLite triggers on every insert, update and delete) past the last seen
+    sequence number, re-reading only the entities that changed. The feed
+    keeps the last GRAPH_CHANGES_KEEP rows; a store that fell further behind
+    reloads.
+    """
+
+    LABEL_CHARS = 40
+
+    _shared = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.version = 0
+        self._nodes = {}
+        # key -> {neighbour key: edge multiplicity}
+        self._adj = {}
+        # entity key ("task:7", "relation:4") -> (a, b, relation type) it contributes
+        self._sources = {}
+
+    @staticmethod
+    def shared():
+        """Return the process-wide store, creating it on first use."""
+        if GraphStore._shared is None:
+            GraphStore._shared = GraphStore()
+        return GraphStore._shared
+
+    @staticmethod
+    def key(entity_type: str, entity_id) -> str:
+        return f"{entity_type}:{entity_id}"
+
+    # -- maintenance ---------------------------------------------------------
+
+    def _add_edge(self, source, a, b, relation_type):
+        self._remove_edge(source)
+        if a == b:
+            return
+        self._sources[source] = (a, b, relation_type)
+        for x, y in ((a, b), (b, a)):
+            neighbours = self._adj.setdefault(x, {})
+            neighbours[y] = neighbours.get(y, 0) + 1
+
+    def _remove_edge(self, source):
+        edge = self._sources.pop(source, None)
+        if edge is None:
+            return
+        a, b, _ = edge
+        for x, y in ((a, b), (b, a)):
+            neighbours = self._adj.get(x)
+            if neighbours is None or y not in neighbours:
+                continue
+            neighbours[y] -= 1
+            if neighbours[y] <= 0:
+                del neighbours[y]
+            if not neighbours:
+                del self._adj[x]
+
+    def _apply(self, cursor, entity, entity_id):
+        """Re-read one entity and bring its node and edges up to date."""
+        key = self.key(entity, entity_id)
+        limit = self.LABEL_CHARS
+        if entity == "note":
+            row = cursor.execute("SELECT id, title FROM notes WHERE id=?", (entity_id,)).fetchone()
+            if row:
+                self._nodes[key] = {"type": "note", "ref_id": row["id"], "label": row["title"] or f"Note {row['id']}"}
+        elif entity == "task":
+            row = cursor.execute("SELECT id, task, note_id FROM tasks WHERE id=?", (entity_id,)).fetchone()
+            if row:
+                self._nodes[key] = {"type": "task", "ref_id": row["id"], "label": (row["task"] or "")[:limit]}
+        elif entity == "plan":
+            row = cursor.execute("SELECT id, objectives, note_id FROM plans WHERE id=?", (entity_id,)).fetchone()
+            if row:
+                label = (row["objectives"] or "")[:limit] or f"Plan {row['id']}"
+                self._nodes[key] = {"type": "plan", "ref_id": row["id"], "label": label}
+        elif entity == "pattern":
+            row = cursor.execute("SELECT id, issue FROM patterns WHERE id=?", (entity_id,)).fetchone()
+            if row:
+                self._nodes[key] = {"type": "pattern", "ref_id": row["id"], "label": (row["issue"] or "")[:limit]}
+        elif entity == "relation":
+            row = cursor.execute("SELECT * FROM relations WHERE id=?", (entity_id,)).fetchone()
+            if row:
+                self._add_edge(key, self.key(row["from_type"] or "note", row["from_id"]),
+                               self.key(row["to_type"] or "plan", row["to_id"]), row["relation_type"])
+            else:
+                self._remove_edge(key)
+            return
+        else:
+            return
+
+        if not row:
+            self._nodes.pop(key, None)
+            self._remove_edge(key)
+        elif entity in ("task", "plan"):
+            if row["note_id"]:
+                self._add_edge(key, key, self.key("note", row["note_id"]), "belongs_to")
+            else:
+                self._remove_edge(key)
+
+    def load(self):
+        """Build the whole graph from the database."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        with self._lock:
+            # Read the cursor first: changes racing with the scan are replayed.
+            self.version = cursor.execute("SELECT IFNULL(MAX(seq), 0) FROM graph_changes").fetchone()[0]
+            self._nodes, self._adj, self._sources = {}, {}, {}
+            limit = self.LABEL_CHARS
+            for r in cursor.execute("SELECT id, title FROM notes"):
+                self._nodes[self.key("note", r["id"])] = {
+                    "type": "note", "ref_id": r["id"], "label": r["title"] or f"Note {r['id']}"}
+            for r in cursor.execute("SELECT id, task, note_id FROM tasks").fetchall():
+                key = self.key("task", r["id"])
+                self._nodes[key] = {"type": "task", "ref_id": r["id"], "label": (r["task"] or "")[:limit]}
+                if r["note_id"]:
+                    self._add_edge(key, key, self.key("note", r["note_id"]), "belongs_to")
+            for r in cursor.execute("SELECT id, objectives, note_id FROM plans").fetchall():
+                key = self.key("plan", r["id"])
+                self._nodes[key] = {"type": "plan", "ref_id": r["id"],
+                                    "label": (r["objectives"] or "")[:limit] or f"Plan {r['id']}"}
+                if r["note_id"]:
+                    self._add_edge(key, key, self.key("note", r["note_id"]), "belongs_to")
+            for r in cursor.execute("SELECT id, issue FROM patterns"):
+                self._nodes[self.key("pattern", r["id"])] = {
+                    "type": "pattern", "ref_id": r["id"], "label": (r["issue"] or "")[:limit]}
+            for r in cursor.execute("SELECT * FROM relations").fetchall():
+                self._add_edge(self.key("relation", r["id"]), self.key(r["from_type"] or "note", r["from_id"]),
+                               self.key(r["to_type"] or "plan", r["to_id"]), r["relation_type"])
+            self._loaded = True
+        conn.close()
+
+    def sync(self) -> set:
+        """
+        Apply changes logged since the last load/sync and return the keys
+        of the entities that changed (an empty set when nothing did).
+        """
+        if not self._loaded:
+            self.load()
+            return set(self._nodes)
+        conn = get_connection()
+        cursor = conn.cursor()
+        with self._lock:
+            oldest = cursor.execute("SELECT MIN(seq) FROM graph_changes").fetchone()[0]
+            if oldest is not None and oldest > self.version + 1:
+                # Our position was pruned away; start over.
+                conn.close()
+                self.load()
+                return set(self._nodes)
+            rows = cursor.execute(
+                "SELECT seq, entity, entity_id FROM graph_changes WHERE seq > ? ORDER BY seq", (self.version,)
+            ).fetchall()
+            if not rows:
+                conn.close()
+                return set()
+            changed = {(r["entity"], r["entity_id"]) for r in rows}
+            for entity, entity_id in changed:
+                self._apply(cursor, entity, entity_id)
+            self.version = rows[-1]["seq"]
+        conn.close()
+        return {self.key(entity, entity_id) for entity, entity_id in changed}
+
+    # -- queries -------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, key):
+        return key in self._nodes
+
+    def node(self, key: str):
+        return self._nodes.get(key)
+
+    def nodes(self):
+        """Return [(key, attributes), ...] for every node."""
+        with self._lock:
+            return list(self._nodes.items())
+
+    def edges(self):
+        """Return [(a, b), ...] between existing nodes, each edge once."""
+        with self._lock:
+            nodes = self._nodes
+            return [(a, b) for a, neighbours in self._adj.items() if a in nodes
+                    for b in neighbours if a < b and b in nodes]
+
+    def neighbours(self, key: str, depth: int = 1) -> dict:
+        """Return {key: hops} for nodes within depth hops of key (excluding it)."""
+        with self._lock:
+            seen = {key: 0}
+            frontier = [key]
+            for hops in range(1, depth + 1):
+                nxt = []
+                for current in frontier:
+                    for other in self._adj.get(current, ()):
+                        if other not in seen and other in self._nodes:
+                            seen[other] = hops
+                            nxt.append(other)
+                frontier = nxt
+            del seen[key]
+            return seen
+
+    def degree(self, key: str) -> int:
+        return sum(1 for other in self._adj.get(key, ()) if other in self._nodes)
+
+    def shortest_path(self, source: str, target: str, max_depth: int = None):
+        """Return the node keys of a shortest path (both ends included), or None."""
+        with self._lock:
+            if source not in self._nodes or target not in self._nodes:
+                return None
+            if source == target:
+                return [source]
+            # Breadth-first from both ends, always growing the smaller side.
+            parents = ({source: None}, {target: None})
+            frontiers = ([source], [target])
+            depth = 0
+            while frontiers[0] and frontiers[1]:
+                if max_depth is not None and depth >= max_depth:
+                    return None
+                depth += 1
+                side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+                mine, theirs = parents[side], parents[1 - side]
+                nxt = []
+                for current in frontiers[side]:
+                    for other in self._adj.get(current, ()):
+                        if other in mine or other not in self._nodes:
+                            continue
+                        mine[other] = current
+                        if other in theirs:
+                            return self._join(parents, other)
+                        nxt.append(other)
+                frontiers = (nxt, frontiers[1]) if side == 0 else (frontiers[0], nxt)
+            return None
+
+    @staticmethod
+    def _join(parents, meet):
+        path, node = deque(), meet
+        while node is not None:
+            path.appendleft(node)
+            node = parents[0][node]
+        node = parents[1][meet]
+        while node is not None:
+            path.append(node)
+            node = parents[1][node]
+        return list(path)
+
+    def to_networkx(self):
+        """Copy the graph into a networkx.Graph (for analysis code that wants one)."""
+        import networkx as nx
+
+        G = nx.Graph()
+        with self._lock:
+            G.add_nodes_from((key, dict(attrs)) for key, attrs in self._nodes.items())
+            for a, b, relation_type in self._sources.values():
+                if a in self._nodes and b in self._nodes:
+                    G.add_edge(a, b, label=relation_type)
+        return G
@@ -0,0 +1,306 @@
+"""
+pattern_miner.py
+Incremental clustering of tasks and notes into recurring issues (the patterns table).
+"""
+
+import argparse
+import logging
+import threading
+import zlib
+from datetime import datetime
+import numpy as np
+from data.database import close_connection, get_connection, transaction
+from core.ai_engines import AIEngines
+from core.summarizer import Summarizer
+from models.pattern_model import PatternModel
+
+logger = logging.getLogger(__name__)
+
+
+class _Centroids:
+    """Unit-length cluster centroids in a matrix grown by doubling, for nearest-cluster lookups."""
+
+    def __init__(self, ids, means):
+        self.ids = list(ids)
+        self.matrix = None if means is None else self._unit(means)
+
+    @staticmethod
+    def _unit(vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def nearest(self, vector):
+        """Row of the most similar centroid if it reaches PatternMiner.SIMILARITY, else None."""
+        if not self.ids:
+            return None
+        scores = self.matrix[:len(self.ids)] @ self._unit(vector)[0]
+        index = int(np.argmax(scores))
+        return index if scores[index] >= PatternMiner.SIMILARITY else None
+
+    def replace(self, index, mean):
+        self.matrix[index] = self._unit(mean)[0]
+
+    def add(self, cluster_id, vector):
+        unit = self._unit(vector)
+        if self.matrix is None:
+            self.matrix = np.empty((16, unit.shape[1]), dtype=np.float32)
+        elif len(self.ids) == len(self.matrix):
+            self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+        self.matrix[len(self.ids)] = unit[0]
+        self.ids.append(cluster_id)
+
+
+class PatternMiner:
+    """
+    Every task and note is visited once, in id order after the last id
+    recorded per source in pattern_sources, and joins at most one cluster:
+
+    1. Near-duplicates: a MinHash signature of the item's word shingles is
+       cut into LSH_BANDS bands; an item sharing a band bucket with a
+       cluster (word-set Jaccard similarity around 0.5 or more) joins it
+       without being embedded.
+    2. Paraphrases: the rest are embedded in batches and join the cluster
+       whose centroid is closest, if the cosine similarity reaches
+       SIMILARITY. Centroids are running means, so a join costs one update.
+    3. Anything else starts a new cluster.
+
+    A cluster becomes a pattern once it holds MIN_FREQUENCY items, and its
+    frequency then follows the cluster size. Past clusters are never
+    revisited, so an update costs time proportional to the new items only.
+    """
+
+    NOTE_CHARS = 300
+    SOURCES = {
+        # source: query returning (id, text, created_at) rows after an id
+        "task": "SELECT id, task AS text, created_at FROM tasks WHERE id > ? ORDER BY id LIMIT ?",
+        "note": f"SELECT id, IFNULL(title, '') || '. ' || IFNULL(substr(content, 1, {NOTE_CHARS}), '') AS text, "
+                "created_at FROM notes WHERE id > ? ORDER BY id LIMIT ?",
+    }
+    ISSUE_CHARS = 200
+    BATCH_SIZE = 256
+
+    NUM_PERM = 64
+    LSH_BANDS = 16  # 4 rows per band: ~50% Jaccard threshold
+    SIMILARITY = 0.75
+    MIN_FREQUENCY = 2
+    # Centroids held in memory for matching, most recently seen first.
+    MAX_CLUSTERS = 50_000
+    # Seconds between background updates (start_schedule()).
+    UPDATE_INTERVAL = 600
+
+    _update_lock = threading.Lock()
+    _schedule_lock = threading.Lock()
+    _scheduler = None
+    _stop = threading.Event()
+
+    _PRIME = (1 << 32) + 15
+    _rng = np.random.default_rng(0x5EED)
+    _A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+    _B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+    # -- near-duplicates -----------------------------------------------------
+
+    @staticmethod
+    def shingles(text: str) -> set:
+        """Words and word pairs of the folded, stop-word-free text."""
+        words = Summarizer.tokens(text)
+        return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+    @staticmethod
+    def signature(text: str):
+        """MinHash signature (NUM_PERM uint64), or None when the text has no words."""
+        shingles = PatternMiner.shingles(text)
+        if not shingles:
+            return None
+        x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        hashes = (PatternMiner._A[:, None] * x[None, :] + PatternMiner._B[:, None]) % np.uint64(PatternMiner._PRIME)
+        return hashes.min(axis=1)
+
+    @staticmethod
+    def bands(signature) -> list:
+        """(band, bucket) LSH keys of a signature."""
+        rows = PatternMiner.NUM_PERM // PatternMiner.LSH_BANDS
+        return [(band, zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes()))
+                for band in range(PatternMiner.LSH_BANDS)]
+
+    @staticmethod
+    def _near_duplicate(cursor, keys):
+        """The cluster sharing the most LSH buckets with keys, or None."""
+        votes = {}
+        for band, bucket in keys:
+            for r in cursor.execute("SELECT cluster_id FROM pattern_lsh WHERE band=? AND bucket=?", (band, bucket)):
+                votes[r[0]] = votes.get(r[0], 0) + 1
+        return max(votes, key=votes.get) if votes else None
+
+    # -- clusters ------------------------------------------------------------
+
+    @staticmethod
+    def _load_centroids(cursor):
+        cursor.execute("""
+            SELECT id, centroid FROM pattern_clusters WHERE centroid IS NOT NULL
+            ORDER BY last_seen DESC LIMIT ?
+        """, (PatternMiner.MAX_CLUSTERS,))
+        rows = cursor.fetchall()
+        ids = [r["id"] for r in rows]
+        if not rows:
+            return ids, None
+        return ids, np.vstack([np.frombuffer(r["centroid"], dtype=np.float32) for r in rows])
+
+    @staticmethod
+    def _join(cursor, cluster_id: int, seen: str, vector=None):
+        """
+        Add one item to a cluster, promoting it to a pattern once it recurs.
+        Returns the cluster's (running mean) centroid.
+        """
+        row = cursor.execute("SELECT pattern_id, size, label, centroid FROM pattern_clusters WHERE id=?",
+                             (cluster_id,)).fetchone()
+        size = row["size"] + 1
+        centroid = None if row["centroid"] is None else np.frombuffer(row["centroid"], dtype=np.float32)
+        if vector is not None and centroid is not None:
+            centroid = (centroid + (vector - centroid) / size).astype(np.float32)
+        cursor.execute("UPDATE pattern_clusters SET size=?, centroid=?, last_seen=max(last_seen, ?) WHERE id=?",
+                       (size, None if centroid is None else centroid.tobytes(), seen, cluster_id))
+        if row["pattern_id"] is not None:
+            PatternModel.record(row["pattern_id"], size, seen)
+        elif size >= PatternMiner.MIN_FREQUENCY:
+            pattern_id = PatternModel.create(row["label"], size, seen)
+            cursor.execute("UPDATE pattern_clusters SET pattern_id=? WHERE id=?", (pattern_id, cluster_id))
+        return centroid
+
+    @staticmethod
+    def _new_cluster(cursor, text: str, seen: str, vector) -> int:
+        label = " ".join(text.split())[:PatternMiner.ISSUE_CHARS]
+        cursor.execute("INSERT INTO pattern_clusters (size, label, centroid, last_seen) VALUES (1, ?, ?, ?)",
+                       (label, None if vector is None else vector.astype(np.float32).tobytes(), seen))
+        return cursor.lastrowid
+
+    @staticmethod
+    def _mine_batch(source: str, items, matcher, stats):
+        """
+        Cluster one batch of items and advance the source's watermark. The
+        lookups and the model run first, with no transaction open; the
+        resulting writes then take one short transaction.
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
+        # Near-duplicates first, of known clusters or of earlier items in
+        # the batch (followers of a cluster-to-be): they need no embedding.
+        duplicates, unmatched, local = [], [], {}
+        for item in items:
+            text, seen = (item["text"] or "").strip(), item["created_at"] or datetime.now().isoformat()
+            signature = PatternMiner.signature(text)
+            if signature is None:
+                continue
+            keys = PatternMiner.bands(signature)
+            cluster_id = PatternMiner._near_duplicate(cursor, keys)
+            if cluster_id is not None:
+                duplicates.append((cluster_id, seen))
+                continue
+            lead = next((local[k] for k in keys if k in local), None)
+            if lead is not None:
+                unmatched[lead][3].append(seen)
+                stats["duplicates"] += 1
+                continue
+            for k in keys:
+                local[k] = len(unmatched)
+            unmatched.append((text, seen, keys, []))
+        conn.close()
+        vectors = AIEngines.embed_texts([u[0] for u in unmatched]) if unmatched else []
+
+        with transaction() as conn:
+            cursor = conn.cursor()
+            for cluster_id, seen in duplicates:
+                PatternMiner._join(cursor, cluster_id, seen)
+            for (text, seen, keys, followers), vector in zip(unmatched, vectors):
+                index = matcher.nearest(vector)
+                if index is not None:
+                    cluster_id = matcher.ids[index]
+                    matcher.replace(index, PatternMiner._join(cursor, cluster_id, seen, vector))
+                    stats["similar"] += 1
+                else:
+                    cluster_id = PatternMiner._new_cluster(cursor, text, seen, vector)
+                    matcher.add(cluster_id, vector)
+                    stats["new_clusters"] += 1
+                for follower_seen in followers:
+                    PatternMiner._join(cursor, cluster_id, follower_seen)
+                cursor.executemany("INSERT OR IGNORE INTO pattern_lsh (band, bucket, cluster_id) VALUES (?, ?, ?)",
+                                   [(band, bucket, cluster_id) for band, bucket in keys])
+            cursor.execute("INSERT OR REPLACE INTO pattern_sources (source, last_id) VALUES (?, ?)",
+                           (source, items[-1]["id"]))
+        stats["items"] += len(items)
+        stats["duplicates"] += len(duplicates)
+
+    # -- entry points --------------------------------------------------------
+
+    @staticmethod
+    def update(batch_size: int = None) -> dict:
+        """
+        Cluster the tasks and notes added since the previous update and
+        refresh the patterns table. Returns counts of what happened.
+        Runs off the UI thread (see start_schedule()); calls are serialized.
+        """
+        batch_size = batch_size or PatternMiner.BATCH_SIZE
+        stats = {"items": 0, "duplicates": 0, "similar": 0, "new_clusters": 0}
+        with PatternMiner._update_lock:
+            conn = get_connection()
+            cursor = conn.cursor()
+            matcher = _Centroids(*PatternMiner._load_centroids(cursor))
+            for source, query in PatternMiner.SOURCES.items():
+                while True:
+                    row = cursor.execute("SELECT last_id FROM pattern_sources WHERE source=?", (source,)).fetchone()
+                    items = cursor.execute(query, (row["last_id"] if row else 0, batch_size)).fetchall()
+                    if not items:
+                        break
+                    PatternMiner._mine_batch(source, items, matcher, stats)
+            conn.close()
+        return stats
+
+    @staticmethod
+    def start_schedule(interval: float = None) -> threading.Thread:
+        """
+        Run update() now and then every `interval` seconds (UPDATE_INTERVAL)
+        on a daemon thread, so readers such as the weekly reflection only
+        query PatternModel.get_top(). Calling it again is a no-op.
+        """
+        interval = interval or PatternMiner.UPDATE_INTERVAL
+        with PatternMiner._schedule_lock:
+            if PatternMiner._scheduler is None or not PatternMiner._scheduler.is_alive():
+                PatternMiner._stop.clear()
+                PatternMiner._scheduler = threading.Thread(target=PatternMiner._run_schedule, args=(interval,),
+                                                           name="pattern-miner", daemon=True)
+                PatternMiner._scheduler.start()
+            return PatternMiner._scheduler
+
+    @staticmethod
+    def stop_schedule():
+        PatternMiner._stop.set()
+
+    @staticmethod
+    def _run_schedule(interval: float):
+        while not PatternMiner._stop.is_set():
+            try:
+                PatternMiner.update()
+            except Exception:
+                logger.exception("Recurring-issue mining failed")
+            PatternMiner._stop.wait(interval)
+        close_connection()
+
+    @staticmethod
+    def reset():
+        """Forget every cluster and pattern; the next update() starts over."""
+        with transaction() as conn:
+            for table in ("pattern_clusters", "pattern_lsh", "pattern_sources", "patterns"):
+                conn.execute(f"DELETE FROM {table}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the recurring-issue patterns from new tasks and notes.")
+    parser.add_argument("--reset", action="store_true", help="recluster everything from scratch")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.reset:
+        PatternMiner.reset()
+    print(PatternMiner.update())
+    for p in PatternModel.get_top(args.top):
+        print(f"{p['frequency']:>6}  {p['issue']}")
@@ -3,7 +3,7 @@ reflection_assistant.py
 Generates daily focus and weekly reflection summaries.
 """
 
-from datetime import datetime, timedelta
+from models.metrics_model import MetricsModel
 from models.task_model import TaskModel
 from models.plan_model import PlanModel
 from models.pattern_model import PatternModel
@@ -17,30 +17,34 @@ class ReflectionAssistant:
     @staticmethod
     def generate_daily_focus():
         """Summarize top 3 tasks/goals from recent days."""
-        tasks = TaskModel.get_all()[:3]
+        tasks, _ = TaskModel.list_page(limit=3)
         focus_text = "\n".join([t["task"] for t in tasks])
         summary = AIEngines.summarize_text(focus_text)
         return f"🌞 Daily Focus:\n{summary}"
 
     @staticmethod
     def generate_weekly_reflection():
-        """Create weekly report and save to DB."""
-        completed = TaskModel.get_all()[:5]
-        ongoing = PlanModel.get_all()[:3]
-        issues = PatternModel.get_top(3)
+        """Create a report for the last seven days from the metric rollups and save it."""
+        start, end = MetricsModel.week_window()
+        week = MetricsModel.window(start, end)
+        completed = [dict(t) for t in TaskModel.completed_between(start, end, limit=5)]
+        plans = [dict(p) for p in PlanModel.list_page(limit=3, since=start.isoformat())[0]]
+        issues = [dict(i) for i in PatternModel.get_top(3)]
 
         entries = [
-            f"Completed tasks: {len(completed)}",
-            f"Ongoing plans: {len(ongoing)}",
+            f"Completed tasks: {week['tasks_completed']}",
+            f"New tasks: {week['tasks_created']}",
+            f"Plans created: {week['plans_created']}",
+            f"Notes written: {week['notes_created']}",
             f"Top issues: {', '.join([i['issue'] for i in issues])}"
         ]
 
         summary = AIEngines.generate_reflection_report(entries)
         ReflectionModel.create(
-            week_start=datetime.now().date().isoformat(),
-            completed_tasks=str(completed),
-            ongoing_plans=str(ongoing),
-            issues=str(issues),
+            week_start=start.isoformat(),
+            completed_tasks={"count": week["tasks_completed"], "recent": completed},
+            ongoing_plans={"count": week["plans_created"], "recent": plans},
+            issues=issues,
             summary=summary
         )
-        return summary
\ No newline at end of file
+        return summary
@@ -0,0 +1,235 @@
+"""
+reindex.py
+Full embedding rebuild sharded across a process pool, resumable from checkpoints.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from datetime import datetime
+from itertools import chain
+import numpy as np
+from data import database
+from data.database import get_connection, inserted_ids, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class Reindex:
+    """
+    Re-embeds every note. The notes are cut into shards of consecutive ids
+    (about SHARD_CHARS of text each) recorded in reindex_shards. Worker
+    processes each load the model once and turn whole shards into encoded
+    passage rows; the parent process is the only writer and replaces a
+    shard's embeddings and marks it done in one transaction, then swaps the
+    shard's rows in the vector store. An interrupted rebuild therefore
+    resumes with the shards not yet marked done.
+
+    Notes edited during the rebuild carry an older note_updated_at stamp,
+    and notes added after it was planned have no rows; the closing
+    SemanticSearch.index_notes() pass picks both up.
+    """
+
+    SHARD_CHARS = 2_000_000
+    SHARD_NOTES = 1000
+    BATCH_SIZE = 512
+    # "spawn" gives each worker a clean interpreter (and model) on every OS.
+    START_METHOD = "spawn"
+
+    # -- planning ------------------------------------------------------------
+
+    @staticmethod
+    def plan(restart: bool = False) -> int:
+        """
+        Record the shards of a new rebuild unless an unfinished one exists
+        (or restart is set). Returns the number of shards left to do.
+        """
+        with transaction() as conn:
+            cursor = conn.cursor()
+            if restart:
+                cursor.execute("DELETE FROM reindex_shards")
+            left = cursor.execute("SELECT COUNT(*) FROM reindex_shards WHERE done_at IS NULL").fetchone()[0]
+            if left:
+                return left
+            cursor.execute("DELETE FROM reindex_shards")
+            shards, first, last, chars, notes = [], None, None, 0, 0
+            cursor.execute("SELECT id, IFNULL(length(title), 0) + IFNULL(length(content), 0) AS size "
+                           "FROM notes ORDER BY id")
+            for r in cursor:
+                if first is not None and (chars + r["size"] > Reindex.SHARD_CHARS or notes >= Reindex.SHARD_NOTES):
+                    shards.append((first, last))
+                    first, chars, notes = None, 0, 0
+                if first is None:
+                    first = r["id"]
+                last, chars, notes = r["id"], chars + r["size"], notes + 1
+            if first is not None:
+                shards.append((first, last))
+            conn.executemany("INSERT INTO reindex_shards (shard, first_id, last_id) VALUES (?, ?, ?)",
+                             [(i, a, b) for i, (a, b) in enumerate(shards)])
+            return len(shards)
+
+    @staticmethod
+    def pending_shards():
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT shard, first_id, last_id FROM reindex_shards WHERE done_at IS NULL ORDER BY shard")
+        shards = [(r["shard"], r["first_id"], r["last_id"]) for r in cursor.fetchall()]
+        conn.close()
+        return shards
+
+    # -- workers -------------------------------------------------------------
+
+    @staticmethod
+    def _init_worker(db_path: str, dtype: str, threads: int):
+        database.DB_PATH = db_path
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+        from core.semantic_search import SemanticSearch
+        from core.ai_engines import AIEngines
+        SemanticSearch.STORAGE_DTYPE = dtype
+        AIEngines.get_embedding_model()
+
+    @staticmethod
+    def embed_shard(shard):
+        """
+        Worker body: return (shard id, embedding rows, note stamps) for the
+        notes with ids in the shard's range, ready for the writer.
+        """
+        from core.ai_engines import AIEngines
+        from core.semantic_search import SemanticSearch
+        from core.vector_codec import VectorCodec
+
+        shard_id, first_id, last_id = shard
+        conn = get_connection()
+        cursor, reader = conn.cursor(), conn.cursor()
+        cursor.execute("SELECT id, title, updated_at, length(content) AS length FROM notes "
+                       "WHERE id BETWEEN ? AND ? ORDER BY id", (first_id, last_id))
+        passages, stamps = [], []
+        for n in cursor.fetchall():
+            note_id, title, length = n["id"], n["title"] or "", n["length"] or 0
+            parts = lambda note_id=note_id, length=length: SemanticSearch.iter_note_content(reader, note_id, length)
+            chunk = 0
+            for begin, end, passage in SemanticSearch.iter_passages(parts()):
+                passages.append((note_id, chunk, begin, end, f"{title} {passage}"))
+                chunk += 1
+            if chunk == 0:
+                passages.append((note_id, 0, 0, 0, title))
+            stamps.append((SemanticSearch.content_hash(chain((title, " "), parts())), n["updated_at"], note_id))
+        conn.close()
+
+        model = AIEngines.get_embedding_model()
+        dtype = SemanticSearch.STORAGE_DTYPE
+        rows = []
+        for start in range(0, len(passages), Reindex.BATCH_SIZE):
+            batch = passages[start:start + Reindex.BATCH_SIZE]
+            vectors = np.asarray(model.encode([p[4] for p in batch], batch_size=Reindex.BATCH_SIZE),
+                                 dtype=np.float32)
+            rows += [(p[0], p[1], p[2], p[3], blob, dtype, scale)
+                     for p, (blob, scale) in zip(batch, VectorCodec.encode(vectors, dtype))]
+        return shard_id, first_id, last_id, rows, stamps
+
+    # -- writer --------------------------------------------------------------
+
+    @staticmethod
+    def _write(result, store=None):
+        from core.vector_codec import VectorCodec
+
+        shard_id, first_id, last_id, rows, stamps = result
+        with transaction() as conn:
+            dead = [r[0] for r in conn.execute("SELECT id FROM embeddings WHERE note_id BETWEEN ? AND ?",
+                                               (first_id, last_id))]
+            conn.execute("DELETE FROM embeddings WHERE note_id BETWEEN ? AND ?", (first_id, last_id))
+            cursor = conn.executemany("""
+                INSERT INTO embeddings (note_id, chunk, start_offset, end_offset, vector, dtype, scale)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            row_ids = inserted_ids(cursor, "embeddings", len(rows))
+            conn.executemany("UPDATE embeddings SET content_hash=?, note_updated_at=? WHERE note_id=?", stamps)
+            conn.execute("UPDATE reindex_shards SET done_at=? WHERE shard=?", (datetime.now().isoformat(), shard_id))
+        if store is not None:
+            store.remove(dead)
+            store.append(row_ids, [r[0] for r in rows], [r[1] for r in rows], [(r[2], r[3]) for r in rows],
+                         VectorCodec.decode([r[4] for r in rows], [r[5] for r in rows], [r[6] for r in rows]))
+        return len(rows)
+
+    @staticmethod
+    def run(workers: int = None, restart: bool = False, progress=None) -> dict:
+        """
+        Rebuild (or resume rebuilding) every embedding with `workers`
+        processes (default: one per CPU). progress(done, total, passages)
+        is called after each shard is written. Returns run statistics.
+        """
+        from core.semantic_search import SemanticSearch
+        from core.vector_index import VectorIndex
+
+        started = time.perf_counter()
+        SemanticSearch.ensure_table()
+        had_ann = SemanticSearch.ann_index() is not None
+        store = VectorIndex.store()
+        Reindex.plan(restart)
+        conn = get_connection()
+        total = conn.execute("SELECT COUNT(*) FROM reindex_shards").fetchone()[0]
+        conn.close()
+        shards = Reindex.pending_shards()
+        done, passages = total - len(shards), 0
+        workers = max(1, min(workers or os.cpu_count() or 1, len(shards) or 1))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+        if workers == 1:
+            Reindex._init_worker(database.DB_PATH, SemanticSearch.STORAGE_DTYPE, threads)
+            results = map(Reindex.embed_shard, shards)
+            pool = None
+        else:
+            pool = multiprocessing.get_context(Reindex.START_METHOD).Pool(
+                workers, initializer=Reindex._init_worker,
+                initargs=(database.DB_PATH, SemanticSearch.STORAGE_DTYPE, threads),
+            )
+            results = pool.imap_unordered(Reindex.embed_shard, shards)
+        try:
+            for result in results:
+                passages += Reindex._write(result, store)
+                done += 1
+                if progress is not None:
+                    progress(done, total, passages)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        with transaction() as conn:
+            conn.execute("DELETE FROM reindex_shards")
+        # Every embedding id changed: drop the old store rows, reload the
+        # resident index, retrain the ANN index if one was in use, then catch
+        # up with edits made meanwhile.
+        if store is not None:
+            store.compact_if_needed()
+        VectorIndex._shared = None
+        if had_ann:
+            SemanticSearch.build_ann_index()
+        catch_up = SemanticSearch.index_notes()
+        return {
+            "shards": total,
+            "resumed_from": total - len(shards),
+            "passages": passages,
+            "workers": workers,
+            "seconds": time.perf_counter() - started,
+            "catch_up": catch_up,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild every note embedding in parallel, resuming if interrupted.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--restart", action="store_true", help="discard an unfinished rebuild's checkpoints")
+    args = parser.parse_args()
+
+    def report(done, total, passages):
+        print(f"\r{done}/{total} shards, {passages} passages", end="", flush=True)
+
+    stats = Reindex.run(args.workers, args.restart, report)
+    print(f"\n{stats}")
@@ -3,61 +3,474 @@ semantic_search.py
 Handles semantic and AI-powered search through notes using embeddings.
 """
 
+import argparse
+import hashlib
+from itertools import chain
 import numpy as np
 from core.ai_engines import AIEngines
-from data.database import get_connection
+from core.ann_index import IVFIndex
+from core.telemetry import Telemetry
+from core.vector_codec import VectorCodec
+from core.vector_index import VectorIndex
+from core.vector_store import VectorStore
+from data import database
+from data.database import get_connection, get_setting, inserted_ids, migrate, set_setting, transaction
 
 
 class SemanticSearch:
     """Implements embedding storage and semantic retrieval."""
 
+    BATCH_SIZE = 256
+    # MiniLM truncates at 256 word pieces, roughly 1000 characters of prose.
+    PASSAGE_CHARS = 1000
+    PASSAGE_OVERLAP = 200
+    # Long notes are read from SQLite in slices of this many characters.
+    READ_CHARS = 64 * 1024
+    # Precision of newly written vectors: "f32", "f16" or "i8" (see VectorCodec).
+    # Change it with set_precision()/convert_storage() so the index follows;
+    # the choice is saved in the settings table and read by load_precision().
+    STORAGE_DTYPE = "f32"
+    PRECISION_SETTING = "vector_dtype"
+
+    # Optional approximate index, loaded from its sidecar file on first use.
+    _ann = None
+    _ann_checked = False
+    _table_ready = False
+    _precision_db = None
+
     @staticmethod
     def ensure_table():
+        """Create the embeddings table and bring older layouts up to date (see data.database.MIGRATIONS)."""
+        SemanticSearch._table_ready = True
         conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS embeddings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
                 note_id INTEGER,
-                vector BLOB
+                chunk INTEGER DEFAULT 0,
+                start_offset INTEGER,
+                end_offset INTEGER,
+                vector BLOB,
+                dtype TEXT,
+                scale REAL,
+                content_hash TEXT,
+                note_updated_at TEXT
             )
         """)
         conn.commit()
         conn.close()
+        migrate()
+        SemanticSearch.load_precision()
+
+    @staticmethod
+    def iter_note_content(cursor, note_id: int, length: int):
+        """Yield a note's content in READ_CHARS slices instead of loading it whole."""
+        step = SemanticSearch.READ_CHARS
+        for offset in range(0, length, step):
+            cursor.execute("SELECT substr(content, ?, ?) AS part FROM notes WHERE id=?", (offset + 1, step, note_id))
+            row = cursor.fetchone()
+            if row is None or not row["part"]:
+                return
+            yield row["part"]
+
+    @staticmethod
+    def iter_passages(segments, size: int = None, overlap: int = None):
+        """
+        Yield (start, end, text) windows of about `size` characters over a
+        stream of text segments. Consecutive windows share up to `overlap`
+        characters and are snapped to whitespace where possible. Only one
+        read slice plus one window is held in memory at a time.
+        """
+        size = size or SemanticSearch.PASSAGE_CHARS
+        overlap = SemanticSearch.PASSAGE_OVERLAP if overlap is None else overlap
+        segments = iter(segments)
+        buf, pos, buf_start = "", 0, 0
+        exhausted = False
+
+        while True:
+            while not exhausted and len(buf) - pos < size:
+                seg = next(segments, None)
+                if seg is None:
+                    exhausted = True
+                else:
+                    buf, buf_start, pos = buf[pos:] + seg, buf_start + pos, 0
+            if len(buf) - pos <= 0:
+                return
+
+            if exhausted and len(buf) - pos <= size:
+                end = len(buf)
+            else:
+                end = pos + size
+                lo = end - max(overlap // 2, 1)
+                cut = max(buf.rfind(" ", lo, end), buf.rfind("\n", lo, end))
+                if cut > pos:
+                    end = cut
+            text = buf[pos:end]
+            if text.strip():
+                yield buf_start + pos, buf_start + end, text
+            if end == len(buf) and exhausted:
+                return
+
+            nxt = max(end - overlap, pos + 1)
+            space = buf.find(" ", nxt, end)
+            pos = space + 1 if space != -1 else nxt
 
     @staticmethod
-    def index_notes():
-        """Generate and store embeddings for all notes."""
+    def content_hash(parts) -> str:
+        digest = hashlib.sha1()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def index_notes(batch_size: int = None, note_ids=None):
+        """
+        Bring the embeddings table up to date with the notes table, or with
+        just the given note_ids.
+        Only notes whose updated_at moved since the last run are read; of
+        those, only ones whose text actually changed are re-encoded. Long
+        notes are split into overlapping passages and streamed through the
+        model in batches. Embeddings of deleted notes are removed.
+        """
+        batch_size = batch_size or SemanticSearch.BATCH_SIZE
+        if not SemanticSearch._table_ready:
+            SemanticSearch.ensure_table()
+        index = VectorIndex.shared()
+        # Loaded before the first write: a first load reads the embeddings table.
+        ann = SemanticSearch.ann_index()
+        store = VectorIndex.store()
+        stats = {"embedded": 0, "passages": 0, "unchanged": 0, "removed": 0}
+
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT id, title, content FROM notes")
-        notes = cursor.fetchall()
+        reader = conn.cursor()
+
+        scope, params = "", []
+        if note_ids is not None:
+            note_ids = list(note_ids)
+            if not note_ids:
+                return stats
+            scope = f" AND {{col}} IN ({','.join('?' * len(note_ids))})"
+            params = note_ids
+
+        cursor.execute(
+            "SELECT DISTINCT note_id FROM embeddings WHERE note_id NOT IN (SELECT id FROM notes)"
+            + scope.format(col="note_id"), params
+        )
+        orphans = [r["note_id"] for r in cursor.fetchall()]
+        if orphans:
+            marks = ",".join("?" * len(orphans))
+            with transaction():
+                dead = [r["id"] for r in cursor.execute(f"SELECT id FROM embeddings WHERE note_id IN ({marks})", orphans)]
+                cursor.execute(f"DELETE FROM embeddings WHERE note_id IN ({marks})", orphans)
+            if ann is not None:
+                ann.remove(dead)
+            index.remove_many(orphans)
+            stats["removed"] = len(orphans)
+        if store is not None:
+            # Rows of notes deleted without an index_notes run (NoteModel.delete
+            # tombstones them itself, unless the process died first).
+            if note_ids is None:
+                gone = store.deleted_notes(cursor).tolist()
+            else:
+                cursor.execute("SELECT id FROM notes WHERE 1" + scope.format(col="id"), params)
+                present = {r["id"] for r in cursor.fetchall()}
+                gone = [note_id for note_id in note_ids if note_id not in present]
+            store.remove_notes(gone)
+
+        # A note is current when its first passage carries the note's updated_at.
+        cursor.execute("""
+            SELECT n.id, e.note_id IS NOT NULL AS indexed, e.content_hash FROM notes n
+            LEFT JOIN embeddings e ON e.note_id = n.id AND e.chunk = 0
+            WHERE (e.note_id IS NULL OR e.note_updated_at IS NOT n.updated_at)
+        """ + scope.format(col="n.id"), params)
+        stale = cursor.fetchall()
+        known_hashes = {r["id"]: r["content_hash"] for r in stale}
+        indexed = {r["id"] for r in stale if r["indexed"]}
+        stale_ids = [r["id"] for r in stale]
+
+        # pending: passages to embed; replacing: notes whose old passages go
+        # before the first new one is stored; finished: (hash, updated_at, id)
+        # of notes with every passage pending or stored; touched:
+        # (updated_at, id) of notes whose text did not change.
+        pending, replacing, finished, touched = [], [], [], []
+
+        def flush():
+            # The model runs with no transaction open, so writers on other
+            # threads (the UI) never wait for inference; everything it
+            # produced is then written in one short transaction.
+            vectors = AIEngines.embed_texts([p[4] for p in pending], batch_size=batch_size) if pending else None
+            dead, row_ids = [], []
+            with transaction():
+                if replacing:
+                    marks = ",".join("?" * len(replacing))
+                    if ann is not None:
+                        cursor.execute(f"SELECT id FROM embeddings WHERE note_id IN ({marks})", replacing)
+                        dead = [r["id"] for r in cursor.fetchall()]
+                    cursor.execute(f"DELETE FROM embeddings WHERE note_id IN ({marks})", replacing)
+                if pending:
+                    dtype = SemanticSearch.STORAGE_DTYPE
+                    rows = [(p[0], p[1], p[2], p[3], blob, dtype, scale)
+                            for p, (blob, scale) in zip(pending, VectorCodec.encode(vectors, dtype))]
+                    insert = """
+                        INSERT INTO embeddings (note_id, chunk, start_offset, end_offset, vector, dtype, scale)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """
+                    cursor.executemany(insert, rows)
+                    # The vector store and the ANN index are keyed by embeddings.id.
+                    row_ids = inserted_ids(cursor, "embeddings", len(rows))
+                cursor.executemany("UPDATE embeddings SET note_updated_at=? WHERE note_id=?", touched)
+                # Stamp notes only once all of their passages are stored, so an
+                # interrupted run re-embeds them next time.
+                cursor.executemany("UPDATE embeddings SET content_hash=?, note_updated_at=? WHERE note_id=?", finished)
+
+            # The vector store and the in-memory indexes follow the committed rows.
+            if replacing:
+                if store is not None:
+                    store.remove_notes(replacing)
+                if ann is not None:
+                    ann.remove(dead)
+                index.remove_many(replacing)
+            if pending:
+                note_col, chunk_col = [p[0] for p in pending], [p[1] for p in pending]
+                spans = [(p[2], p[3]) for p in pending]
+                if store is not None:
+                    store.append(row_ids, note_col, chunk_col, spans, vectors)
+                if ann is not None:
+                    ann.add(row_ids, vectors)
+                index.add_passages(note_col, chunk_col, spans, vectors)
+            stats["passages"] += len(pending)
+            stats["embedded"] += len(finished)
+            stats["unchanged"] += len(touched)
+            for batch in (pending, replacing, finished, touched):
+                batch.clear()
+
+        for start in range(0, len(stale_ids), batch_size):
+            ids = stale_ids[start:start + batch_size]
+            marks = ",".join("?" * len(ids))
+            cursor.execute(f"""
+                SELECT id, title, updated_at, length(content) AS length,
+                       CASE WHEN length(content) <= ? THEN content END AS content
+                FROM notes WHERE id IN ({marks})
+            """, [SemanticSearch.READ_CHARS] + ids)
 
-        model = AIEngines.get_embedding_model()
+            for n in cursor.fetchall():
+                note_id, title, length = n["id"], n["title"] or "", n["length"] or 0
+                if n["content"] is not None or not length:
+                    parts = lambda content=n["content"] or "": [content]
+                else:
+                    parts = lambda note_id=note_id, length=length: \
+                        SemanticSearch.iter_note_content(reader, note_id, length)
 
-        for n in notes:
-            text = (n["title"] or "") + " " + (n["content"] or "")
-            vector = model.encode([text])[0].astype(np.float32).tobytes()
-            cursor.execute("INSERT INTO embeddings (note_id, vector) VALUES (?, ?)", (n["id"], vector))
+                digest = SemanticSearch.content_hash(chain((title, " "), parts()))
+                if digest == known_hashes.get(note_id):
+                    touched.append((n["updated_at"], note_id))
+                    continue
+                if note_id in indexed:
+                    replacing.append(note_id)
+                chunk = 0
+                for begin, end, passage in SemanticSearch.iter_passages(parts()):
+                    pending.append((note_id, chunk, begin, end, f"{title} {passage}"))
+                    chunk += 1
+                    if len(pending) >= batch_size:
+                        flush()
+                if chunk == 0:
+                    pending.append((note_id, 0, 0, 0, title))
+                finished.append((digest, n["updated_at"], note_id))
+            flush()
 
         conn.commit()
         conn.close()
+        # Full runs rewrite the sidecar; partial ones (EmbeddingWorker batches)
+        # append to its journal until it needs compacting.
+        if ann is not None and (stats["passages"] or stats["removed"]):
+            if note_ids is None:
+                ann.save()
+            else:
+                ann.checkpoint()
+        return stats
 
     @staticmethod
-    def search(query: str, top_k: int = 5):
-        """Find notes semantically similar to query."""
+    def ann_index():
+        """Return the persisted ANN index, or None if build_ann_index() was never run."""
+        if not SemanticSearch._ann_checked:
+            ann = IVFIndex.load()
+            if ann is not None:
+                # Add passages written since the sidecar was last saved.
+                conn = get_connection()
+                cursor = conn.cursor()
+                cursor.execute("SELECT id, vector, dtype, scale FROM embeddings WHERE id > ? AND vector IS NOT NULL",
+                               (ann.max_id(),))
+                rows = cursor.fetchall()
+                conn.close()
+                if rows:
+                    ann.add([r["id"] for r in rows], SemanticSearch._decode_rows(rows))
+            SemanticSearch._ann = ann
+            SemanticSearch._ann_checked = True
+        return SemanticSearch._ann
+
+    @staticmethod
+    def build_ann_index(nlist: int = None, nprobe: int = 8):
+        """
+        Train an IVF index over every stored passage vector and save it next
+        to the database. By default nlist is about 4 * sqrt(passages).
+        Afterwards index_notes keeps it updated incrementally; rebuild when
+        the corpus has grown several-fold so the buckets stay balanced.
+        """
+        SemanticSearch.load_precision()
+        if VectorIndex.USE_STORE:
+            store = VectorStore.open(dtype=VectorIndex.DTYPE)
+            store.catch_up()
+            ids, vectors = store.vectors()
+        else:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, vector, dtype, scale FROM embeddings WHERE vector IS NOT NULL ORDER BY id")
+            rows = cursor.fetchall()
+            conn.close()
+            ids = np.fromiter((r["id"] for r in rows), dtype=np.int64, count=len(rows))
+            vectors = SemanticSearch._decode_rows(rows)
+            del rows
+        if not len(ids):
+            return None
+
+        nlist = nlist or max(1, int(4 * np.sqrt(len(ids))))
+        ann = IVFIndex(nlist=nlist, nprobe=nprobe)
+        ann.train(ids, vectors)
+        ann.save()
+        SemanticSearch._ann, SemanticSearch._ann_checked = ann, True
+        return ann
+
+    @staticmethod
+    def _decode_rows(rows) -> np.ndarray:
+        return VectorCodec.decode([r["vector"] for r in rows], [r["dtype"] for r in rows], [r["scale"] for r in rows])
+
+    @staticmethod
+    def set_precision(dtype: str):
+        """Use dtype for new vectors and for the resident index (reloaded lazily), and save the choice."""
+        VectorCodec.check(dtype)
+        set_setting(SemanticSearch.PRECISION_SETTING, dtype)
+        SemanticSearch._use_precision(dtype)
+
+    @staticmethod
+    def load_precision():
+        """Adopt the precision saved by set_precision(), once per database."""
+        if SemanticSearch._precision_db == database.DB_PATH:
+            return
+        SemanticSearch._precision_db = database.DB_PATH
+        dtype = get_setting(SemanticSearch.PRECISION_SETTING)
+        if dtype in VectorCodec.DTYPES and dtype != VectorIndex.DTYPE:
+            SemanticSearch._use_precision(dtype)
+
+    @staticmethod
+    def _use_precision(dtype: str):
+        SemanticSearch.STORAGE_DTYPE = dtype
+        VectorIndex.DTYPE = dtype
+        VectorIndex._shared = None
+
+    @staticmethod
+    def convert_storage(dtype: str, batch_size: int = 5000, vacuum: bool = False) -> int:
+        """
+        Rewrite stored vectors in another precision, batch by batch, and
+        switch new writes and the search index to it. Returns rows converted.
+        Converting to f16/i8 is lossy; VACUUM afterwards to return the space.
+        """
+        VectorCodec.check(dtype)
+        if not SemanticSearch._table_ready:
+            SemanticSearch.ensure_table()
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT note_id, vector FROM embeddings")
-        rows = cursor.fetchall()
+        converted, last_id = 0, -1
+        while True:
+            cursor.execute("""
+                SELECT id, vector, dtype, scale FROM embeddings
+                WHERE id > ? AND vector IS NOT NULL AND IFNULL(dtype, 'f32') != ?
+                ORDER BY id LIMIT ?
+            """, (last_id, dtype, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            encoded = VectorCodec.encode(SemanticSearch._decode_rows(rows), dtype)
+            cursor.executemany("UPDATE embeddings SET vector=?, dtype=?, scale=? WHERE id=?",
+                               [(blob, dtype, scale, r["id"]) for r, (blob, scale) in zip(rows, encoded)])
+            conn.commit()
+            converted += len(rows)
+            last_id = rows[-1]["id"]
+        if vacuum:
+            conn.execute("VACUUM")
         conn.close()
+        SemanticSearch.set_precision(dtype)
+        return converted
+
+    @staticmethod
+    def _ann_passages(query_vec, top_k: int, nprobe: int = None):
+        """Resolve ANN hits (embeddings ids) to passages; stale ids are skipped."""
+        hits = SemanticSearch.ann_index().search(query_vec, top_k, nprobe=nprobe)
+        if not hits:
+            return []
+        marks = ",".join("?" * len(hits))
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT id, note_id, chunk, start_offset, end_offset FROM embeddings WHERE id IN ({marks})",
+            [h[0] for h in hits],
+        )
+        rows = {r["id"]: r for r in cursor.fetchall()}
+        conn.close()
+        return [
+            {
+                "note_id": rows[i]["note_id"],
+                "chunk": rows[i]["chunk"],
+                "start": rows[i]["start_offset"],
+                "end": rows[i]["end_offset"],
+                "score": score,
+            }
+            for i, score in hits if i in rows
+        ]
+
+    @staticmethod
+    def search(query: str, top_k: int = 5, exact: bool = False, nprobe: int = None):
+        """
+        Find notes semantically similar to query; a note scores as its best
+        passage. Uses the ANN index when one has been built, unless exact.
+        """
+        SemanticSearch.load_precision()
+        with Telemetry.timer("search_stage_ms", "embed"):
+            query_vec = AIEngines.embed_text(query)
+        if exact or SemanticSearch.ann_index() is None:
+            with Telemetry.timer("search_stage_ms", "exact"):
+                return VectorIndex.shared().search(query_vec, top_k)
+        best = {}
+        with Telemetry.timer("search_stage_ms", "ann"):
+            for hit in SemanticSearch._ann_passages(query_vec, top_k * 8, nprobe):
+                best.setdefault(hit["note_id"], hit["score"])
+        return list(best.items())[:top_k]
+
+    @staticmethod
+    def search_passages(query: str, top_k: int = 5, exact: bool = False, nprobe: int = None):
+        """Find the passages most similar to query, with their character offsets."""
+        SemanticSearch.load_precision()
+        with Telemetry.timer("search_stage_ms", "embed"):
+            query_vec = AIEngines.embed_text(query)
+        if exact or SemanticSearch.ann_index() is None:
+            with Telemetry.timer("search_stage_ms", "exact"):
+                return VectorIndex.shared().search_passages(query_vec, top_k)
+        with Telemetry.timer("search_stage_ms", "ann"):
+            return SemanticSearch._ann_passages(query_vec, top_k, nprobe)
 
-        query_vec = AIEngines.embed_text(query)
-        similarities = []
 
-        for row in rows:
-            note_vec = np.frombuffer(row["vector"], dtype=np.float32)
-            score = AIEngines.cosine_similarity(query_vec, note_vec)
-            similarities.append((row["note_id"], score))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the semantic search index.")
+    parser.add_argument("--index", action="store_true", help="bring embeddings up to date with notes")
+    parser.add_argument("--convert", choices=sorted(VectorCodec.DTYPES), help="rewrite stored vectors in this precision")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database after --convert")
+    parser.add_argument("--build-ann", action="store_true", help="train and save the IVF index")
+    args = parser.parse_args()
 
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:top_k]
\ No newline at end of file
+    if args.convert:
+        print(f"Converted {SemanticSearch.convert_storage(args.convert, vacuum=args.vacuum)} vectors to {args.convert}")
+    if args.index:
+        print(SemanticSearch.index_notes())
+    if args.build_ann:
+        ann = SemanticSearch.build_ann_index()
+        print(f"ANN index: {len(ann) if ann else 0} vectors")
@@ -0,0 +1,216 @@
+"""
+summarizer.py
+Extractive TextRank summaries over TF-IDF sentence vectors, streamed in windows.
+"""
+
+import argparse
+import re
+import numpy as np
+from core.text_utils import fold_text
+
+
+class Summarizer:
+    """
+    Sentences are split on Latin and Arabic terminal punctuation (. ! ? … ؟ ۔),
+    not on abbreviations such as "M." or "Dr.". Each window of
+    WINDOW_SENTENCES sentences is ranked by TextRank over the cosine
+    similarity of its TF-IDF vectors (one matrix product per window), and
+    its best CANDIDATES_PER_WINDOW sentences are kept (map). The candidates
+    are then ranked again, window by window until few enough are left to
+    rank at once (reduce). Memory stays bounded by the window size, however
+    long the input.
+    """
+
+    WINDOW_SENTENCES = 200
+    CANDIDATES_PER_WINDOW = 4
+    DAMPING = 0.85
+    ITERATIONS = 50
+    TOLERANCE = 1e-6
+    MIN_TOKENS = 4
+    # A paragraph this long is split without waiting for a blank line.
+    MAX_PARAGRAPH_CHARS = 100_000
+
+    BOUNDARY_RE = re.compile(r"[.!?…؟۔]+[\"'”’»)\]]*(?=\s|$)")
+    TOKEN_RE = re.compile(r"\w+")
+    ABBREVIATIONS = frozenset({
+        "mr", "mrs", "ms", "dr", "st", "mme", "mlle", "messrs", "jr", "sr", "vs", "etc", "no", "vol", "ch",
+        "e.g", "i.e", "p", "pp",
+    })
+    STOP_WORDS = frozenset("""
+        a an and are as at be been but by for from had has have he her his i in is it its me my not of on or
+        she so that the their them then there they this to was we were what when which who will with would
+        you your him all one said no if do did up out into than been very more could upon
+        في من على إلى الى عن مع هذا هذه ذلك التي الذي الذين كان كانت قد ثم او أو و ف ب ل ما لا لم لن ان أن إن
+        هو هي هم نحن انا أنا كل بعد قبل حتى عند بين
+    """.split())
+
+    # -- sentences -----------------------------------------------------------
+
+    @staticmethod
+    def _is_abbreviation(text: str, end: int) -> bool:
+        """True when the '.' ending at `end` closes an abbreviation or an initial."""
+        if text[end - 1] != ".":
+            return False
+        word = re.search(r"([\w.]+)\.$", text[max(0, end - 12):end])
+        if not word:
+            return False
+        word = word.group(1)
+        return (len(word) == 1 and word.isupper()) or word.lower() in Summarizer.ABBREVIATIONS
+
+    @staticmethod
+    def split_sentences(paragraph: str):
+        """Split one paragraph (line breaks already irrelevant) into sentences."""
+        text = " ".join(paragraph.split())
+        sentences, start = [], 0
+        for match in Summarizer.BOUNDARY_RE.finditer(text):
+            end = match.end()
+            if match.group().startswith(".") and Summarizer._is_abbreviation(text, match.start() + 1):
+                continue
+            # “Is it?” he asked. — the sentence goes on after a quotation.
+            following = text[end:end + 2].lstrip()
+            if match.group()[-1] in "\"'”’»" and following[:1].islower():
+                continue
+            sentence = text[start:end].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = end
+        rest = text[start:].strip()
+        if rest:
+            sentences.append(rest)
+        return sentences
+
+    @staticmethod
+    def iter_sentences(lines):
+        """
+        Yield sentences from an iterable of lines. Blank lines end a
+        paragraph; single line breaks inside one (hard-wrapped books) do not.
+        """
+        buffer, size = [], 0
+        for line in lines:
+            if line.strip():
+                buffer.append(line)
+                size += len(line)
+                if size < Summarizer.MAX_PARAGRAPH_CHARS:
+                    continue
+                sentences = Summarizer.split_sentences(" ".join(buffer))
+                # Keep the unfinished last sentence for the next lines.
+                buffer, size = sentences[-1:], len(sentences[-1]) if sentences else 0
+                yield from sentences[:-1]
+            elif buffer:
+                yield from Summarizer.split_sentences(" ".join(buffer))
+                buffer, size = [], 0
+        if buffer:
+            yield from Summarizer.split_sentences(" ".join(buffer))
+
+    @staticmethod
+    def tokens(sentence: str):
+        words = Summarizer.TOKEN_RE.findall(fold_text(sentence).lower())
+        return [w for w in words if w not in Summarizer.STOP_WORDS and not w.isdigit()]
+
+    # -- ranking -------------------------------------------------------------
+
+    @staticmethod
+    def rank(sentences) -> np.ndarray:
+        """TextRank score per sentence (zero for ones under MIN_TOKENS tokens)."""
+        n = len(sentences)
+        vocab, rows, cols = {}, [], []
+        token_counts = np.zeros(n, dtype=np.int64)
+        for i, sentence in enumerate(sentences):
+            words = Summarizer.tokens(sentence)
+            token_counts[i] = len(words)
+            for word in words:
+                rows.append(i)
+                cols.append(vocab.setdefault(word, len(vocab)))
+        if not vocab or n < 2:
+            return (token_counts >= Summarizer.MIN_TOKENS).astype(float)
+
+        v = len(vocab)
+        counts = np.bincount(np.asarray(rows) * v + np.asarray(cols), minlength=n * v).reshape(n, v)
+        tfidf = np.log1p(counts, dtype=np.float32)
+        df = np.count_nonzero(counts, axis=0)
+        tfidf *= (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        tfidf /= np.maximum(np.linalg.norm(tfidf, axis=1, keepdims=True), 1e-12)
+
+        similarity = tfidf @ tfidf.T
+        np.fill_diagonal(similarity, 0)
+        similarity[token_counts < Summarizer.MIN_TOKENS] = 0
+        similarity[:, token_counts < Summarizer.MIN_TOKENS] = 0
+        out_weight = similarity.sum(axis=1, keepdims=True)
+        transition = np.divide(similarity, out_weight, out=np.full_like(similarity, 1.0 / n), where=out_weight > 0)
+
+        d = Summarizer.DAMPING
+        scores = np.full(n, 1.0 / n, dtype=np.float32)
+        for _ in range(Summarizer.ITERATIONS):
+            updated = (1 - d) / n + d * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < Summarizer.TOLERANCE:
+                scores = updated
+                break
+            scores = updated
+        scores[token_counts < Summarizer.MIN_TOKENS] = 0
+        return scores
+
+    @staticmethod
+    def _best(sentences, keep: int):
+        """Indices of the `keep` best-ranked sentences, in their original order."""
+        if len(sentences) <= keep:
+            return list(range(len(sentences)))
+        scores = Summarizer.rank(sentences)
+        top = np.argsort(-scores, kind="stable")[:keep]
+        return sorted(int(i) for i in top)
+
+    @staticmethod
+    def _reduce(candidates, keep: int):
+        """Rank (position, sentence) candidates down to `keep`, window by window."""
+        window = Summarizer.WINDOW_SENTENCES
+        per_window = max(keep, Summarizer.CANDIDATES_PER_WINDOW)
+        while len(candidates) > window and per_window < window // 2:
+            survivors = []
+            for start in range(0, len(candidates), window):
+                part = candidates[start:start + window]
+                survivors += [part[i] for i in Summarizer._best([s for _, s in part], per_window)]
+            candidates = survivors
+        return [candidates[i] for i in Summarizer._best([s for _, s in candidates], keep)]
+
+    # -- entry points --------------------------------------------------------
+
+    @staticmethod
+    def summarize_sentences(sentences, count: int = 3):
+        """Return the `count` most central sentences of a (possibly endless) iterable, in order."""
+        keep = max(count, Summarizer.CANDIDATES_PER_WINDOW)
+        candidates, window = [], []
+        for position, sentence in enumerate(sentences):
+            window.append((position, sentence))
+            if len(window) == Summarizer.WINDOW_SENTENCES:
+                candidates += [window[i] for i in Summarizer._best([s for _, s in window], keep)]
+                window = []
+        if window:
+            candidates += [window[i] for i in Summarizer._best([s for _, s in window], keep)]
+        return [sentence for _, sentence in Summarizer._reduce(candidates, count)]
+
+    @staticmethod
+    def summarize(text: str, count: int = 3) -> str:
+        """Extractive summary of text in at most `count` sentences; short texts come back as they are."""
+        sentences = list(Summarizer.iter_sentences(text.splitlines()))
+        if len(sentences) <= count:
+            return text.strip()
+        return " ".join(Summarizer.summarize_sentences(sentences, count))
+
+    @staticmethod
+    def summarize_file(path: str, count: int = 5) -> str:
+        """Summarize a UTF-8 text file, reading it line by line."""
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            return " ".join(Summarizer.summarize_sentences(Summarizer.iter_sentences(f), count))
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Print an extractive summary of text files.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--sentences", type=int, default=5)
+    args = parser.parse_args()
+
+    for path in args.paths:
+        started = time.perf_counter()
+        summary = Summarizer.summarize_file(path, args.sentences)
+        print(f"{path} ({time.perf_counter() - started:.2f} s):\n{summary}\n")
@@ -0,0 +1,244 @@
+"""
+telemetry.py
+Opt-in timing histograms and counters for the hot paths, exportable as
+Prometheus text or JSON.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from data import database
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in milliseconds (Prometheus style)."""
+
+    BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (max for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_ms": self.sum,
+            "max_ms": self.max,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.BUCKETS_MS] + ["+Inf"], self.counts)),
+        }
+
+
+class _NullTimer:
+    """Shared do-nothing context returned by Telemetry.timer() while disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Telemetry:
+    """
+    Process-wide metrics, off by default. Every entry point returns after
+    one attribute check while disabled, and enable() hands sql() to
+    data.database as its sql_observer, which swaps in a timed cursor only
+    while one is set, so the cost of leaving the calls in place is
+    negligible.
+
+    Set HELIUMNOTES_TELEMETRY to a path ending in .prom or .json to enable
+    collection at start-up and write a snapshot there on exit.
+
+    Names follow Prometheus conventions: histograms end in _ms, counters in
+    _total, and each may carry one label (a SQL verb, a stage name) whose
+    Prometheus name comes from LABEL_NAMES.
+    """
+
+    ENV_VAR = "HELIUMNOTES_TELEMETRY"
+    PREFIX = "heliumnotes_"
+    SLOW_QUERY_MS = 100.0
+    SLOW_QUERY_KEEP = 50
+    SQL_CHARS = 500
+    # Prometheus label name per metric; others use "label".
+    LABEL_NAMES = {
+        "sql_query_ms": "verb",
+        "sql_slow_queries_total": "verb",
+        "search_stage_ms": "stage",
+        "graph_refresh_stage_ms": "stage",
+    }
+
+    enabled = False
+    _lock = threading.Lock()
+    _histograms = {}
+    _counters = {}
+    _slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+
+    @staticmethod
+    def enable(on: bool = True):
+        Telemetry.enabled = on
+        database.sql_observer = Telemetry.sql if on else None
+
+    @staticmethod
+    def reset():
+        with Telemetry._lock:
+            Telemetry._histograms = {}
+            Telemetry._counters = {}
+            Telemetry._slow_queries.clear()
+
+    @staticmethod
+    def observe(name: str, ms: float, label: str = None):
+        """Record one duration in the histogram `name` (optionally labelled)."""
+        if not Telemetry.enabled:
+            return
+        with Telemetry._lock:
+            histogram = Telemetry._histograms.get((name, label))
+            if histogram is None:
+                histogram = Telemetry._histograms[(name, label)] = Histogram()
+            histogram.observe(ms)
+
+    @staticmethod
+    def count(name: str, amount: int = 1, label: str = None):
+        if not Telemetry.enabled:
+            return
+        with Telemetry._lock:
+            Telemetry._counters[(name, label)] = Telemetry._counters.get((name, label), 0) + amount
+
+    @staticmethod
+    def timer(name: str, label: str = None):
+        """Context manager timing its block into the histogram `name`."""
+        if not Telemetry.enabled:
+            return _NULL_TIMER
+        return Telemetry._timed(name, label)
+
+    @staticmethod
+    @contextmanager
+    def _timed(name, label):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            Telemetry.observe(name, (time.perf_counter() - started) * 1000, label)
+
+    @staticmethod
+    def sql(statement: str, ms: float, rows: int = None):
+        """Record one SQL execution; logs it when slower than SLOW_QUERY_MS."""
+        verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+        Telemetry.observe("sql_query_ms", ms, verb)
+        if ms >= Telemetry.SLOW_QUERY_MS:
+            text = " ".join(statement.split())[:Telemetry.SQL_CHARS]
+            Telemetry.count("sql_slow_queries_total", 1, verb)
+            with Telemetry._lock:
+                Telemetry._slow_queries.append({"ms": round(ms, 3), "rows": rows, "sql": text,
+                                                "at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+            logger.warning("Slow query (%.1f ms): %s", ms, text)
+
+    # -- export --------------------------------------------------------------
+
+    @staticmethod
+    def _order(item):
+        (metric, label), _ = item
+        return metric, label or ""
+
+    @staticmethod
+    def snapshot() -> dict:
+        """Return every histogram, counter and recent slow query as plain data."""
+        def name(key):
+            metric, label = key
+            return metric if label is None else f"{metric}{{{label}}}"
+
+        with Telemetry._lock:
+            return {
+                "enabled": Telemetry.enabled,
+                "histograms": {name(k): h.to_dict() for k, h in sorted(Telemetry._histograms.items(), key=Telemetry._order)},
+                "counters": {name(k): v for k, v in sorted(Telemetry._counters.items(), key=Telemetry._order)},
+                "slow_queries": list(Telemetry._slow_queries),
+            }
+
+    @staticmethod
+    def prometheus() -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        def labels(metric, label, le=None):
+            parts = [f'{Telemetry.LABEL_NAMES.get(metric, "label")}="{label}"'] if label is not None else []
+            if le is not None:
+                parts.append(f'le="{le}"')
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        lines = []
+        with Telemetry._lock:
+            histograms = sorted(Telemetry._histograms.items(), key=Telemetry._order)
+            counters = sorted(Telemetry._counters.items(), key=Telemetry._order)
+        typed = set()
+        for (metric, label), h in histograms:
+            full = Telemetry.PREFIX + metric
+            if full not in typed:
+                lines.append(f"# TYPE {full} histogram")
+                typed.add(full)
+            cumulative = 0
+            for bound, count in zip([str(b) for b in Histogram.BUCKETS_MS] + ["+Inf"], h.counts):
+                cumulative += count
+                lines.append(f"{full}_bucket{labels(metric, label, bound)} {cumulative}")
+            lines.append(f"{full}_sum{labels(metric, label)} {h.sum:.6f}")
+            lines.append(f"{full}_count{labels(metric, label)} {h.count}")
+        for (metric, label), value in counters:
+            full = Telemetry.PREFIX + metric
+            if full not in typed:
+                lines.append(f"# TYPE {full} counter")
+                typed.add(full)
+            lines.append(f"{full}{labels(metric, label)} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def write(path: str):
+        """Write a snapshot: Prometheus text for .prom/.txt, JSON otherwise."""
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(Telemetry.prometheus())
+            else:
+                json.dump(Telemetry.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def configure_from_env():
+        """Enable collection and export on exit when HELIUMNOTES_TELEMETRY is set."""
+        path = os.environ.get(Telemetry.ENV_VAR)
+        if path:
+            Telemetry.enable()
+            atexit.register(Telemetry.write, path)
+
+
+Telemetry.configure_from_env()
@@ -0,0 +1,60 @@
+"""
+text_search.py
+Keyword search over notes using the SQLite FTS5 index with BM25 ranking.
+"""
+
+import re
+from core.telemetry import Telemetry
+from core.text_utils import fold_text
+from data.database import get_connection, migrate, NOTES_FTS_REBUILD
+
+
+class TextSearch:
+    """Full-text search for English and Arabic notes."""
+
+    @staticmethod
+    def ensure_table():
+        """Create and fill the FTS index and its triggers (migration 8 in data.database)."""
+        migrate()
+
+    @staticmethod
+    def rebuild():
+        """Re-index every note from scratch."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        for statement in NOTES_FTS_REBUILD:
+            cursor.execute(statement)
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def build_match(query: str) -> str:
+        """Turn free text into an FTS5 expression: every word, as a prefix, must match."""
+        terms = [t for t in re.split(r"\s+", fold_text(query).replace('"', " ")) if t]
+        return " ".join(f'"{t}"*' for t in terms)
+
+    @staticmethod
+    def search_text(query: str, limit: int = 20, mark: tuple = ("<b>", "</b>")):
+        """
+        Return up to `limit` notes matching query, best first, as dicts with
+        note_id, title, snippet (matches wrapped in `mark`) and score
+        (BM25, lower is better).
+        """
+        match = TextSearch.build_match(query)
+        if not match:
+            return []
+        conn = get_connection()
+        cursor = conn.cursor()
+        with Telemetry.timer("search_stage_ms", "fts"):
+            cursor.execute("""
+                SELECT f.note_id, n.title, f.snippet, f.score FROM (
+                    SELECT rowid AS note_id, rank AS score,
+                           snippet(notes_fts, -1, ?, ?, '…', 16) AS snippet
+                    FROM notes_fts WHERE notes_fts MATCH ?
+                    ORDER BY rank LIMIT ?
+                ) f JOIN notes n ON n.id = f.note_id
+                ORDER BY f.score
+            """, (mark[0], mark[1], match, limit))
+            rows = cursor.fetchall()
+        conn.close()
+        return [dict(r) for r in rows]
@@ -0,0 +1,21 @@
+"""
+text_utils.py
+Text normalization shared by search, summaries and the database's FTS triggers.
+"""
+
+# Arabic search folding: vowel marks and tatweel are dropped, alef/yaa forms
+# unified. Applied in SQL by the FTS triggers (data.database.fold_sql) and in
+# Python to queries and summaries.
+ARABIC_FOLDS = (
+    ("\u064B", ""), ("\u064C", ""), ("\u064D", ""), ("\u064E", ""),
+    ("\u064F", ""), ("\u0650", ""), ("\u0651", ""), ("\u0652", ""),
+    ("\u0670", ""), ("\u0640", ""),
+    ("\u0623", "\u0627"), ("\u0625", "\u0627"), ("\u0622", "\u0627"), ("\u0649", "\u064A"),
+)
+
+
+def fold_text(text: str) -> str:
+    """Python twin of data.database.fold_sql()."""
+    for src, dst in ARABIC_FOLDS:
+        text = text.replace(src, dst)
+    return text
@@ -0,0 +1,80 @@
+"""
+vector_codec.py
+Storage precisions for embedding vectors: float32, float16 and int8.
+"""
+
+import numpy as np
+
+
+class VectorCodec:
+    """
+    Converts vectors to and from their stored form.
+
+    - "f32": raw float32, as produced by the model (4 bytes per dimension)
+    - "f16": unit-length float16 (2 bytes per dimension)
+    - "i8":  unit-length int8 with a per-vector float scale (1 byte per dimension)
+    """
+
+    DTYPES = {"f32": np.float32, "f16": np.float16, "i8": np.int8}
+
+    @staticmethod
+    def check(dtype: str) -> str:
+        if dtype not in VectorCodec.DTYPES:
+            raise ValueError(f"Unknown vector storage dtype {dtype!r}; expected one of {sorted(VectorCodec.DTYPES)}")
+        return dtype
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        """Return float32 rows scaled to unit length (zero rows stay zero)."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def quantize(vectors, dtype: str):
+        """
+        Return (matrix, scales) in the compact form for dtype. Rows are
+        normalized first for f16/i8; scales is None except for i8.
+        """
+        VectorCodec.check(dtype)
+        if dtype == "f32":
+            return np.atleast_2d(np.asarray(vectors, dtype=np.float32)), None
+        unit = VectorCodec.normalize(vectors)
+        if dtype == "f16":
+            return unit.astype(np.float16), None
+        scales = np.abs(unit).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0 / 127.0
+        codes = np.rint(unit / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    @staticmethod
+    def encode(vectors, dtype: str):
+        """Return [(blob, scale), ...] ready for the embeddings table."""
+        matrix, scales = VectorCodec.quantize(vectors, dtype)
+        if scales is None:
+            return [(row.tobytes(), None) for row in matrix]
+        return [(row.tobytes(), float(s)) for row, s in zip(matrix, scales)]
+
+    @staticmethod
+    def decode(blobs, dtypes=None, scales=None) -> np.ndarray:
+        """
+        Decode stored rows (possibly of mixed precision) into a float32 matrix.
+        dtypes/scales are per-row sequences; a missing dtype means "f32".
+        """
+        n = len(blobs)
+        if n == 0:
+            return np.empty((0, 0), dtype=np.float32)
+        kinds = [d or "f32" for d in dtypes] if dtypes is not None else ["f32"] * n
+        scales = list(scales) if scales is not None else [None] * n
+        if len(set(kinds)) > 1:
+            return np.vstack([VectorCodec.decode([b], [k], [s]) for b, k, s in zip(blobs, kinds, scales)])
+        matrix = np.frombuffer(b"".join(blobs), dtype=VectorCodec.DTYPES[kinds[0]]).reshape(n, -1)
+        matrix = matrix.astype(np.float32)
+        if kinds[0] == "i8":
+            matrix *= np.asarray(scales, dtype=np.float32)[:, None]
+        return matrix
+
+    @staticmethod
+    def bytes_per_vector(dim: int, dtype: str) -> int:
+        return dim * np.dtype(VectorCodec.DTYPES[dtype]).itemsize + (4 if dtype == "i8" else 0)
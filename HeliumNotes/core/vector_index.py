@@ -0,0 +1,319 @@
+"""
+vector_index.py
+Resident, pre-normalized embedding matrix used to answer semantic queries.
+"""
+
+import threading
+import numpy as np
+from core.vector_codec import VectorCodec
+from core.vector_store import VectorStore
+from data.database import get_connection
+
+
+class VectorIndex:
+    """In-memory matrix mirroring the embeddings table.
+
+    Each row is one passage of a note (short notes have a single passage).
+    Rows are L2-normalized on load so a query is scored with a single
+    matrix-vector product; the top-k is picked with a partial sort.
+    The matrix is held in `dtype` precision (see VectorCodec). i8 rows are
+    converted SCORE_BLOCK at a time into one reused float32 buffer small
+    enough to stay in cache, scored with BLAS, and scaled afterwards. NumPy
+    converts float16 far more slowly than it multiplies, so the leading f16
+    rows are decoded once into a float32 copy; rows past it are scored
+    block by block like i8. The copy covers at most FLOAT_CACHE_FRACTION of
+    the rows (and FLOAT_CACHE_MB), so an f16 index stays well below the
+    size of the same index in f32.
+
+    With USE_STORE, rows present at load time are a read-only map of the
+    VectorStore sidecar (removals only clear a live mask); rows added later
+    go to an in-memory tail until the next load.
+    """
+
+    DTYPE = "f32"
+    USE_STORE = True
+    LOAD_ROWS = 10_000
+    SCORE_BLOCK = 512
+    FLOAT_CACHE_MB = 64
+    FLOAT_CACHE_FRACTION = 0.25
+
+    _shared = None
+
+    def __init__(self, dtype: str = None):
+        self.dtype = VectorCodec.check(dtype or VectorIndex.DTYPE)
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._clear()
+
+    def _clear(self):
+        self._size = 0
+        self._note_ids = np.empty(0, dtype=np.int64)
+        self._chunks = np.empty(0, dtype=np.int32)
+        self._spans = np.empty((0, 2), dtype=np.int64)
+        self._matrix = np.empty((0, 0), dtype=VectorCodec.DTYPES[self.dtype])
+        self._scales = np.empty(0, dtype=np.float32)
+        self._base = None
+        # part ("base"/"tail") -> [float32 rows, rows filled] for f16 scoring
+        self._decoded = {}
+        self._block = None
+
+    @staticmethod
+    def shared():
+        """Return the process-wide index, creating it on first use."""
+        if VectorIndex._shared is None:
+            VectorIndex._shared = VectorIndex()
+        return VectorIndex._shared
+
+    @staticmethod
+    def store():
+        """The committed VectorStore that writers keep current, or None when search does not use one."""
+        return VectorStore.existing(VectorIndex.DTYPE) if VectorIndex.USE_STORE else None
+
+    @staticmethod
+    def build(note_ids, vectors, dtype: str = None, chunks=None, spans=None):
+        """Create a loaded index directly from vectors (benchmarks, tools)."""
+        index = VectorIndex(dtype)
+        index._loaded = True
+        n = len(note_ids)
+        index._append(note_ids, chunks if chunks is not None else np.zeros(n, dtype=np.int32),
+                      spans if spans is not None else np.zeros((n, 2), dtype=np.int64), vectors)
+        return index
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """Return float32 rows scaled to unit length (zero rows stay zero)."""
+        return VectorCodec.normalize(vectors)
+
+    def __len__(self):
+        base = int(self._base["live"].sum()) if self._base is not None else 0
+        return base + self._size
+
+    def nbytes(self) -> int:
+        """Bytes of vector rows held in process memory (mapped rows are not counted)."""
+        cached = sum(filled * buf.shape[1] * 4 for buf, filled in self._decoded.values())
+        if not self._size:
+            return cached
+        return self._size * VectorCodec.bytes_per_vector(self._matrix.shape[1], self.dtype) + cached
+
+    def load(self):
+        """(Re)build the index from the vector store, or from the embeddings table."""
+        if VectorIndex.USE_STORE:
+            self._load_store()
+        else:
+            self._load_blobs()
+
+    def _load_store(self):
+        store = VectorStore.open(dtype=self.dtype)
+        store.catch_up()
+        matrix, records = store.view()
+        live = np.asarray(records["live"], dtype=bool)
+        with self._lock:
+            self._clear()
+            self._loaded = True
+            # Metadata is small and copied; the vectors stay mapped and shared.
+            self._base = {
+                "matrix": matrix,
+                "note_ids": np.asarray(records["note_id"], dtype=np.int64),
+                "chunks": np.asarray(records["chunk"], dtype=np.int32),
+                "spans": np.stack([records["start"], records["end"]], axis=1).astype(np.int64),
+                "scales": np.asarray(records["scale"], dtype=np.float32),
+                "live": live,
+            }
+
+    def _load_blobs(self):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT note_id, chunk, start_offset, end_offset, vector, dtype, scale FROM embeddings
+            WHERE vector IS NOT NULL
+            ORDER BY note_id, chunk
+        """)
+        with self._lock:
+            self._clear()
+            self._loaded = True
+            while True:
+                rows = cursor.fetchmany(self.LOAD_ROWS)
+                if not rows:
+                    break
+                self._append(
+                    [r["note_id"] for r in rows],
+                    [r["chunk"] or 0 for r in rows],
+                    [(r["start_offset"] or 0, r["end_offset"] or 0) for r in rows],
+                    VectorCodec.decode([r["vector"] for r in rows], [r["dtype"] for r in rows],
+                                       [r["scale"] for r in rows]),
+                )
+        conn.close()
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def invalidate(self):
+        """Drop the resident matrix; the next query reloads it."""
+        with self._lock:
+            self._loaded = False
+            self._clear()
+
+    def _append(self, note_ids, chunks, spans, vectors):
+        rows, scales = VectorCodec.quantize(self.normalize(vectors), self.dtype)
+        n = len(rows)
+        needed = self._size + n
+        if self._matrix.shape[0] < needed or self._matrix.shape[1] != rows.shape[1]:
+            # Grow geometrically so streamed batches stay amortised O(1) per row.
+            capacity = max(needed, 2 * self._matrix.shape[0], 1024)
+            matrix = np.zeros((capacity, rows.shape[1]), dtype=rows.dtype)
+            note_buf = np.zeros(capacity, dtype=np.int64)
+            chunk_buf = np.zeros(capacity, dtype=np.int32)
+            span_buf = np.zeros((capacity, 2), dtype=np.int64)
+            scale_buf = np.ones(capacity, dtype=np.float32)
+            if self._size:
+                matrix[:self._size] = self._matrix[:self._size]
+                note_buf[:self._size] = self._note_ids[:self._size]
+                chunk_buf[:self._size] = self._chunks[:self._size]
+                span_buf[:self._size] = self._spans[:self._size]
+                scale_buf[:self._size] = self._scales[:self._size]
+            self._matrix, self._note_ids, self._chunks = matrix, note_buf, chunk_buf
+            self._spans, self._scales = span_buf, scale_buf
+
+        end = self._size + n
+        self._matrix[self._size:end] = rows
+        self._note_ids[self._size:end] = note_ids
+        self._chunks[self._size:end] = chunks
+        self._spans[self._size:end] = np.asarray(spans, dtype=np.int64).reshape(n, 2)
+        self._scales[self._size:end] = 1.0 if scales is None else scales
+        self._size = end
+
+    def add_passages(self, note_ids, chunks, spans, vectors: np.ndarray):
+        """Append a batch of passage vectors without a full reload."""
+        if not self._loaded or len(note_ids) == 0:
+            return
+        with self._lock:
+            self._append(note_ids, chunks, spans, vectors)
+
+    def remove(self, note_id: int):
+        """Drop every passage of a note from the resident matrix."""
+        self.remove_many([note_id])
+
+    def remove_many(self, note_ids):
+        if not self._loaded or not len(note_ids):
+            return
+        with self._lock:
+            note_ids = np.asarray(note_ids, dtype=np.int64)
+            if self._base is not None:
+                self._base["live"] &= ~np.isin(self._base["note_ids"], note_ids)
+            size = self._size
+            drop = np.isin(self._note_ids[:size], note_ids)
+            if not drop.any():
+                return
+            self._decoded.pop("tail", None)
+            keep = np.flatnonzero(~drop)
+            n = len(keep)
+            self._matrix[:n] = self._matrix[keep]
+            self._note_ids[:n] = self._note_ids[keep]
+            self._chunks[:n] = self._chunks[keep]
+            self._spans[:n] = self._spans[keep]
+            self._scales[:n] = self._scales[keep]
+            self._size = n
+
+    def _decoded_rows(self, part: str, matrix):
+        """float32 copy of the leading rows of an f16 part, within FLOAT_CACHE_FRACTION and FLOAT_CACHE_MB."""
+        dim = matrix.shape[1]
+        others = sum(filled for key, (_, filled) in self._decoded.items() if key != part)
+        limit = max(0, min(int(self.FLOAT_CACHE_MB * 1024 * 1024) // (4 * dim) - others,
+                           int(len(matrix) * self.FLOAT_CACHE_FRACTION)))
+        buf, filled = self._decoded.get(part, (None, 0))
+        want = min(len(matrix), limit)
+        if want > filled:
+            if buf is None or len(buf) < want:
+                grown = np.empty((min(max(want, 2 * filled), limit), dim), dtype=np.float32)
+                if filled:
+                    grown[:filled] = buf[:filled]
+                buf = grown
+            buf[filled:want] = matrix[filled:want]
+            filled = want
+            self._decoded[part] = [buf, filled]
+        return buf[:filled] if buf is not None else np.empty((0, dim), dtype=np.float32)
+
+    def _score_rows(self, matrix, scales, q, part: str):
+        size = len(matrix)
+        if self.dtype == "f32":
+            return matrix @ q
+        scores = np.empty(size, dtype=np.float32)
+        start = 0
+        if self.dtype == "f16":
+            decoded = self._decoded_rows(part, matrix)
+            start = len(decoded)
+            if start:
+                np.dot(decoded, q, out=scores[:start])
+        if start < size:
+            if self._block is None or self._block.shape[1] != matrix.shape[1]:
+                self._block = np.empty((self.SCORE_BLOCK, matrix.shape[1]), dtype=np.float32)
+            for begin in range(start, size, self.SCORE_BLOCK):
+                end = min(begin + self.SCORE_BLOCK, size)
+                block = self._block[:end - begin]
+                block[...] = matrix[begin:end]
+                np.dot(block, q, out=scores[begin:end])
+        if self.dtype == "i8":
+            scores *= scales
+        return scores
+
+    def _scores(self, query_vec: np.ndarray):
+        self.ensure_loaded()
+        q = self.normalize(query_vec)[0]
+        with self._lock:
+            scores, meta = [], []
+            base = self._base
+            if base is not None and base["live"].any():
+                live = base["live"]
+                scores.append(self._score_rows(base["matrix"], base["scales"], q, "base")[live])
+                meta.append((base["note_ids"][live], base["chunks"][live], base["spans"][live]))
+            size = self._size
+            if size:
+                scores.append(self._score_rows(self._matrix[:size], self._scales[:size], q, "tail"))
+                meta.append((self._note_ids[:size], self._chunks[:size], self._spans[:size]))
+            if not scores:
+                return None, None
+            scores = np.concatenate(scores)
+            meta = tuple(np.concatenate(parts) for parts in zip(*meta))
+        return scores, meta
+
+    @staticmethod
+    def _top(scores, k):
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def search_passages(self, query_vec: np.ndarray, top_k: int = 5):
+        """Return the top_k passages as dicts with note_id, chunk, start, end and score."""
+        scores, meta = self._scores(query_vec)
+        if scores is None or top_k <= 0:
+            return []
+        note_ids, chunks, spans = meta
+        return [
+            {
+                "note_id": int(note_ids[i]),
+                "chunk": int(chunks[i]),
+                "start": int(spans[i][0]),
+                "end": int(spans[i][1]),
+                "score": float(scores[i]),
+            }
+            for i in self._top(scores, top_k)
+        ]
+
+    def search(self, query_vec: np.ndarray, top_k: int = 5):
+        """Return [(note_id, score), ...]; a note scores as its best passage."""
+        scores, meta = self._scores(query_vec)
+        if scores is None or top_k <= 0:
+            return []
+        note_ids = meta[0]
+
+        # Widen the passage pool until it covers top_k distinct notes. A note
+        # outside the pool cannot beat the weakest pooled passage, so this is exact.
+        pool = min(len(scores), top_k * 8)
+        while True:
+            best = {}
+            for i in self._top(scores, pool):
+                best.setdefault(int(note_ids[i]), float(scores[i]))
+            if len(best) >= top_k or pool == len(scores):
+                return list(best.items())[:top_k]
+            pool = min(len(scores), pool * 4)
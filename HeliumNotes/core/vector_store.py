@@ -0,0 +1,450 @@
+"""
+vector_store.py
+Append-only, memory-mapped sidecar holding embedding vectors contiguously.
+"""
+
+import argparse
+import glob
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from core.vector_codec import VectorCodec
+from data import database
+from data.database import get_connection
+
+
+class VectorStore:
+    """
+    Files next to the database (base = heliumnotes.vecstore):
+
+    - <base>.json        committed state: dtype, dim, row count, generation,
+                         highest embedding id, tombstoned rows
+    - <base>.<gen>.vec   unit-length vectors in `dtype`, back to back
+    - <base>.<gen>.ids   one RECORD per row: embedding id, passage metadata, live flag
+    - <base>.lock        held while a process changes the files
+
+    Readers map the files read-only, so every process shares the same pages
+    through the OS cache. Appends write past the committed count, fsync,
+    then atomically replace the json; a crash in between leaves a torn tail
+    that readers ignore and the next append overwrites. remove() clears the
+    live flag (a tombstone); compact() rewrites live rows as a new generation.
+    Writers take the lock file and re-read the json first, so processes
+    appending to one store never overwrite each other's rows.
+
+    Writers of the embeddings table (SemanticSearch.index_notes, Reindex,
+    NoteModel.delete) update the store right after they commit. catch_up(),
+    run when the store is opened for search, tombstones rows of deleted
+    notes and reads only passages past max_id. The embeddings table stays
+    the source of truth: check() compares the two in full and sync()
+    repairs the store, so the sidecar can always be rebuilt.
+    """
+
+    FILE_SUFFIX = ".vecstore"
+    RECORD = np.dtype([
+        ("id", "<i8"), ("note_id", "<i8"), ("chunk", "<i4"),
+        ("start", "<i8"), ("end", "<i8"), ("scale", "<f4"), ("live", "u1"),
+    ])
+    # Compact once this fraction of rows is tombstoned.
+    COMPACT_RATIO = 0.25
+    SYNC_ROWS = 500
+
+    def __init__(self, base: str, dtype: str = "f32", dim: int = 0, count: int = 0, generation: int = 0,
+                 max_id: int = 0, dead: int = 0):
+        self.base = base
+        self.dtype = VectorCodec.check(dtype)
+        self.dim = dim
+        self.count = count
+        self.generation = generation
+        self.max_id = max_id
+        self.dead = dead
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._view = None
+
+    @staticmethod
+    def default_base():
+        return os.path.splitext(database.DB_PATH)[0] + VectorStore.FILE_SUFFIX
+
+    @staticmethod
+    def open(base: str = None, dtype: str = "f32"):
+        """
+        Open the committed store. A missing store, or one written in another
+        precision, comes back empty under a new generation (filled by catch_up()).
+        """
+        base = base or VectorStore.default_base()
+        meta = VectorStore._read_meta(base)
+        if meta.get("dtype") == dtype:
+            store = VectorStore(base, dtype)
+            store._adopt(meta)
+        else:
+            store = VectorStore(base, dtype, generation=meta.get("generation", -1) + 1)
+        store._remove_stale_files(keep=meta.get("generation"))
+        return store
+
+    @staticmethod
+    def existing(dtype: str, base: str = None):
+        """
+        The committed store in dtype, or None. Writers keep only an existing
+        store current; a missing one is filled by catch_up() when first opened.
+        """
+        base = base or VectorStore.default_base()
+        meta = VectorStore._read_meta(base)
+        if meta.get("dtype") != dtype:
+            return None
+        store = VectorStore(base, dtype)
+        store._adopt(meta)
+        return store
+
+    @staticmethod
+    def _read_meta(base: str) -> dict:
+        if not os.path.exists(base + ".json"):
+            return {}
+        with open(base + ".json", "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _adopt(self, meta: dict):
+        """Take over committed state; older stores lack max_id and dead, so derive them once."""
+        if meta["generation"] != self.generation or meta["count"] != self.count:
+            self._view = None
+        self.dim, self.count, self.generation = meta["dim"], meta["count"], meta["generation"]
+        if "max_id" in meta:
+            self.max_id, self.dead = meta["max_id"], meta["dead"]
+        else:
+            records = self.view()[1]
+            self.max_id = int(records["id"].max()) if self.count else 0
+            self.dead = self.dead_count()
+
+    def _reload(self):
+        """Pick up rows another process committed to this store since it was read."""
+        meta = VectorStore._read_meta(self.base)
+        if meta.get("dtype") == self.dtype and meta.get("generation", -1) >= self.generation:
+            self._adopt(meta)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the store for writing: the thread lock, then the lock file across processes."""
+        with self._lock:
+            if self._lock_file is not None:
+                yield
+                return
+            with open(self.base + ".lock", "a+b") as f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                self._lock_file = f
+                try:
+                    self._reload()
+                    yield
+                finally:
+                    self._lock_file = None
+                    if fcntl is not None:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                    else:
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _path(self, ext: str, generation: int = None) -> str:
+        return f"{self.base}.{self.generation if generation is None else generation}.{ext}"
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * np.dtype(VectorCodec.DTYPES[self.dtype]).itemsize
+
+    def _remove_stale_files(self, keep=None):
+        """Delete files of other generations (left by compaction or a crash)."""
+        keep = {self.generation, keep}
+        for path in glob.glob(glob.escape(self.base) + ".*.vec") + glob.glob(glob.escape(self.base) + ".*.ids"):
+            generation = path.rsplit(".", 2)[-2]
+            if generation.isdigit() and int(generation) not in keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still mapped by another process (Windows); retried on the next open.
+                    pass
+
+    def _commit(self):
+        tmp = self.base + ".json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dtype": self.dtype, "dim": self.dim, "count": self.count, "generation": self.generation,
+                       "max_id": self.max_id, "dead": self.dead}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.base + ".json")
+        self._view = None
+
+    def __len__(self):
+        return self.count
+
+    def view(self):
+        """Return (matrix, records) as read-only maps of the committed rows."""
+        with self._lock:
+            if self._view is None:
+                if self.count == 0:
+                    self._view = (np.empty((0, self.dim), dtype=VectorCodec.DTYPES[self.dtype]),
+                                  np.empty(0, dtype=self.RECORD))
+                else:
+                    self._view = (
+                        np.memmap(self._path("vec"), dtype=VectorCodec.DTYPES[self.dtype], mode="r",
+                                  shape=(self.count, self.dim)),
+                        np.memmap(self._path("ids"), dtype=self.RECORD, mode="r", shape=(self.count,)),
+                    )
+            return self._view
+
+    @staticmethod
+    def _write_at(path: str, offset: int, data: bytes):
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, ids, note_ids, chunks, spans, vectors):
+        """
+        Append rows and commit them; vectors are normalized and quantized to
+        dtype. Ids the store already holds (appended by another process's
+        catch_up()) are skipped.
+        """
+        if len(ids) == 0:
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        spans = np.asarray(spans, dtype=np.int64).reshape(len(ids), 2)
+        with self._locked():
+            keep = np.ones(len(ids), dtype=bool)
+            if self.count and ids.min() <= self.max_id:
+                keep = ~np.isin(ids, self.view()[1]["id"])
+                if not keep.any():
+                    return
+            matrix, scales = VectorCodec.quantize(VectorCodec.normalize(vectors)[keep], self.dtype)
+            ids, spans = ids[keep], spans[keep]
+            records = np.zeros(len(ids), dtype=self.RECORD)
+            records["id"] = ids
+            records["note_id"] = np.asarray(note_ids, dtype=np.int64)[keep]
+            records["chunk"] = np.asarray(chunks, dtype=np.int32)[keep]
+            records["start"], records["end"] = spans[:, 0], spans[:, 1]
+            records["scale"] = 1.0 if scales is None else scales
+            records["live"] = 1
+            if self.count and matrix.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {matrix.shape[1]} does not match store dimension {self.dim}")
+            self.dim = matrix.shape[1]
+            self._view = None
+            self._write_at(self._path("vec"), self.count * self.row_bytes, matrix.tobytes())
+            self._write_at(self._path("ids"), self.count * self.RECORD.itemsize, records.tobytes())
+            self.count += len(ids)
+            self.max_id = max(self.max_id, int(ids.max()))
+            self._commit()
+
+    def remove(self, ids) -> int:
+        """Tombstone rows by embedding id; returns how many were live."""
+        return self._tombstone("id", ids)
+
+    def remove_notes(self, note_ids) -> int:
+        """Tombstone every row of the given notes; returns how many were live."""
+        return self._tombstone("note_id", note_ids)
+
+    def _tombstone(self, field: str, values) -> int:
+        if len(values) == 0:
+            return 0
+        with self._locked():
+            if self.count == 0:
+                return 0
+            records = np.memmap(self._path("ids"), dtype=self.RECORD, mode="r+", shape=(self.count,))
+            hit = np.flatnonzero((records["live"] == 1) & np.isin(records[field], np.asarray(values, dtype=np.int64)))
+            if len(hit):
+                records["live"][hit] = 0
+                records.flush()
+            del records
+            if len(hit):
+                self.dead += len(hit)
+                self._commit()
+            return len(hit)
+
+    def live_mask(self) -> np.ndarray:
+        return np.asarray(self.view()[1]["live"], dtype=bool)
+
+    def dead_count(self) -> int:
+        return int(self.count - self.live_mask().sum())
+
+    def compact(self, block: int = 65_536):
+        """Rewrite live rows into a fresh generation and drop the old files."""
+        with self._locked():
+            matrix, records = self.view()
+            live = np.flatnonzero(np.asarray(records["live"], dtype=bool))
+            old = self.generation
+            self.generation += 1
+            with open(self._path("vec"), "wb") as vec, open(self._path("ids"), "wb") as ids:
+                for start in range(0, len(live), block):
+                    rows = live[start:start + block]
+                    vec.write(np.ascontiguousarray(matrix[rows]).tobytes())
+                    ids.write(np.ascontiguousarray(records[rows]).tobytes())
+                for f in (vec, ids):
+                    f.flush()
+                    os.fsync(f.fileno())
+            del matrix, records
+            self.count, self.dead = len(live), 0
+            self._commit()
+            self._remove_stale_files(keep=self.generation)
+            return old
+
+    @staticmethod
+    def _expected_rows(cursor):
+        """(embedding id, note id) for every stored passage whose note still exists."""
+        cursor.execute("""
+            SELECT e.id, e.note_id FROM embeddings e
+            JOIN notes n ON n.id = e.note_id
+            WHERE e.vector IS NOT NULL
+        """)
+        rows = cursor.fetchall()
+        return (np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+                np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows)))
+
+    def _diff(self, cursor):
+        """Return (rows to tombstone, embedding ids to append)."""
+        expected_ids, expected_notes = self._expected_rows(cursor)
+        records = self.view()[1]
+        live = np.asarray(records["live"], dtype=bool)
+        live_ids = np.asarray(records["id"])[live]
+        live_notes = np.asarray(records["note_id"])[live]
+
+        # A live row is wrong if its passage is gone or now belongs to another note.
+        order = np.argsort(expected_ids)
+        sorted_ids, sorted_notes = expected_ids[order], expected_notes[order]
+        if len(sorted_ids):
+            pos = np.minimum(np.searchsorted(sorted_ids, live_ids), len(sorted_ids) - 1)
+            matched = (sorted_ids[pos] == live_ids) & (sorted_notes[pos] == live_notes)
+        else:
+            matched = np.zeros(len(live_ids), dtype=bool)
+        stale = live_ids[~matched]
+        missing = expected_ids[~np.isin(expected_ids, live_ids[matched])]
+        return stale, missing
+
+    def check(self) -> dict:
+        """Compare the store with the embeddings and notes tables without changing anything."""
+        conn = get_connection()
+        stale, missing = self._diff(conn.cursor())
+        conn.close()
+        return {
+            "rows": self.count,
+            "dead": self.dead_count(),
+            "stale": len(stale),
+            "missing": len(missing),
+            "consistent": not len(stale) and not len(missing),
+        }
+
+    def _append_rows(self, cursor, ids):
+        """Append the stored passages with the given embedding ids."""
+        for start in range(0, len(ids), self.SYNC_ROWS):
+            chunk = list(ids[start:start + self.SYNC_ROWS])
+            cursor.execute(f"""
+                SELECT id, note_id, chunk, start_offset, end_offset, vector, dtype, scale
+                FROM embeddings WHERE id IN ({",".join("?" * len(chunk))}) ORDER BY id
+            """, chunk)
+            rows = cursor.fetchall()
+            self.append(
+                [r["id"] for r in rows],
+                [r["note_id"] for r in rows],
+                [r["chunk"] or 0 for r in rows],
+                [(r["start_offset"] or 0, r["end_offset"] or 0) for r in rows],
+                VectorCodec.decode([r["vector"] for r in rows], [r["dtype"] for r in rows],
+                                   [r["scale"] for r in rows]),
+            )
+
+    def _finish(self) -> bool:
+        """Commit an empty store so writers find it, then compact when worthwhile."""
+        if not self.count and not os.path.exists(self.base + ".json"):
+            self._commit()
+        compacted = self.count and self.dead > self.COMPACT_RATIO * self.count
+        if compacted:
+            self.compact()
+        return bool(compacted)
+
+    def deleted_notes(self, cursor) -> np.ndarray:
+        """Notes that still have live rows here but are gone from the notes table."""
+        records = self.view()[1]
+        live_notes = np.unique(np.asarray(records["note_id"])[np.asarray(records["live"], dtype=bool)])
+        if not len(live_notes):
+            return live_notes
+        cursor.execute("SELECT id FROM notes")
+        present = np.fromiter((r[0] for r in cursor), dtype=np.int64)
+        return live_notes[~np.isin(live_notes, present)]
+
+    def catch_up(self) -> dict:
+        """
+        Tombstone rows of deleted notes and append passages stored after
+        max_id: written while the store did not exist yet, or by a writer
+        that stopped before updating it. Only new passages and note ids are
+        read, so opening the store stays cheap.
+        """
+        with self._locked():
+            conn = get_connection()
+            cursor = conn.cursor()
+            removed = self.remove_notes(self.deleted_notes(cursor))
+            cursor.execute("""
+                SELECT e.id FROM embeddings e
+                JOIN notes n ON n.id = e.note_id
+                WHERE e.id > ? AND e.vector IS NOT NULL ORDER BY e.id
+            """, (self.max_id,))
+            missing = [r[0] for r in cursor.fetchall()]
+            self._append_rows(cursor, missing)
+            conn.close()
+            return {"removed": removed, "appended": len(missing), "compacted": self._finish()}
+
+    def compact_if_needed(self) -> bool:
+        with self._locked():
+            return self._finish()
+
+    def sync(self) -> dict:
+        """Repair: tombstone stale rows, append missing ones, and compact when worthwhile."""
+        with self._locked():
+            conn = get_connection()
+            cursor = conn.cursor()
+            stale, missing = self._diff(cursor)
+            removed = self.remove(stale) if len(stale) else 0
+            self._append_rows(cursor, missing.tolist())
+            conn.close()
+            if self.dead != self.dead_count():
+                self.dead = self.dead_count()
+                self._commit()
+            return {"removed": removed, "appended": len(missing), "compacted": self._finish()}
+
+    def vectors(self, block: int = 65_536):
+        """Return (embedding ids, float32 matrix) of the live rows."""
+        matrix, records = self.view()
+        live = np.flatnonzero(np.asarray(records["live"], dtype=bool))
+        out = np.empty((len(live), self.dim), dtype=np.float32)
+        for start in range(0, len(live), block):
+            rows = live[start:start + block]
+            out[start:start + len(rows)] = matrix[rows]
+            if self.dtype == "i8":
+                out[start:start + len(rows)] *= np.asarray(records["scale"][rows])[:, None]
+        return np.asarray(records["id"][live], dtype=np.int64), out
+
+
+if __name__ == "__main__":
+    from core.semantic_search import SemanticSearch
+    from core.vector_index import VectorIndex
+
+    parser = argparse.ArgumentParser(description="Inspect or repair the memory-mapped vector store.")
+    parser.add_argument("--sync", action="store_true", help="bring the store in line with the embeddings table")
+    parser.add_argument("--compact", action="store_true", help="drop tombstoned rows")
+    parser.add_argument("--rebuild", action="store_true", help="discard the store and rebuild it from SQLite")
+    args = parser.parse_args()
+
+    SemanticSearch.load_precision()
+    store = VectorStore.open(dtype=VectorIndex.DTYPE)
+    if args.rebuild:
+        store = VectorStore(store.base, store.dtype, generation=store.generation + 1)
+    if args.sync or args.rebuild:
+        print(store.sync())
+    if args.compact:
+        store.compact()
+    print(store.check())
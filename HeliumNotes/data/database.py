@@ -1,20 +1,588 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 import os
+import time
+from core.text_utils import ARABIC_FOLDS
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "heliumnotes.db")
 
+# Applied to every new connection. WAL lets UI reads run alongside background
+# writes; NORMAL sync is durable across app crashes under WAL.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",      # 64 MB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+STATEMENT_CACHE_SIZE = 256
+
+# Called as sql_observer(statement, ms, rows) after every statement while
+# set; core.telemetry installs Telemetry.sql here when collection is enabled.
+sql_observer = None
+
+_local = threading.local()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports each execute() to sql_observer (used only while one is set)."""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            observer = sql_observer
+            if observer is not None:
+                observer(sql, (time.perf_counter() - started) * 1000, None)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            observer = sql_observer
+            if observer is not None:
+                observer(sql, (time.perf_counter() - started) * 1000, self.rowcount)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A per-thread connection that stays open between calls.
+    close() does nothing, so existing callers keep their
+    get_connection()/close() pattern while reusing the connection and its
+    prepared-statement cache; a nested call's close() can therefore never
+    discard work its caller has not committed yet. Uncommitted work is only
+    dropped by close_for_real(). Inside transaction(), commit() and
+    rollback() are deferred to the outermost block.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transaction_depth = 0
+        # Callbacks waiting for the outermost transaction to commit.
+        self.on_commit = []
+        # {table: [ids]} of each open unit_of_work() block.
+        self.units = []
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = TimedCursor if sql_observer is not None else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if sql_observer is not None:
+            return self.cursor().execute(sql, parameters)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if sql_observer is not None:
+            return self.cursor().executemany(sql, seq_of_parameters)
+        return super().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if self.transaction_depth == 0:
+            super().commit()
+
+    def rollback(self):
+        if self.transaction_depth == 0:
+            super().rollback()
+
+    def close(self):
+        pass
+
+    def close_for_real(self):
+        if self.in_transaction:
+            super().rollback()
+        super().close()
+
 
 def get_connection():
     """
-    Returns a connection to the SQLite database.
+    Returns this thread's connection to the SQLite database.
     Creates the database file if it doesn't exist.
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Enables dict-like access to results
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close_for_real()
+        conn = sqlite3.connect(DB_PATH, factory=PooledConnection, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row  # Enables dict-like access to results
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        _local.conn, _local.path = conn, DB_PATH
     return conn
 
 
+def close_connection():
+    """Close this thread's connection (e.g. when a worker thread exits)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close_for_real()
+        _local.conn = None
+
+
+@contextmanager
+def transaction():
+    """
+    Group several writes into one transaction on this thread's connection.
+    Blocks nest; the outermost one commits, or rolls back on error. Model
+    calls made inside the block join the same transaction.
+    """
+    conn = get_connection()
+    if conn.transaction_depth == 0:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+    conn.transaction_depth += 1
+    try:
+        yield conn
+    except BaseException:
+        conn.transaction_depth -= 1
+        if conn.transaction_depth == 0:
+            conn.rollback()
+            conn.on_commit.clear()
+        raise
+    conn.transaction_depth -= 1
+    if conn.transaction_depth == 0:
+        conn.commit()
+        callbacks, conn.on_commit = conn.on_commit, []
+        for callback in callbacks:
+            callback()
+
+
+@contextmanager
+def unit_of_work():
+    """
+    A transaction() that also collects the ids of rows created inside it.
+    Yields {table: [ids in insertion order]}, filled in by the models'
+    create and create_many calls made within the block.
+    """
+    with transaction() as conn:
+        created = {}
+        conn.units.append(created)
+        try:
+            yield created
+        finally:
+            conn.units.remove(created)
+
+
+def after_commit(callback):
+    """
+    Run callback once this thread's writes are committed: right away
+    outside transaction(), or when the outermost block commits (never, if
+    it rolls back). Used for side effects such as re-embedding notes.
+    """
+    conn = get_connection()
+    if conn.transaction_depth == 0:
+        callback()
+    else:
+        conn.on_commit.append(callback)
+
+
+def inserted_ids(cursor, table: str, count: int) -> list:
+    """
+    Ids of the last `count` rows inserted into table through cursor's
+    connection, recorded in any open unit_of_work(). The rows must come
+    from one INSERT or executemany(); holding the write lock, SQLite hands
+    them consecutive rowids.
+    """
+    if count <= 0:
+        return []
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    ids = list(range(last_id - count + 1, last_id + 1))
+    for created in cursor.connection.units:
+        created.setdefault(table, []).extend(ids)
+    return ids
+
+
+def get_setting(key: str, default=None):
+    """Value saved by set_setting(), or default (e.g. before migration 9)."""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return default
+    return default if row is None else row["value"]
+
+
+def set_setting(key: str, value: str):
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+
+def fold_sql(expr: str) -> str:
+    """Wrap a SQL expression in the replace() calls that apply ARABIC_FOLDS (core.text_utils)."""
+    for src, dst in ARABIC_FOLDS:
+        expr = f"replace({expr}, '{src}', '{dst}')"
+    return expr
+
+
+def _fts_values(row: str) -> str:
+    return ", ".join(fold_sql(f"{row}.{col}") for col in ("title", "content", "tags"))
+
+
+# External-content FTS5 index over notes. Combining marks are kept as token
+# characters so vocalised Arabic words are not split; the triggers index the
+# folded text, and snippets are cut from the original rows.
+NOTES_FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, content, tags,
+        content='notes', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, title, content, tags) VALUES (new.id, {_fts_values("new")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content, tags) VALUES ('delete', old.id, {_fts_values("old")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content, tags ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content, tags) VALUES ('delete', old.id, {_fts_values("old")});
+        INSERT INTO notes_fts(rowid, title, content, tags) VALUES (new.id, {_fts_values("new")});
+    END
+    """,
+    # Title matches weigh most, then tags, then body text.
+    "INSERT INTO notes_fts(notes_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')",
+)
+NOTES_FTS_REBUILD = (
+    "INSERT INTO notes_fts(notes_fts) VALUES ('delete-all')",
+    f"INSERT INTO notes_fts(rowid, title, content, tags) SELECT id, {_fts_values('notes')} FROM notes",
+)
+
+# Change feed for the knowledge graph: every insert/update/delete of a graph
+# entity appends (entity, id, op); GraphStore replays rows past its cursor.
+GRAPH_ENTITIES = (
+    # (table, entity type, columns whose change affects the graph)
+    ("notes", "note", "title"),
+    ("tasks", "task", "task, note_id"),
+    ("plans", "plan", "objectives, note_id"),
+    ("patterns", "pattern", "issue"),
+    ("relations", "relation", "from_type, from_id, to_type, to_id, relation_type"),
+)
+# Rows of graph_changes kept for GraphStore readers; each insert drops the
+# row this many sequence numbers behind it. Baked into the trigger, so a new
+# value needs a migration that recreates graph_changes_cap.
+GRAPH_CHANGES_KEEP = 10_000
+GRAPH_CHANGES_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS graph_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        entity_id INTEGER NOT NULL,
+        op TEXT NOT NULL
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS graph_changes_cap AFTER INSERT ON graph_changes BEGIN
+        DELETE FROM graph_changes WHERE seq <= new.seq - {GRAPH_CHANGES_KEEP};
+    END
+    """,
+) + tuple(
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_graph_{op[0]} AFTER {event} ON {table} BEGIN
+        INSERT INTO graph_changes (entity, entity_id, op) VALUES ('{entity}', {row}.id, '{op}');
+    END
+    """
+    for table, entity, columns in GRAPH_ENTITIES
+    for op, event, row in (
+        ("insert", "INSERT", "new"),
+        ("update", f"UPDATE OF {columns}", "new"),
+        ("delete", "DELETE", "old"),
+    )
+)
+
+def split_tags(tags) -> list:
+    """Normalize a comma-separated tag string: trimmed, lower-case, unique, in order."""
+    seen = []
+    for tag in (tags or "").split(","):
+        tag = tag.strip().lower()
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def _backfill_note_tags(cursor):
+    cursor.execute("SELECT id, tags FROM notes WHERE tags IS NOT NULL AND tags != ''")
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        cursor.connection.executemany(
+            "INSERT OR IGNORE INTO note_tags (tag, note_id) VALUES (?, ?)",
+            [(tag, r["id"]) for r in rows for tag in split_tags(r["tags"])],
+        )
+
+
+def _upgrade_embeddings(cursor):
+    """Add the passage, precision and freshness columns missing from older embeddings tables."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(embeddings)")}
+    for column, decl in (
+        ("chunk", "INTEGER DEFAULT 0"),
+        ("start_offset", "INTEGER"),
+        ("end_offset", "INTEGER"),
+        ("dtype", "TEXT"),
+        ("scale", "REAL"),
+        ("content_hash", "TEXT"),
+        ("note_updated_at", "TEXT"),
+    ):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE embeddings ADD COLUMN {column} {decl}")
+
+
+# Task statuses that count as finished. A task's completed_at is stamped
+# when it enters one of these and cleared when it leaves.
+DONE_STATUSES = ("done", "completed", "closed")
+_DONE_SQL = "(" + ", ".join(f"'{s}'" for s in DONE_STATUSES) + ")"
+
+# Rollups for dashboards and reflections, kept current by triggers:
+# metrics_daily holds per-day counts, metrics_total the all-time ones.
+# Each METRICS entry is (metric, table, timestamp column, row filter); a row
+# counts on the local date of its timestamp. Everything here can be
+# recomputed from the base tables by rebuild_metrics().
+METRICS = (
+    ("notes_created", "notes", "created_at", "1"),
+    ("tasks_created", "tasks", "created_at", "1"),
+    ("tasks_completed", "tasks", "completed_at", "{row}.completed_at IS NOT NULL"),
+    ("plans_created", "plans", "created_at", "1"),
+)
+
+
+def _bump_metric(metric: str, day: str, delta: int) -> str:
+    return f"""
+        INSERT INTO metrics_daily (day, metric, value)
+            SELECT date({day}), '{metric}', {delta} WHERE date({day}) IS NOT NULL
+            ON CONFLICT(day, metric) DO UPDATE SET value = value + excluded.value;
+        INSERT INTO metrics_total (metric, value) VALUES ('{metric}', {delta})
+            ON CONFLICT(metric) DO UPDATE SET value = value + excluded.value;
+    """
+
+
+METRICS_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS metrics_daily (
+        day TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, metric)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS metrics_total (
+        metric TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+    # Completion stamps; the UPDATEs below fire the tasks_completed triggers.
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_completed_stamp AFTER UPDATE OF status ON tasks
+    WHEN lower(new.status) IN {_DONE_SQL} AND new.completed_at IS NULL BEGIN
+        UPDATE tasks SET completed_at = strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime') WHERE id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_completed_clear AFTER UPDATE OF status ON tasks
+    WHEN lower(IFNULL(new.status, '')) NOT IN {_DONE_SQL} AND new.completed_at IS NOT NULL BEGIN
+        UPDATE tasks SET completed_at = NULL WHERE id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_completed_insert AFTER INSERT ON tasks
+    WHEN lower(new.status) IN {_DONE_SQL} AND new.completed_at IS NULL BEGIN
+        UPDATE tasks SET completed_at = IFNULL(new.created_at, strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'))
+        WHERE id = new.id;
+    END
+    """,
+) + tuple(
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {metric}_{op} AFTER {event} ON {table}
+    WHEN {when} BEGIN
+        {body}
+    END
+    """
+    for metric, table, column, where in METRICS
+    for op, event, when, body in (
+        ("insert", "INSERT", where.format(row="new"), _bump_metric(metric, f"new.{column}", 1)),
+        ("delete", "DELETE", where.format(row="old"), _bump_metric(metric, f"old.{column}", -1)),
+        ("update", f"UPDATE OF {column}", f"old.{column} IS NOT new.{column}",
+         _bump_metric(metric, f"old.{column}", f"-({where.format(row='old')})")
+         + _bump_metric(metric, f"new.{column}", f"({where.format(row='new')})")),
+    )
+)
+
+
+def rebuild_metrics(cursor):
+    """Recompute metrics_daily and metrics_total from the base tables."""
+    cursor.execute("DELETE FROM metrics_daily")
+    cursor.execute("DELETE FROM metrics_total")
+    for metric, table, column, where in METRICS:
+        where = where.format(row=table)
+        cursor.execute(f"""
+            INSERT INTO metrics_daily (day, metric, value)
+            SELECT date({column}), ?, COUNT(*) FROM {table}
+            WHERE {where} AND date({column}) IS NOT NULL
+            GROUP BY date({column})
+        """, (metric,))
+        cursor.execute(f"INSERT INTO metrics_total (metric, value) SELECT ?, COUNT(*) FROM {table} WHERE {where}",
+                       (metric,))
+
+
+# Schema changes for existing databases, applied in order by migrate().
+# Migration N (1-based) brings PRAGMA user_version to N. Each is a sequence
+# of SQL statements or callables taking a cursor. Only ever append.
+MIGRATIONS = (
+    # 1: indexes for the keyset-paginated list_page() queries. Embedding
+    # lookups by note_id already use idx_embeddings_note_chunk.
+    (
+        "CREATE INDEX IF NOT EXISTS idx_notes_updated_at ON notes(updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_plans_note_id ON plans(note_id)",
+        "CREATE INDEX IF NOT EXISTS idx_plans_created_at ON plans(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_reflections_created_at ON reflections(created_at)",
+    ),
+    # 2: normalized tags (see split_tags), maintained by NoteModel
+    (
+        """
+        CREATE TABLE IF NOT EXISTS note_tags (
+            tag TEXT NOT NULL,
+            note_id INTEGER NOT NULL,
+            PRIMARY KEY (tag, note_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_note_tags_note ON note_tags(note_id)",
+        _backfill_note_tags,
+    ),
+    # 3: task completion times and the METRICS rollups. Tasks finished
+    # before this have no recorded time, so they count on their creation day.
+    (
+        "ALTER TABLE tasks ADD COLUMN completed_at TEXT",
+        f"UPDATE tasks SET completed_at = created_at WHERE lower(status) IN {_DONE_SQL}",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_completed_at ON tasks(completed_at)",
+        *METRICS_SCHEMA,
+        rebuild_metrics,
+    ),
+    # 4: checkpoints of the sharded embedding rebuild (core/reindex.py)
+    (
+        """
+        CREATE TABLE IF NOT EXISTS reindex_shards (
+            shard INTEGER PRIMARY KEY,
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            done_at TEXT
+        )
+        """,
+    ),
+    # 5: state of the incremental recurring-issue miner (core/pattern_miner.py).
+    # Clusters reach the patterns table once they recur.
+    (
+        """
+        CREATE TABLE IF NOT EXISTS pattern_clusters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pattern_id INTEGER,
+            size INTEGER NOT NULL,
+            label TEXT,
+            centroid BLOB,
+            last_seen TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_pattern_clusters_recent ON pattern_clusters(last_seen)",
+        """
+        CREATE TABLE IF NOT EXISTS pattern_lsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            cluster_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, cluster_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS pattern_sources (
+            source TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_patterns_top ON patterns(frequency DESC, last_detected DESC)",
+    ),
+    # 6: cap the knowledge-graph change feed, trimming what built up while
+    # only GraphStore.sync() pruned it
+    (
+        *GRAPH_CHANGES_SCHEMA,
+        f"DELETE FROM graph_changes WHERE seq <= (SELECT MAX(seq) FROM graph_changes) - {GRAPH_CHANGES_KEEP}",
+    ),
+    # 7: passage embeddings. Earlier versions appended a row per note on
+    # every run; the newest one is kept before the unique index goes on.
+    (
+        _upgrade_embeddings,
+        """
+        DELETE FROM embeddings
+        WHERE rowid NOT IN (SELECT MAX(rowid) FROM embeddings GROUP BY note_id, chunk)
+        """,
+        "DROP INDEX IF EXISTS idx_embeddings_note",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_embeddings_note_chunk ON embeddings(note_id, chunk)",
+    ),
+    # 8: full-text index over notes, kept in sync by triggers. Filled here
+    # so notes written before the index existed are in it before a trigger
+    # deletes them; that also repairs indexes created empty by init_db.
+    (
+        *NOTES_FTS_SCHEMA,
+        *NOTES_FTS_REBUILD,
+    ),
+    # 9: choices that outlive the process (see get_setting/set_setting)
+    (
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        ) WITHOUT ROWID
+        """,
+    ),
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate():
+    """
+    Apply pending MIGRATIONS in one transaction and return the schema
+    version the database was at before.
+    """
+    conn = get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+    with transaction() as conn:
+        # Re-read under the write lock in case another process migrated first.
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        cursor = conn.cursor()
+        for migration in MIGRATIONS[version:]:
+            for step in migration:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+        conn.execute(f"PRAGMA user_version = {max(version, SCHEMA_VERSION)}")
+    return version
+
+
+def page_cursor(rows, limit: int, *columns):
+    """
+    Keyset cursor for the page after rows: the last row's values of the
+    ORDER BY columns, or None when the page was the last one.
+    """
+    if len(rows) < limit:
+        return None
+    return tuple(rows[-1][c] for c in columns)
+
+
 def init_db():
     """
     Initializes all database tables required by HeliumNotes.
@@ -77,16 +645,30 @@ def init_db():
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         from_id INTEGER,
         to_id INTEGER,
-        relation_type TEXT
+        relation_type TEXT,
+        from_type TEXT DEFAULT 'note',
+        to_type TEXT DEFAULT 'plan'
     )
     """)
+    # Endpoint types were added later; old rows were note -> plan links.
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(relations)")}
+    for column, default in (("from_type", "note"), ("to_type", "plan")):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE relations ADD COLUMN {column} TEXT DEFAULT '{default}'")
 
     # Embeddings table for semantic search
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS embeddings (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         note_id INTEGER,
+        chunk INTEGER DEFAULT 0,
+        start_offset INTEGER,
+        end_offset INTEGER,
         vector BLOB,
+        dtype TEXT,
+        scale REAL,
+        content_hash TEXT,
+        note_updated_at TEXT,
         FOREIGN KEY(note_id) REFERENCES notes(id)
     )
     """)
@@ -104,8 +686,31 @@ def init_db():
     )
     """)
 
+    # Cached knowledge-graph node positions ("note:1", "task:7", ...)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS graph_layout (
+        node_key TEXT PRIMARY KEY,
+        x REAL,
+        y REAL,
+        updated_at TEXT
+    ) WITHOUT ROWID
+    """)
+
+    # Cached knowledge-graph communities for the zoomed-out view
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS graph_communities (
+        node_key TEXT PRIMARY KEY,
+        community INTEGER
+    ) WITHOUT ROWID
+    """)
+
+    # Knowledge-graph change feed, written by triggers
+    for statement in GRAPH_CHANGES_SCHEMA:
+        cursor.execute(statement)
+
     conn.commit()
     conn.close()
+    migrate()
     print("✅ Database initialized successfully.")
 
 
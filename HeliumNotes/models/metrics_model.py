@@ -0,0 +1,51 @@
+from data.database import get_connection, METRICS
+from datetime import date, timedelta
+
+
+class MetricsModel:
+    """Reads the trigger-maintained metric rollups (see METRICS in data.database)."""
+
+    NAMES = tuple(metric for metric, _, _, _ in METRICS)
+
+    @staticmethod
+    def week_window(end: date = None, days: int = 7):
+        """Return (first day, last day) of the `days`-day window ending on `end` (today)."""
+        end = end or date.today()
+        return end - timedelta(days=days - 1), end
+
+    @staticmethod
+    def window(start: date, end: date) -> dict:
+        """Sum of each metric over the days start..end inclusive."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT metric, SUM(value) AS value FROM metrics_daily
+            WHERE day BETWEEN ? AND ? GROUP BY metric
+        """, (start.isoformat(), end.isoformat()))
+        totals = dict.fromkeys(MetricsModel.NAMES, 0)
+        totals.update({r["metric"]: r["value"] for r in cursor.fetchall()})
+        conn.close()
+        return totals
+
+    @staticmethod
+    def daily(metric: str, start: date, end: date) -> list:
+        """Return [(day, value), ...] for every day start..end, zeros included."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT day, value FROM metrics_daily WHERE day BETWEEN ? AND ? AND metric = ?",
+                       (start.isoformat(), end.isoformat(), metric))
+        values = {r["day"]: r["value"] for r in cursor.fetchall()}
+        conn.close()
+        days = (end - start).days + 1
+        return [(d, values.get(d, 0)) for d in ((start + timedelta(days=i)).isoformat() for i in range(days))]
+
+    @staticmethod
+    def totals() -> dict:
+        """All-time value of each metric."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT metric, value FROM metrics_total")
+        totals = dict.fromkeys(MetricsModel.NAMES, 0)
+        totals.update({r["metric"]: r["value"] for r in cursor.fetchall()})
+        conn.close()
+        return totals
@@ -1,5 +1,7 @@
 import sqlite3
-from data.database import get_connection
+from data.database import after_commit, get_connection, inserted_ids, page_cursor, split_tags, transaction
+from core.vector_index import VectorIndex
+from core.embedding_worker import EmbeddingWorker
 from datetime import datetime
 
 
@@ -15,8 +17,32 @@ class NoteModel:
             INSERT INTO notes (title, content, tags, created_at, updated_at)
             VALUES (?, ?, ?, ?, ?)
         """, (title, content, tags, now, now))
+        note_id = inserted_ids(cursor, "notes", 1)[0]
+        NoteModel._write_tags(cursor, note_id, tags)
         conn.commit()
         conn.close()
+        after_commit(lambda: EmbeddingWorker.note_changed(note_id))
+        return note_id
+
+    @staticmethod
+    def create_many(notes) -> list:
+        """
+        Insert (title, content[, tags]) tuples in one transaction with
+        executemany and return their ids in order.
+        """
+        now = datetime.now().isoformat()
+        rows = [(n[0], n[1], n[2] if len(n) > 2 else "", now, now) for n in notes]
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO notes (title, content, tags, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            ids = inserted_ids(cursor, "notes", len(rows))
+            cursor.executemany("INSERT OR IGNORE INTO note_tags (tag, note_id) VALUES (?, ?)",
+                               [(tag, note_id) for note_id, row in zip(ids, rows) for tag in split_tags(row[2])])
+        after_commit(lambda: [EmbeddingWorker.note_changed(note_id) for note_id in ids])
+        return ids
 
     @staticmethod
     def get_all():
@@ -27,6 +53,63 @@ class NoteModel:
         conn.close()
         return notes
 
+    @staticmethod
+    def list_page(limit: int = 50, after=None):
+        """
+        Return (rows, cursor) for one page of notes, most recently updated
+        first, with summary columns only (no content). Pass cursor back as
+        `after` for the next page; it is None after the last page.
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
+        where, params = "", []
+        if after is not None:
+            where, params = "WHERE (updated_at, id) < (?, ?)", list(after)
+        cursor.execute(f"""
+            SELECT id, title, tags, created_at, updated_at FROM notes
+            {where}
+            ORDER BY updated_at DESC, id DESC LIMIT ?
+        """, params + [limit])
+        rows = cursor.fetchall()
+        conn.close()
+        return rows, page_cursor(rows, limit, "updated_at", "id")
+
+    @staticmethod
+    def _write_tags(cursor, note_id: int, tags: str):
+        cursor.executemany("INSERT OR IGNORE INTO note_tags (tag, note_id) VALUES (?, ?)",
+                           [(tag, note_id) for tag in split_tags(tags)])
+
+    @staticmethod
+    def find_by_tags(all_of=(), any_of=(), limit: int = 50):
+        """
+        Notes carrying every tag in all_of and at least one in any_of
+        (tags are matched case-insensitively), most recently updated first.
+        Returns summary rows (no content); limit=None returns every match.
+        """
+        all_of = [t for tag in all_of for t in split_tags(tag)]
+        any_of = [t for tag in any_of for t in split_tags(tag)]
+        clauses, params = [], []
+        if all_of:
+            clauses.append(f"""id IN (
+                SELECT note_id FROM note_tags WHERE tag IN ({",".join("?" * len(all_of))})
+                GROUP BY note_id HAVING COUNT(*) = ?)""")
+            params += all_of + [len(set(all_of))]
+        if any_of:
+            clauses.append(f"id IN (SELECT note_id FROM note_tags WHERE tag IN ({','.join('?' * len(any_of))}))")
+            params += any_of
+        if not clauses:
+            return []
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT id, title, tags, created_at, updated_at FROM notes
+            WHERE {" AND ".join(clauses)}
+            ORDER BY updated_at DESC, id DESC LIMIT ?
+        """, params + [-1 if limit is None else limit])
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+
     @staticmethod
     def get(note_id: int):
         conn = get_connection()
@@ -44,13 +127,42 @@ class NoteModel:
         cursor.execute("""
             UPDATE notes SET title=?, content=?, tags=?, updated_at=? WHERE id=?
         """, (title, content, tags, now, note_id))
+        cursor.execute("DELETE FROM note_tags WHERE note_id=?", (note_id,))
+        NoteModel._write_tags(cursor, note_id, tags)
         conn.commit()
         conn.close()
+        after_commit(lambda: EmbeddingWorker.note_changed(note_id))
+
+    @staticmethod
+    def update_many(notes):
+        """Apply (note_id, title, content[, tags]) tuples in one transaction."""
+        now = datetime.now().isoformat()
+        rows = [(n[1], n[2], n[3] if len(n) > 3 else "", now, n[0]) for n in notes]
+        ids = [row[4] for row in rows]
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("UPDATE notes SET title=?, content=?, tags=?, updated_at=? WHERE id=?", rows)
+            cursor.executemany("DELETE FROM note_tags WHERE note_id=?", [(note_id,) for note_id in ids])
+            cursor.executemany("INSERT OR IGNORE INTO note_tags (tag, note_id) VALUES (?, ?)",
+                               [(tag, row[4]) for row in rows for tag in split_tags(row[2])])
+        after_commit(lambda: [EmbeddingWorker.note_changed(note_id) for note_id in ids])
+
+    @staticmethod
+    def _forget_vectors(note_id: int):
+        store = VectorIndex.store()
+        if store is not None:
+            store.remove_notes([note_id])
 
     @staticmethod
     def delete(note_id: int):
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM notes WHERE id=?", (note_id,))
+        cursor.execute("DELETE FROM embeddings WHERE note_id=?", (note_id,))
+        cursor.execute("DELETE FROM note_tags WHERE note_id=?", (note_id,))
         conn.commit()
-        conn.close()
\ No newline at end of file
+        conn.close()
+        # Keep the resident search index and the vector store in step with the embeddings table.
+        after_commit(lambda: VectorIndex.shared().remove(note_id))
+        after_commit(lambda: NoteModel._forget_vectors(note_id))
+        after_commit(lambda: EmbeddingWorker.note_changed(note_id))
\ No newline at end of file
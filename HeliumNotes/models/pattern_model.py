@@ -1,35 +1,57 @@
-from data.database import get_connection
-from datetime import datetime
+from data.database import get_connection, inserted_ids
 
 
-class TaskModel:
-    """Handles CRUD operations for extracted or user-created tasks."""
+class PatternModel:
+    """Recurring issues, filled in by core.pattern_miner.PatternMiner."""
 
     @staticmethod
-    def create(note_id: int, task: str, due_date: str = None, person: str = None):
+    def create(issue: str, frequency: int, last_detected: str):
         conn = get_connection()
         cursor = conn.cursor()
-        now = datetime.now().isoformat()
-        cursor.execute("""
-            INSERT INTO tasks (note_id, task, due_date, person, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (note_id, task, due_date, person, now))
+        cursor.execute("INSERT INTO patterns (issue, frequency, last_detected) VALUES (?, ?, ?)",
+                       (issue, frequency, last_detected))
+        pattern_id = inserted_ids(cursor, "patterns", 1)[0]
+        conn.commit()
+        conn.close()
+        return pattern_id
+
+    @staticmethod
+    def record(pattern_id: int, frequency: int, last_detected: str):
+        """Store a pattern's new frequency and latest detection time."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE patterns SET frequency=?, last_detected=max(IFNULL(last_detected, ''), ?) WHERE id=?",
+                       (frequency, last_detected, pattern_id))
         conn.commit()
         conn.close()
 
     @staticmethod
-    def get_all():
+    def get(pattern_id: int):
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tasks ORDER BY created_at DESC")
-        tasks = cursor.fetchall()
+        cursor.execute("SELECT * FROM patterns WHERE id=?", (pattern_id,))
+        pattern = cursor.fetchone()
         conn.close()
-        return tasks
+        return pattern
 
     @staticmethod
-    def update_status(task_id: int, status: str):
+    def get_top(n: int = 5):
+        """The n most frequent issues, most recently detected first on ties (idx_patterns_top)."""
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("UPDATE tasks SET status=? WHERE id=?", (status, task_id))
+        cursor.execute("""
+            SELECT id, issue, frequency, last_detected FROM patterns
+            ORDER BY frequency DESC, last_detected DESC LIMIT ?
+        """, (n,))
+        patterns = cursor.fetchall()
+        conn.close()
+        return patterns
+
+    @staticmethod
+    def delete(pattern_id: int):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM patterns WHERE id=?", (pattern_id,))
+        cursor.execute("UPDATE pattern_clusters SET pattern_id=NULL WHERE pattern_id=?", (pattern_id,))
         conn.commit()
-        conn.close()
\ No newline at end of file
+        conn.close()
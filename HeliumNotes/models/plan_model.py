@@ -1,4 +1,4 @@
-from data.database import get_connection
+from data.database import get_connection, inserted_ids, page_cursor, transaction
 from datetime import datetime
 
 
@@ -14,8 +14,33 @@ class PlanModel:
             INSERT INTO plans (note_id, objectives, tasks, created_at)
             VALUES (?, ?, ?, ?)
         """, (note_id, objectives, tasks, now))
+        plan_id = inserted_ids(cursor, "plans", 1)[0]
         conn.commit()
         conn.close()
+        return plan_id
+
+    @staticmethod
+    def create_many(plans) -> list:
+        """
+        Insert (note_id, objectives, tasks) tuples in one transaction with
+        executemany and return their ids in order.
+        """
+        now = datetime.now().isoformat()
+        rows = [(note_id, objectives, tasks, now) for note_id, objectives, tasks in plans]
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO plans (note_id, objectives, tasks, created_at)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            return inserted_ids(cursor, "plans", len(rows))
+
+    @staticmethod
+    def update_many(plans):
+        """Apply (plan_id, objectives, tasks) tuples in one transaction."""
+        with transaction() as conn:
+            conn.executemany("UPDATE plans SET objectives=?, tasks=? WHERE id=?",
+                             [(objectives, tasks, plan_id) for plan_id, objectives, tasks in plans])
 
     @staticmethod
     def get_by_note(note_id: int):
@@ -33,4 +58,33 @@ class PlanModel:
         cursor.execute("SELECT * FROM plans ORDER BY created_at DESC")
         plans = cursor.fetchall()
         conn.close()
-        return plans
\ No newline at end of file
+        return plans
+
+    @staticmethod
+    def list_page(limit: int = 50, after=None, note_id: int = None, since: str = None):
+        """
+        Return (rows, cursor) for one page of plans, newest first, without
+        the task breakdown; since limits it to plans created at or after
+        that ISO date. Pass cursor back as `after` for the next page.
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
+        clauses, params = [], []
+        if note_id is not None:
+            clauses.append("note_id = ?")
+            params.append(note_id)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if after is not None:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor.execute(f"""
+            SELECT id, note_id, objectives, created_at FROM plans
+            {where}
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """, params + [limit])
+        rows = cursor.fetchall()
+        conn.close()
+        return rows, page_cursor(rows, limit, "created_at", "id")
@@ -1,4 +1,5 @@
-from data.database import get_connection
+import json
+from data.database import get_connection, page_cursor
 from datetime import datetime
 
 
@@ -7,6 +8,10 @@ class ReflectionModel:
 
     @staticmethod
     def create(week_start, completed_tasks, ongoing_plans, issues, summary):
+        """completed_tasks, ongoing_plans and issues are stored as JSON."""
+        completed_tasks, ongoing_plans, issues = (
+            json.dumps(value, ensure_ascii=False, default=str) for value in (completed_tasks, ongoing_plans, issues)
+        )
         conn = get_connection()
         cursor = conn.cursor()
         now = datetime.now().isoformat()
@@ -24,4 +29,24 @@ class ReflectionModel:
         cursor.execute("SELECT * FROM reflections ORDER BY created_at DESC")
         reflections = cursor.fetchall()
         conn.close()
-        return reflections
\ No newline at end of file
+        return reflections
+
+    @staticmethod
+    def list_page(limit: int = 20, after=None):
+        """
+        Return (rows, cursor) for one page of reflections, newest first,
+        with their summaries. Pass cursor back as `after` for the next page.
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
+        where, params = "", []
+        if after is not None:
+            where, params = "WHERE (created_at, id) < (?, ?)", list(after)
+        cursor.execute(f"""
+            SELECT id, week_start, summary, created_at FROM reflections
+            {where}
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """, params + [limit])
+        rows = cursor.fetchall()
+        conn.close()
+        return rows, page_cursor(rows, limit, "created_at", "id")
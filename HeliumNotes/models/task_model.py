@@ -1,5 +1,5 @@
-from data.database import get_connection
-from datetime import datetime
+from data.database import get_connection, inserted_ids, page_cursor, transaction
+from datetime import datetime, timedelta
 
 
 class TaskModel:
@@ -14,8 +14,26 @@ class TaskModel:
             INSERT INTO tasks (note_id, task, due_date, person, created_at)
             VALUES (?, ?, ?, ?, ?)
         """, (note_id, task, due_date, person, now))
+        task_id = inserted_ids(cursor, "tasks", 1)[0]
         conn.commit()
         conn.close()
+        return task_id
+
+    @staticmethod
+    def create_many(tasks) -> list:
+        """
+        Insert (note_id, task[, due_date[, person]]) tuples in one
+        transaction with executemany and return their ids in order.
+        """
+        now = datetime.now().isoformat()
+        rows = [(t[0], t[1], t[2] if len(t) > 2 else None, t[3] if len(t) > 3 else None, now) for t in tasks]
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO tasks (note_id, task, due_date, person, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            return inserted_ids(cursor, "tasks", len(rows))
 
     @staticmethod
     def get_all():
@@ -26,10 +44,60 @@ class TaskModel:
         conn.close()
         return tasks
 
+    @staticmethod
+    def list_page(limit: int = 50, after=None, status=None, note_id: int = None):
+        """
+        Return (rows, cursor) for one page of tasks, newest first.
+        status may be one value or a tuple of values. Pass cursor back as
+        `after` for the next page; it is None after the last page.
+        """
+        conn = get_connection()
+        cursor = conn.cursor()
+        clauses, params = [], []
+        if status is not None:
+            statuses = (status,) if isinstance(status, str) else tuple(status)
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if note_id is not None:
+            clauses.append("note_id = ?")
+            params.append(note_id)
+        if after is not None:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor.execute(f"""
+            SELECT id, note_id, task, due_date, person, status, created_at, completed_at FROM tasks
+            {where}
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        """, params + [limit])
+        rows = cursor.fetchall()
+        conn.close()
+        return rows, page_cursor(rows, limit, "created_at", "id")
+
+    @staticmethod
+    def completed_between(start, end, limit: int = 50):
+        """Tasks completed on the days start..end (dates, inclusive), latest first."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, note_id, task, status, created_at, completed_at FROM tasks
+            WHERE completed_at >= ? AND completed_at < ?
+            ORDER BY completed_at DESC, id DESC LIMIT ?
+        """, (start.isoformat(), (end + timedelta(days=1)).isoformat(), limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+
     @staticmethod
     def update_status(task_id: int, status: str):
         conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE tasks SET status=? WHERE id=?", (status, task_id))
         conn.commit()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+    @staticmethod
+    def update_many(statuses):
+        """Apply (task_id, status) pairs in one transaction."""
+        with transaction() as conn:
+            conn.executemany("UPDATE tasks SET status=? WHERE id=?", [(status, task_id) for task_id, status in statuses])
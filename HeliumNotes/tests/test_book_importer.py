@@ -0,0 +1,32 @@
+"""
+test_book_importer.py
+Chapter heading detection in core.book_importer.
+"""
+
+import unittest
+from core.book_importer import BookImporter
+
+
+class BookImporterTest(unittest.TestCase):
+
+    def test_headings(self):
+        for line in ("Chapter 1. Marseilles", "CHAPTER IV.", "Part 2", "Section 3: Methods",
+                     "Chapter 12 The Return", "الفصل الأول"):
+            self.assertTrue(BookImporter.is_heading(line), line)
+
+    def test_prose_is_not_a_heading(self):
+        for line in ("part I did with great vigour.", "Part 2 of the plan went wrong.",
+                     "section 4 is where the fun begins"):
+            self.assertFalse(BookImporter.is_heading(line), line)
+
+    def test_sections(self):
+        lines = ["Preface.", "CHAPTER I.", "THE ARRIVAL", "part I did with great vigour.", "Chapter 2. Home", "End."]
+        self.assertEqual(list(BookImporter.iter_sections(lines)), [
+            (None, "Preface."),
+            ("CHAPTER I. THE ARRIVAL", "part I did with great vigour."),
+            ("Chapter 2. Home", "End."),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+test_database.py
+Connection pooling and transaction behaviour of data.database.
+"""
+
+import os
+import tempfile
+import unittest
+from data import database
+from data.database import get_connection, close_connection, transaction
+
+
+class PooledConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self._saved_path = database.DB_PATH
+        self._dir = tempfile.TemporaryDirectory()
+        database.DB_PATH = os.path.join(self._dir.name, "test.db")
+        conn = get_connection()
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+
+    def tearDown(self):
+        close_connection()
+        database.DB_PATH = self._saved_path
+        self._dir.cleanup()
+
+    def _names(self):
+        return [r["name"] for r in get_connection().execute("SELECT name FROM items ORDER BY id")]
+
+    def test_nested_close_keeps_outer_implicit_transaction(self):
+        outer = get_connection()
+        outer.execute("INSERT INTO items (name) VALUES ('outer')")
+        self.assertTrue(outer.in_transaction)
+
+        # A helper following the get_connection()/close() idiom.
+        inner = get_connection()
+        inner.execute("SELECT COUNT(*) FROM items").fetchone()
+        inner.close()
+
+        self.assertTrue(outer.in_transaction)
+        outer.commit()
+        self.assertEqual(self._names(), ["outer"])
+
+    def test_nested_close_inside_transaction_block(self):
+        with transaction() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('a')")
+            helper = get_connection()
+            helper.close()
+            conn.execute("INSERT INTO items (name) VALUES ('b')")
+        self.assertEqual(self._names(), ["a", "b"])
+
+    def test_close_for_real_discards_uncommitted_work(self):
+        get_connection().execute("INSERT INTO items (name) VALUES ('lost')")
+        close_connection()
+        self.assertEqual(self._names(), [])
+
+    def test_transaction_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with transaction() as conn:
+                conn.execute("INSERT INTO items (name) VALUES ('x')")
+                raise RuntimeError
+        self.assertEqual(self._names(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+test_vector_store.py
+Appends and tombstones of core.vector_store shared between writers.
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from core.vector_store import VectorStore
+
+
+class VectorStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self._dir.name, "test.vecstore")
+        VectorStore(self.base)._commit()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    @staticmethod
+    def _append(store, ids, note_id=1):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.zeros((len(ids), 4), dtype=np.float32)
+        vectors[:, 0] = 1.0
+        store.append(ids, np.full(len(ids), note_id), np.zeros(len(ids)), np.zeros((len(ids), 2)), vectors)
+
+    def test_writers_see_each_others_rows(self):
+        first, second = VectorStore.open(self.base), VectorStore.open(self.base)
+        self._append(first, [1, 2])
+        self._append(second, [3])
+        self._append(first, [4])
+        reopened = VectorStore.open(self.base)
+        self.assertEqual(reopened.view()[1]["id"].tolist(), [1, 2, 3, 4])
+        self.assertEqual(reopened.max_id, 4)
+
+    def test_append_skips_rows_already_stored(self):
+        store = VectorStore.open(self.base)
+        self._append(store, [1, 2, 5])
+        self._append(store, [2, 3, 5])
+        self.assertEqual(sorted(store.view()[1]["id"].tolist()), [1, 2, 3, 5])
+
+    def test_tombstones_are_counted_for_compaction(self):
+        store = VectorStore.open(self.base)
+        self._append(store, [1, 2], note_id=1)
+        self._append(store, [3, 4, 5, 6], note_id=2)
+        self.assertEqual(store.remove_notes([1]), 2)
+        self.assertEqual(VectorStore.open(self.base).dead, 2)
+        self.assertTrue(store.compact_if_needed())
+        reopened = VectorStore.open(self.base)
+        self.assertEqual((reopened.count, reopened.dead), (4, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
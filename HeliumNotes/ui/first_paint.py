@@ -0,0 +1,28 @@
+"""
+first_paint.py
+Event filter that runs a callback once a window has been painted.
+"""
+
+from PyQt6.QtCore import QEvent, QObject, QTimer
+from PyQt6.QtWidgets import QApplication, QWidget
+
+
+class FirstPaint(QObject):
+    """
+    Watches the application's events until a widget of `window` receives
+    its first paint event, then runs callback on the next event-loop turn,
+    once that frame has been flushed to the screen. Create it before the
+    event loop starts.
+    """
+
+    def __init__(self, window: QWidget, callback):
+        super().__init__(window)
+        self._window = window
+        self._callback = callback
+        QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and isinstance(obj, QWidget) and obj.window() is self._window:
+            QApplication.instance().removeEventFilter(self)
+            QTimer.singleShot(0, self._callback)
+        return False
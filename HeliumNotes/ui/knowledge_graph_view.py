@@ -1,27 +1,96 @@
 """
 Knowledge Graph widget
 
-- Builds a NetworkX graph from notes/plans/tasks/patterns and relations.
-- Lays out graph using spring_layout and renders with pyqtgraph.
+- Reads notes/plans/tasks/patterns and relations from the shared GraphStore.
+- Draws it at cached positions at once, then refines the layout with
+  ForceLayout in a LayoutWorker thread, redrawing as it progresses.
+- Draws all edges as one line item, all nodes as one scatter item and a
+  bounded pool of labels, so the scene size does not grow with the graph.
+- Zoomed out, cached communities are collapsed into super-nodes; zoomed in,
+  only nodes inside the viewport (found via a SpatialGrid) are drawn.
 - Clicking nodes will emit a signal (or you can call back into MainWindow).
 """
 
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton
-from PyQt6.QtCore import pyqtSignal
-import pyqtgraph as pg
-import networkx as nx
-from data.database import get_connection
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
+from core.graph_layout import ForceLayout
+from core.graph_lod import GraphClusters, SpatialGrid, cluster_summary
+from core.graph_store import GraphStore
+from core.telemetry import Telemetry
 import logging
+import threading
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+class LayoutWorker(QThread):
+    """Runs ForceLayout off the UI thread and saves the result."""
+
+    progress = pyqtSignal(object)
+    done = pyqtSignal(object)
+
+    def __init__(self, keys, positions, edges, mobility, warm, removed=(), parent=None):
+        super().__init__(parent)
+        self.keys = keys
+        self.removed = removed
+        self.positions = positions
+        self.edges = edges
+        self.mobility = mobility
+        self.warm = warm
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            with Telemetry.timer("graph_refresh_stage_ms", "layout"):
+                result = ForceLayout.run(
+                    self.positions, self.edges, self.mobility, self.warm,
+                    progress=lambda i, pos: self.progress.emit(pos), cancel=self._cancel,
+                )
+            if result is None:
+                return
+            ForceLayout.save_positions(self.keys, result, self.removed)
+            self.progress.emit(result)
+            self.done.emit(result)
+        except Exception:
+            logger.exception("Graph layout failed")
+
+
 class KnowledgeGraphWidget(QWidget):
     # signal emitted when user clicks on a node: (entity_type, entity_id)
     node_clicked = pyqtSignal(str, int)
 
+    COLORS = {
+        "note": (100, 149, 237),
+        "task": (60, 179, 113),
+        "plan": (255, 165, 0),
+        "pattern": (220, 20, 60),
+        "client": (147, 112, 219),
+        "issue": (255, 69, 0),
+        "cluster": (120, 120, 160),
+    }
+    NODE_SIZES = {"note": 18}
+    MAX_LABELS = 300
+    # Level of detail: above DETAIL_NODES nodes in view, communities are drawn
+    # as super-nodes; labels appear once at most LABEL_NODES nodes are in view.
+    DETAIL_NODES = 3000
+    LABEL_NODES = 600
+    MIN_CLUSTER = 3
+    CLUSTER_SIZE = 10
+    LOD_DELAY_MS = 30
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._nodes = []
+        self._graph = None
+        self._shown = np.empty(0, dtype=np.int64)
+        self._mode = "nodes"
+        self._brushes = {}
+        self._label_pool = []
+        self._layout_worker = None
         self._build_ui()
 
     def _build_ui(self):
@@ -29,147 +98,265 @@ class KnowledgeGraphWidget(QWidget):
         self.btn_refresh = QPushButton("Refresh Graph")
         layout.addWidget(self.btn_refresh)
 
+        # The pyqtgraph view is created on first show so that importing
+        # pyqtgraph does not delay application start-up.
+        self.view = None
+        self.plot = None
+        self.setLayout(layout)
+
+        self.btn_refresh.clicked.connect(self.refresh)
+
+    def _ensure_view(self):
+        if self.view is not None:
+            return
+        import pyqtgraph as pg
+
         self.view = pg.GraphicsLayoutWidget()
         self.plot = self.view.addPlot()
         self.plot.hideAxis("bottom")
         self.plot.hideAxis("left")
         self.plot.setAspectLocked(True)
+        self.layout().addWidget(self.view)
 
-        layout.addWidget(self.view)
-        self.setLayout(layout)
+        # Persistent items, updated in place by render().
+        self._edges = pg.PlotCurveItem(pen=pg.mkPen((180, 180, 180), width=1))
+        self._node_pen = pg.mkPen("w")
+        self._scatter = pg.ScatterPlotItem()
+        self._scatter.sigClicked.connect(self._on_points_clicked)
+        self._message = pg.TextItem("No graph data. Add notes/tasks/plans to create nodes.", anchor=(0.5, 0.5))
+        self._message.setVisible(False)
+        for item in (self._edges, self._scatter, self._message):
+            self.plot.addItem(item)
 
-        self.btn_refresh.clicked.connect(self.refresh)
+        # Re-cull after pan/zoom, coalescing bursts of range changes.
+        self._lod_timer = QTimer(self)
+        self._lod_timer.setSingleShot(True)
+        self._lod_timer.timeout.connect(self._update_lod)
+        self.plot.getViewBox().sigRangeChanged.connect(self._schedule_lod)
+
+    def showEvent(self, event):
+        self._ensure_view()
+        super().showEvent(event)
 
     def refresh(self):
         """
-        Recreate the graph from DB and draw it.
-        This is synchronous and intended for small graphs (suitable for prototype).
+        Bring the shared GraphStore up to date (only logged changes are read),
+        draw the graph at its cached positions, then refine the layout in a
+        background thread. Nodes that were laid out before barely move; new
+        ones settle next to their neighbours. Nothing is redone when the
+        graph has not changed since the last refresh.
         """
         try:
-            conn = get_connection()
-            cur = conn.cursor()
-
-            G = nx.Graph()
-
-            # Notes
-            cur.execute("SELECT id, title FROM notes")
-            for r in cur.fetchall():
-                key = f"note:{r['id']}"
-                G.add_node(key, label=r["title"] or f"Note {r['id']}", type="note", ref_id=r["id"])
-
-            # Tasks
-            cur.execute("SELECT id, task, note_id FROM tasks")
-            for r in cur.fetchall():
-                key = f"task:{r['id']}"
-                G.add_node(key, label=(r["task"] or "")[:40], type="task", ref_id=r["id"])
-                # link task -> note
-                if r["note_id"]:
-                    G.add_edge(key, f"note:{r['note_id']}")
-
-            # Plans
-            cur.execute("SELECT id, objectives, note_id FROM plans")
-            for r in cur.fetchall():
-                key = f"plan:{r['id']}"
-                label = (r["objectives"] or "")[:40] if r["objectives"] else f"Plan {r['id']}"
-                G.add_node(key, label=label, type="plan", ref_id=r["id"])
-                if r["note_id"]:
-                    G.add_edge(key, f"note:{r['note_id']}")
-
-            # Patterns
-            cur.execute("SELECT id, pattern_text FROM patterns")
-            for r in cur.fetchall():
-                key = f"pattern:{r['id']}"
-                G.add_node(key, label=(r["pattern_text"] or "")[:40], type="pattern", ref_id=r["id"])
-
-            # Relations
-            cur.execute("SELECT * FROM relations")
-            for r in cur.fetchall():
-                a = f"{r['from_type']}:{r['from_id']}"
-                b = f"{r['to_type']}:{r['to_id']}"
-                if not G.has_node(a):
-                    G.add_node(a, label=a, type=r["from_type"], ref_id=r["from_id"])
-                if not G.has_node(b):
-                    G.add_node(b, label=b, type=r["to_type"], ref_id=r["to_id"])
-                G.add_edge(a, b)
-
-            conn.close()
-
-            # Clear previous plot
-            self.plot.clear()
-
-            if G.number_of_nodes() == 0:
-                self.plot.addItem(pg.TextItem("No graph data. Add notes/tasks/plans to create nodes.", anchor=(0.5, 0.5)))
+            self._ensure_view()
+            store = GraphStore.shared()
+            with Telemetry.timer("graph_refresh_stage_ms", "sync"):
+                changed = store.sync()
+            if not changed and self._nodes:
+                return
+            self._cancel_layout()
+            with Telemetry.timer("graph_refresh_stage_ms", "collect"):
+                keys, nodes, labels = [], [], []
+                for key, attrs in store.nodes():
+                    keys.append(key)
+                    nodes.append((attrs["type"], attrs["ref_id"]))
+                    labels.append(attrs["label"])
+                index = {key: i for i, key in enumerate(keys)}
+                edges = np.array([(index[a], index[b]) for a, b in store.edges()], dtype=np.int64).reshape(-1, 2)
+                degrees = np.bincount(edges.reshape(-1), minlength=len(keys))
+
+            if not keys:
+                self.render([], [], [], None, None)
                 return
 
-            pos = nx.spring_layout(G, seed=42, k=1.2 / max(1, G.number_of_nodes()))
-
-            node_list = list(G.nodes())
-            xs = [pos[n][0] for n in node_list]
-            ys = [pos[n][1] for n in node_list]
-
-            brushes = []
-            sizes = []
-            labels = []
-            for n in node_list:
-                typ = G.nodes[n].get("type", "note")
-                color_map = {
-                    "note": (100, 149, 237),
-                    "task": (60, 179, 113),
-                    "plan": (255, 165, 0),
-                    "pattern": (220, 20, 60),
-                    "client": (147, 112, 219),
-                    "issue": (255, 69, 0),
-                }
-                c = color_map.get(typ, (180, 180, 180))
-                brushes.append(pg.mkBrush(c[0], c[1], c[2], 200))
-                sizes.append(18 if typ == "note" else 12)
-                labels.append(G.nodes[n].get("label", n))
-
-            # draw edges
-            for e in G.edges():
-                a, b = e
-                x0, y0 = pos[a]
-                x1, y1 = pos[b]
-                line = pg.PlotDataItem([x0, x1], [y0, y1], pen=pg.mkPen((180, 180, 180), width=1))
-                self.plot.addItem(line)
-
-            scatter = pg.ScatterPlotItem(x=xs, y=ys, size=sizes, brush=brushes, pen=pg.mkPen("w"))
-            # attach click handler to scatter; map clicked point back to node_list
-            def on_clicked(plot_item, points):
-                if not points:
-                    return
-                p = points[0]
-                # find closest index by coordinates
-                px = p.pos().x(); py = p.pos().y()
-                idx = None
-                tol = 1e-6
-                for i, (xx, yy) in enumerate(zip(xs, ys)):
-                    if abs(xx - px) < 1e-6 and abs(yy - py) < 1e-6:
-                        idx = i
-                        break
-                if idx is None:
-                    # fallback: ignore
-                    return
-                node_key = node_list[idx]
-                # parse node_key format 'type:id'
-                if ":" in node_key:
-                    typ, sid = node_key.split(":", 1)
-                    try:
-                        sid = int(sid)
-                    except Exception:
-                        sid = None
-                    if sid is not None:
-                        # emit a signal so the parent can react and open the note/task/plan
-                        self.node_clicked.emit(typ, sid)
-
-            scatter.sigClicked.connect(on_clicked)
-            self.plot.addItem(scatter)
-
-            # labels
-            for i, lbl in enumerate(labels):
-                ti = pg.TextItem(lbl, anchor=(0.5, -1.0))
-                ti.setPos(xs[i], ys[i])
-                self.plot.addItem(ti)
+            with Telemetry.timer("graph_refresh_stage_ms", "positions"):
+                cached = ForceLayout.load_positions()
+                # Deleted nodes, whether reported by sync() or removed before the store was loaded.
+                removed = [key for key in cached if key not in index]
+                positions, mobility, warm = ForceLayout.initial_positions(keys, edges, cached)
+            with Telemetry.timer("graph_refresh_stage_ms", "communities"):
+                communities = GraphClusters.communities(keys, edges)
+            graph = (nodes, labels, edges, degrees, communities)
+            with Telemetry.timer("graph_refresh_stage_ms", "render"):
+                self.render(nodes, labels, positions, edges, degrees, communities)
+
+            worker = LayoutWorker(keys, positions, edges, mobility, warm, removed)
+            # Updates queued by a cancelled worker are dropped.
+            worker.progress.connect(lambda pos: worker is self._layout_worker and self.render(
+                graph[0], graph[1], pos, graph[2], graph[3], graph[4]))
+            self._layout_worker = worker
+            worker.start()
 
         except Exception:
-            logger.exception("Failed to render knowledge graph")
\ No newline at end of file
+            logger.exception("Failed to render knowledge graph")
+
+    def _cancel_layout(self):
+        if self._layout_worker is not None:
+            self._layout_worker.cancel()
+            self._layout_worker.wait()
+            self._layout_worker = None
+
+    def closeEvent(self, event):
+        self._cancel_layout()
+        super().closeEvent(event)
+
+    def render(self, nodes, labels, positions, edges, degrees=None, communities=None):
+        """
+        Set the laid-out graph to show and draw the current viewport.
+
+        nodes is a list of (type, ref_id); labels is parallel to it;
+        positions is an (n, 2) array and edges an (m, 2) array of node
+        indices. communities (one id per node) groups nodes into the
+        super-nodes shown when zoomed out; without it, grid cells are used.
+        """
+        self._ensure_view()
+        first = self._graph is None
+        self._nodes = nodes
+        n = len(nodes)
+        self._message.setVisible(n == 0)
+        if n == 0:
+            self._graph = None
+            self._draw([], np.empty((0, 2)), None, [], [], [])
+            return
+
+        positions = np.asarray(positions, dtype=float)
+        edges = np.asarray(edges if edges is not None else [], dtype=np.int64).reshape(-1, 2)
+        degrees = np.bincount(edges.reshape(-1), minlength=n) if degrees is None else np.asarray(degrees)
+        grid = SpatialGrid(positions)
+
+        # Small communities (isolated nodes, pairs) are pooled per grid cell.
+        cells = grid.cell_of(positions)
+        if communities is None:
+            clusters = cells
+        else:
+            communities = np.asarray(communities, dtype=np.int64)
+            clusters = communities.copy()
+            small = np.bincount(communities)[communities] < self.MIN_CLUSTER
+            clusters[small] = communities.max() + 1 + cells[small]
+        clusters = np.unique(clusters, return_inverse=True)[1]
+        centroids, counts, cluster_edges = cluster_summary(positions, clusters, edges)
+
+        # Name each cluster after its best-connected member.
+        order = np.lexsort((-degrees, clusters))
+        leaders = order[np.r_[True, clusters[order][1:] != clusters[order][:-1]]]
+
+        self._graph = {
+            "labels": labels,
+            "positions": positions,
+            "edges": edges,
+            "degrees": degrees,
+            "types": [t for t, _ in nodes],
+            "grid": grid,
+            "clusters": clusters,
+            "centroids": centroids,
+            "counts": counts,
+            "cluster_edges": cluster_edges,
+            "cluster_labels": [f"{labels[i]} (+{c - 1})" if c > 1 else labels[i] for i, c in zip(leaders, counts)],
+        }
+        if first:
+            (x0, y0), (x1, y1) = positions.min(axis=0), positions.max(axis=0)
+            self.plot.getViewBox().setRange(xRange=(x0, x1), yRange=(y0, y1), padding=0.05)
+        self._update_lod()
+
+    def _schedule_lod(self, *args):
+        self._lod_timer.start(self.LOD_DELAY_MS)
+
+    def _update_lod(self):
+        """Show super-nodes, or individual nodes of the viewport, depending on zoom."""
+        graph = self._graph
+        if graph is None:
+            return
+        with Telemetry.timer("graph_refresh_stage_ms", "lod"):
+            self._draw_viewport(graph)
+
+    def _draw_viewport(self, graph):
+        (x0, x1), (y0, y1) = self.plot.getViewBox().viewRange()
+        grid = graph["grid"]
+        if grid.count(x0, x1, y0, y1) > self.DETAIL_NODES and len(graph["counts"]) < len(graph["positions"]):
+            visible = np.flatnonzero(
+                (graph["centroids"][:, 0] >= x0) & (graph["centroids"][:, 0] <= x1)
+                & (graph["centroids"][:, 1] >= y0) & (graph["centroids"][:, 1] <= y1))
+            top = visible[np.argsort(-graph["counts"][visible])[:self.MAX_LABELS]]
+            self._mode = "clusters"
+            self._draw(
+                np.arange(len(graph["counts"])), graph["centroids"], graph["cluster_edges"],
+                [self.CLUSTER_SIZE + 3 * np.log2(c) for c in graph["counts"]],
+                [self._brush("cluster")] * len(graph["counts"]),
+                top, [graph["cluster_labels"][i] for i in top],
+            )
+            return
+
+        shown = np.sort(grid.query(x0, x1, y0, y1))
+        mask = np.zeros(len(graph["positions"]), dtype=bool)
+        mask[shown] = True
+        edges = graph["edges"]
+        edges = edges[mask[edges[:, 0]] | mask[edges[:, 1]]] if len(edges) else edges
+        top = []
+        if len(shown) <= self.LABEL_NODES:
+            top = shown[np.argsort(-graph["degrees"][shown])[:self.MAX_LABELS]]
+        self._mode = "nodes"
+        self._draw(
+            shown, graph["positions"], edges,
+            [self.NODE_SIZES.get(graph["types"][i], 12) for i in shown],
+            [self._brush(graph["types"][i]) for i in shown],
+            top, [graph["labels"][i] for i in top],
+        )
+
+    def _draw(self, shown, positions, edges, sizes, brushes, label_rows=(), label_texts=()):
+        """Push points, edges and labels into the persistent plot items."""
+        import pyqtgraph as pg
+
+        self._shown = np.asarray(shown, dtype=np.int64)
+        if edges is not None and len(edges):
+            # One curve for every edge: consecutive point pairs are joined.
+            segments = positions[np.asarray(edges).reshape(-1)]
+            self._edges.setData(segments[:, 0], segments[:, 1], connect="pairs")
+        else:
+            self._edges.setData([], [])
+        if len(self._shown):
+            self._scatter.setData(pos=positions[self._shown], size=sizes, brush=brushes,
+                                  pen=self._node_pen, data=np.arange(len(self._shown)))
+        else:
+            self._scatter.setData([])
+        label_rows = np.asarray(label_rows, dtype=np.int64)
+        self._show_labels(list(label_texts), positions[label_rows] if len(label_rows) else [], pg)
+
+    def _brush(self, typ):
+        brush = self._brushes.get(typ)
+        if brush is None:
+            import pyqtgraph as pg
+            c = self.COLORS.get(typ, (180, 180, 180))
+            brush = self._brushes[typ] = pg.mkBrush(c[0], c[1], c[2], 200)
+        return brush
+
+    def _show_labels(self, texts, positions, pg):
+        """Reuse pooled TextItems; surplus ones are hidden, not destroyed."""
+        while len(self._label_pool) < len(texts):
+            item = pg.TextItem("", anchor=(0.5, -1.0))
+            self.plot.addItem(item)
+            self._label_pool.append(item)
+        for i, item in enumerate(self._label_pool):
+            if i < len(texts):
+                item.setText(texts[i])
+                item.setPos(positions[i][0], positions[i][1])
+                item.setVisible(True)
+            elif item.isVisible():
+                item.setVisible(False)
+
+    def _on_points_clicked(self, plot_item, points, *args):
+        if not len(points):
+            return
+        # Each point carries its index into _shown, so no coordinate search is needed.
+        index = int(self._shown[int(points[0].data())])
+        if self._mode == "clusters":
+            # Zoom into the cluster's members.
+            members = self._graph["positions"][self._graph["clusters"] == index]
+            (x0, y0), (x1, y1) = members.min(axis=0), members.max(axis=0)
+            self.plot.getViewBox().setRange(xRange=(x0, x1), yRange=(y0, y1), padding=0.1)
+            return
+        typ, ref_id = self._nodes[index]
+        try:
+            ref_id = int(ref_id)
+        except (TypeError, ValueError):
+            return
+        # emit a signal so the parent can react and open the note/task/plan
+        self.node_clicked.emit(typ, ref_id)
@@ -21,7 +21,8 @@ from PyQt6.QtWidgets import (
     QMessageBox,
 )
 from PyQt6.QtCore import Qt
-from data.database import get_connection
+from models.metrics_model import MetricsModel
+from models.note_model import NoteModel
 import logging
 
 logger = logging.getLogger(__name__)
@@ -78,31 +79,17 @@ class VisionBoardWidget(QWidget):
         We treat notes tagged with 'goal' and 'project' in tags field as items.
         """
         try:
-            conn = get_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT id, title, tags FROM notes")
-            rows = cur.fetchall()
             self.goals_list.clear()
             self.projects_list.clear()
-            for r in rows:
-                tags = (r["tags"] or "").lower()
-                item_text = r["title"] or f"Untitled — {r['id']}"
-                if "goal" in [t.strip() for t in tags.split(",") if t.strip()]:
-                    it = QListWidgetItem(item_text)
-                    it.setData(Qt.ItemDataRole.UserRole, {"id": r["id"], "type": "goal"})
-                    self.goals_list.addItem(it)
-                if "project" in [t.strip() for t in tags.split(",") if t.strip()]:
-                    it = QListWidgetItem(item_text)
-                    it.setData(Qt.ItemDataRole.UserRole, {"id": r["id"], "type": "project"})
-                    self.projects_list.addItem(it)
+            for kind, target in (("goal", self.goals_list), ("project", self.projects_list)):
+                for r in NoteModel.find_by_tags(any_of=[kind], limit=None):
+                    it = QListWidgetItem(r["title"] or f"Untitled — {r['id']}")
+                    it.setData(Qt.ItemDataRole.UserRole, {"id": r["id"], "type": kind})
+                    target.addItem(it)
             # metrics
-            cur.execute("SELECT COUNT(*) as total FROM tasks")
-            total = cur.fetchone()["total"] or 0
-            cur.execute("SELECT COUNT(*) as done FROM tasks WHERE status IN ('done','completed','closed')")
-            done = cur.fetchone()["done"] or 0
-            self.label_total.setText(str(total))
-            self.label_completed.setText(str(done))
-            conn.close()
+            totals = MetricsModel.totals()
+            self.label_total.setText(str(totals["tasks_created"]))
+            self.label_completed.setText(str(totals["tasks_completed"]))
         except Exception:
             logger.exception("Failed to load vision board data")
 